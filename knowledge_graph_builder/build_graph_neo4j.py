@@ -1,10 +1,33 @@
 from neo4j import GraphDatabase
+import argparse
 import json
+import time
+
+# 批量导入前创建的唯一约束（同时建立 name 上的索引，MERGE 不再做标签扫描）
+CONSTRAINTS = [
+    "CREATE CONSTRAINT title_name IF NOT EXISTS FOR (t:Title) REQUIRE t.name IS UNIQUE",
+    "CREATE CONSTRAINT keyword_name IF NOT EXISTS FOR (k:Keyword) REQUIRE k.name IS UNIQUE",
+]
+
+# 一条语句写入一批记录；全部使用 MERGE，同一批重复执行结果不变，驱动重试整批事务是幂等的
+BULK_QUERY = """
+UNWIND $rows AS row
+MERGE (t:Title {name: row.title})
+WITH t, row
+UNWIND row.keywords AS keyword
+MERGE (k:Keyword {name: keyword})
+MERGE (t)-[:HAS_KEYWORD]->(k)
+"""
+
+# 每批事务的重试时间上限（秒）：execute_write 遇到连接中断、会话失效、死锁等可重试错误时
+# 由驱动自动退避重试，超过该时间仍失败才抛出（与驱动默认值相同，这里显式设置）
+MAX_RETRY_TIME = 30.0
 
 # 定义 Neo4j 驱动类
 class Neo4jHandler:
-    def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri=None, user=None, password=None, driver=None):
+        # 可以直接传入 driver（例如测试用的桩对象），此时不建立连接
+        self.driver = driver if driver is not None else GraphDatabase.driver(uri, auth=(user, password))
     
     def close(self):
         self.driver.close()
@@ -34,6 +57,85 @@ class Neo4jHandler:
                 MERGE (t)-[:HAS_KEYWORD]->(k)
             """, title=title, keyword=keyword)
 
+    def create_constraints(self):
+        with self.driver.session() as session:
+            for statement in CONSTRAINTS:
+                session.run(statement).consume()
+
+    @staticmethod
+    def _write_batch(tx, rows):
+        tx.run(BULK_QUERY, rows=rows).consume()
+
+    def bulk_load(self, records, batch_size=1000, max_retry_time=MAX_RETRY_TIME, report_every=10):
+        """
+        批量导入：先创建约束，再按 batch_size 条记录一批，用一条 UNWIND 语句写入一个事务。
+        失败的批次由驱动的 execute_write 整批重试（直到 max_retry_time 秒），这里不再叠加一层重试；
+        重试不会产生重复节点或关系。
+        records 可以是任意可迭代对象（如 iter_jsonl 的生成器），不会整体读入内存。
+
+        返回：
+          {"rows": 导入记录数, "batches": 批次数, "retries": 重试次数, "seconds": 耗时, "rows_per_second": 吞吐量}
+        """
+        self.create_constraints()
+        stats = {"rows": 0, "batches": 0, "retries": 0}
+        attempts = [0]
+
+        def write_batch(tx, rows):
+            # 驱动每次（重新）执行事务都会调用一次，调用次数减去批次数即为重试次数
+            attempts[0] += 1
+            self._write_batch(tx, rows)
+
+        start = time.perf_counter()
+        with self.driver.session(max_transaction_retry_time=max_retry_time) as session:
+            for batch in iter_batches(records, batch_size):
+                session.execute_write(write_batch, batch)
+                stats["rows"] += len(batch)
+                stats["batches"] += 1
+                if report_every and stats["batches"] % report_every == 0:
+                    elapsed = time.perf_counter() - start
+                    print(f"已导入 {stats['rows']} 条，{stats['rows'] / elapsed:.0f} 条/秒")
+        stats["retries"] = attempts[0] - stats["batches"]
+        stats["seconds"] = time.perf_counter() - start
+        stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+        return stats
+
+
+def to_row(record):
+    """
+    把 JSONL 记录转换为 BULK_QUERY 的参数行：关键词去掉空值、按首次出现去重。
+    标题和关键词保持原样（不去空白），与 create_graph 写入的节点 name 一致，
+    在逐条导入的旧数据上重新导入不会产生重复节点。没有标题的记录返回 None。
+    """
+    title = record.get('title')
+    if not title:
+        return None
+    keywords = [kw for kw in record.get('keywords', []) if kw]
+    return {"title": title, "keywords": list(dict.fromkeys(keywords))}
+
+
+def iter_batches(records, batch_size):
+    batch = []
+    for record in records:
+        row = to_row(record)
+        if row is None:
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_jsonl(file_path):
+    """
+    逐行读取 JSONL 文件，跳过空行。
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
 # 从 JSONL 文件读取数据
 def load_jsonl(file_path):
     data = []
@@ -44,25 +146,32 @@ def load_jsonl(file_path):
 
 # 主函数
 def main():
+    parser = argparse.ArgumentParser(description="把关键词提取结果导入 Neo4j")
     # 设置你的 Neo4j 数据库连接信息
-    uri = "bolt://localhost:7687"  # 替换为你的 Neo4j 地址
-    user = "neo4j"                 # 替换为你的用户名
-    password = "FFR3"          # 替换为你的密码
-    
-    # JSONL 文件路径
-    file_path = "output.jsonl"
-    
-    # 加载 JSONL 数据
-    data = load_jsonl(file_path)
-    
+    parser.add_argument("--uri", default="bolt://localhost:7687", help="Neo4j 地址")
+    parser.add_argument("--user", default="neo4j", help="用户名")
+    parser.add_argument("--password", default="FFR3", help="密码")
+    parser.add_argument("--input", default="output.jsonl", help="JSONL 文件路径")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每个 UNWIND 事务写入的记录数")
+    parser.add_argument("--max-retry-time", type=float, default=MAX_RETRY_TIME,
+                        help="每批事务失败后由驱动重试的时间上限（秒）")
+    parser.add_argument("--per-record", action="store_true", help="使用原来的逐条写入方式（每条记录一个事务）")
+    args = parser.parse_args()
+
     # 初始化 Neo4j 处理器
-    neo4j_handler = Neo4jHandler(uri, user, password)
-    
-    # 将数据导入 Neo4j
-    neo4j_handler.create_graph(data)
-    
-    # 关闭连接
-    neo4j_handler.close()
+    neo4j_handler = Neo4jHandler(args.uri, args.user, args.password)
+    try:
+        if args.per_record:
+            # 加载 JSONL 数据并逐条导入
+            neo4j_handler.create_graph(load_jsonl(args.input))
+        else:
+            stats = neo4j_handler.bulk_load(iter_jsonl(args.input), batch_size=args.batch_size,
+                                            max_retry_time=args.max_retry_time)
+            print(f"共导入 {stats['rows']} 条（{stats['batches']} 批，重试 {stats['retries']} 次），"
+                  f"耗时 {stats['seconds']:.1f}s，{stats['rows_per_second']:.0f} 条/秒")
+    finally:
+        # 关闭连接
+        neo4j_handler.close()
     print("数据已成功导入 Neo4j 数据库！")
 
 if __name__ == "__main__":
@@ -1,7 +1,11 @@
-import warnings
-import pandas as pd
+import argparse
 import json
+import multiprocessing
+import os
+import time
+import warnings
 
+import pandas as pd
 from tqdm import tqdm
 from transformers import (
     Text2TextGenerationPipeline,
@@ -9,6 +13,8 @@ from transformers import (
     AutoTokenizer,
 )
 
+from extraction_cache import CACHE_FILE, ExtractionCache, cache_key
+
 # 忽略警告
 # warnings.filterwarnings("ignore", message="torch.utils._pytree._register_pytree_node")
 
@@ -29,37 +35,228 @@ class KeyphraseGenerationPipeline(Text2TextGenerationPipeline):
         )
         return [[keyphrase.strip() for keyphrase in result.get("generated_text").split(self.keyphrase_sep_token) if keyphrase != ""] for result in results]
 
-# 加载模型
-model_name = "pretrained\keyphrase-generation-t5-small-inspec"
-generator = KeyphraseGenerationPipeline(model=model_name, max_new_tokens=50)
-
-# 读取 CSV 文件
-csv_file = "R3.csv"  # 替换为你的 CSV 文件路径
-df = pd.read_csv(csv_file)
-
-# 创建 JSONL 文件
-output_file = "output.jsonl"
-with open(output_file, "w", encoding="utf-8") as jsonl_file:
-    for _, row in tqdm(df.iterrows(), total=len(df), desc="Processing"):
-        article_id = row["id"]  # 假设 CSV 文件中有 id 列
-        title = row["title"]  # 假设 CSV 文件中有 title 列
-        abstract = row["abstract"]  # 假设 CSV 文件中有 abstract 列
-        
-
-        if pd.isna(abstract):
-            continue
-
-        # 使用模型生成关键词
-        keyphrases = generator(abstract)
-        
-        # 构建 JSON 对象
-        output_data = {
-            "id": article_id,
-            "title": title,
-            "keywords": keyphrases[0] if keyphrases else []
-        }
-        
-        # 写入 JSONL 文件
-        jsonl_file.write(json.dumps(output_data, ensure_ascii=False) + "\n")
-
-print(f"关键词提取完成，结果已保存到 {output_file}")
+# 默认参数（与原来的单条处理脚本一致）
+MODEL_NAME = "pretrained/keyphrase-generation-t5-small-inspec"
+CSV_FILE = "R3.csv"
+OUTPUT_FILE = "output.jsonl"
+MAX_NEW_TOKENS = 50
+# 提取结果的格式版本，写入缓存键：早期的批量路径只缓存了第一个关键词（字符串），
+# 递增版本后这些条目的键不再被命中，可以用 extraction_cache.py prune 清理
+OUTPUT_FORMAT = 2
+# 写入缓存键的生成参数
+CACHE_PARAMS = {"max_new_tokens": MAX_NEW_TOKENS, "keyphrase_sep_token": ";", "output_format": OUTPUT_FORMAT}
+
+# worker 进程使用的生成器。PyTorch 后端在 fork 之前由主进程加载，子进程共享同一份模型权重（写时复制）；
+# ONNX Runtime 的线程池不能跨 fork 使用，因此由 generator_factory 在每个 worker 中各自创建
+generator = None
+generator_factory = None
+
+# 提取缓存（见 extraction_cache.py）及缓存键中的模型标识与生成参数，为 None 时不使用缓存
+cache = None
+cache_model = None
+cache_params = None
+
+
+def extract_batch(abstracts):
+    """
+    一次 generate 调用处理一批摘要，返回与输入一一对应的关键词列表。
+    输入为字符串列表时，Text2TextGenerationPipeline.__call__ 已把每个摘要的单条结果解包，
+    返回值即 [[关键词, ...], ...]（与逐条调用 generator(abstract)[0] 相同），不能再取 [0]；
+    OnnxKeyphraseGenerator 返回同样的格式。
+    """
+    return [list(keyphrases) for keyphrases in generator(abstracts, batch_size=len(abstracts))]
+
+
+def iter_rows(csv_file, chunksize=1000):
+    """
+    流式读取 CSV，逐行产出 (id, title, abstract)，跳过没有摘要的行。
+    """
+    for chunk in pd.read_csv(csv_file, chunksize=chunksize):
+        for article_id, title, abstract in zip(chunk["id"], chunk["title"], chunk["abstract"]):
+            if pd.isna(abstract):
+                continue
+            yield article_id, title, abstract
+
+
+def bucketed_batches(rows, batch_size=16, bucket_batches=16):
+    """
+    长度分桶：每次读入 batch_size * bucket_batches 条记录，按摘要长度排序后切成批次，
+    同一批中的摘要长度接近，padding 更少。
+    """
+    window = []
+    for row in rows:
+        window.append(row)
+        if len(window) >= batch_size * bucket_batches:
+            yield from _split_by_length(window, batch_size)
+            window = []
+    if window:
+        yield from _split_by_length(window, batch_size)
+
+
+def _split_by_length(rows, batch_size):
+    rows = sorted(rows, key=lambda row: len(row[2]))
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+
+def load_checkpoint(output_file):
+    """
+    读取已有的 JSONL 输出，返回已完成的论文 id 集合（统一转为字符串比较）。
+    进程在写入过程中被中断时，最后一行可能不完整，这里将其截掉，之后的追加仍是合法的 JSONL。
+    """
+    done = set()
+    if not os.path.exists(output_file):
+        return done
+    valid_end = 0
+    with open(output_file, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                done.add(str(json.loads(line)["id"]))
+            except (ValueError, KeyError):
+                break
+            valid_end += len(line)
+    if valid_end < os.path.getsize(output_file):
+        with open(output_file, "r+b") as f:
+            f.truncate(valid_end)
+    return done
+
+
+def process_batch(batch):
+    """
+    在 worker 进程中处理一批 (id, title, abstract)，先查缓存，只对未命中的摘要运行模型。
+    返回：(要写入 JSONL 的记录, 新生成的缓存条目, 命中的缓存键)
+    """
+    abstracts = [abstract for _, _, abstract in batch]
+    if cache is not None:
+        keys = [cache_key(cache_model, cache_params, abstract) for abstract in abstracts]
+        found = cache.get_many(keys)
+    else:
+        keys = [None] * len(batch)
+        found = {}
+    # 同一批中重复的摘要只生成一次
+    misses = list(dict.fromkeys(abstracts[i] for i, key in enumerate(keys) if key not in found))
+    generated = dict(zip(misses, extract_batch(misses))) if misses else {}
+
+    records, fresh, hits = [], [], []
+    for i, (article_id, title, abstract) in enumerate(batch):
+        if keys[i] not in found:
+            keywords = generated[abstract]
+            if cache is not None:
+                fresh.append((keys[i], cache_model, keywords))
+        else:
+            keywords = found[keys[i]]
+            hits.append(keys[i])
+        records.append({"id": article_id, "title": title, "keywords": keywords})
+    return records, fresh, hits
+
+
+def _init_worker(threads):
+    global generator, generator_factory
+    # 每个 worker 只用少量线程，避免多个进程的 intra-op 线程互相争抢 CPU
+    if generator is None:
+        generator = generator_factory(threads)
+    elif threads:
+        import torch
+        torch.set_num_threads(threads)
+
+
+def run(csv_file, output_file, batch_size=16, workers=1, threads_per_worker=None,
+        chunksize=1000, bucket_batches=16):
+    """
+    批量提取关键词并追加写入 output_file，已完成的 id 会被跳过（断点续跑）。
+    返回：(本次处理的摘要数, 耗时秒数)
+    """
+    done = load_checkpoint(output_file)
+    if done:
+        print(f"从检查点继续：已完成 {len(done)} 篇")
+    rows = (row for row in iter_rows(csv_file, chunksize=chunksize) if str(row[0]) not in done)
+    batches = bucketed_batches(rows, batch_size=batch_size, bucket_batches=bucket_batches)
+
+    processed = 0
+    cache_hits = 0
+    start = time.perf_counter()
+    with open(output_file, "a", encoding="utf-8") as jsonl_file, tqdm(desc="Processing", unit="abs") as progress:
+        if workers > 1:
+            threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+            pool = multiprocessing.get_context("fork").Pool(
+                workers, initializer=_init_worker, initargs=(threads,)
+            )
+            results = pool.imap_unordered(process_batch, batches)
+        else:
+            pool = None
+            results = map(process_batch, batches)
+        try:
+            for records, fresh, hits in results:
+                # 每批完成后立即追加并刷新，作为检查点
+                for output_data in records:
+                    jsonl_file.write(json.dumps(output_data, ensure_ascii=False) + "\n")
+                jsonl_file.flush()
+                # 缓存只由主进程写入
+                if cache is not None:
+                    cache.put_many(fresh)
+                    cache.touch(hits)
+                processed += len(records)
+                cache_hits += len(hits)
+                progress.update(len(records))
+                progress.set_postfix(rate=f"{processed / (time.perf_counter() - start):.2f} abs/s",
+                                     cached=cache_hits)
+        finally:
+            if pool is not None:
+                pool.terminate()
+    if cache is not None:
+        print(f"缓存命中 {cache_hits} 篇，模型处理 {processed - cache_hits} 篇")
+    return processed, time.perf_counter() - start
+
+
+def main():
+    global generator, generator_factory, cache, cache_model, cache_params
+
+    parser = argparse.ArgumentParser(description="批量提取论文摘要关键词，输出可断点续跑的 JSONL")
+    parser.add_argument("--csv", default=CSV_FILE, help="输入 CSV（需包含 id、title、abstract 列）")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="输出 JSONL，已存在时从中断处继续")
+    parser.add_argument("--model", default=MODEL_NAME, help="关键词生成模型路径")
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch",
+                        help="推理后端：torch 为原始 PyTorch 模型，onnx 为 ONNX Runtime int8 量化模型（见 onnx_backend.py）")
+    parser.add_argument("--onnx-model", default=None, help="ONNX 模型目录，默认使用 onnx_backend.QUANTIZED_DIR")
+    parser.add_argument("--batch-size", type=int, default=16, help="每次 generate 处理的摘要数")
+    parser.add_argument("--workers", type=int, default=1, help="worker 进程数（共享同一份模型）")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="每个 worker 的 torch 线程数，默认 CPU 核数 / worker 数")
+    parser.add_argument("--cache", default=CACHE_FILE, help="提取缓存文件（SQLite），只对新的或变化的摘要运行模型")
+    parser.add_argument("--no-cache", action="store_true", help="不使用提取缓存")
+    parser.add_argument("--chunksize", type=int, default=1000, help="流式读取 CSV 的块大小")
+    parser.add_argument("--bucket-batches", type=int, default=16, help="每个长度分桶窗口包含的批次数")
+    args = parser.parse_args()
+
+    # 加载模型
+    if args.backend == "onnx":
+        from onnx_backend import QUANTIZED_DIR, OnnxKeyphraseGenerator
+
+        def generator_factory(threads):
+            return OnnxKeyphraseGenerator(model_dir=args.onnx_model or QUANTIZED_DIR,
+                                          max_new_tokens=MAX_NEW_TOKENS, num_threads=threads)
+    else:
+        generator = KeyphraseGenerationPipeline(model=args.model, max_new_tokens=MAX_NEW_TOKENS)
+    if args.workers <= 1:
+        _init_worker(args.threads_per_worker)
+
+    if not args.no_cache:
+        cache = ExtractionCache(args.cache)
+        # 模型标识包含后端：int8 量化模型的输出与 PyTorch 模型不完全相同，两者的缓存互不复用
+        model_path = (args.onnx_model or QUANTIZED_DIR) if args.backend == "onnx" else args.model
+        cache_model = f"{args.backend}:{model_path}"
+        cache_params = CACHE_PARAMS
+
+    processed, elapsed = run(
+        args.csv, args.output,
+        batch_size=args.batch_size, workers=args.workers, threads_per_worker=args.threads_per_worker,
+        chunksize=args.chunksize, bucket_batches=args.bucket_batches,
+    )
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"关键词提取完成，本次处理 {processed} 篇，耗时 {elapsed:.1f}s，吞吐量 {rate:.2f} 篇/秒，结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+CACHE_FILE = "extraction_cache.db"
+
+
+def cache_key(model, params, abstract):
+    """
+    内容寻址的缓存键：sha256(模型名, 生成参数, 摘要原文)。
+    模型或参数变化时键随之变化，旧条目不会被误用，可以用 prune 清理。
+    """
+    payload = json.dumps([model, params, abstract], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    本地 SQLite 关键词提取缓存：键为 cache_key，值为关键词列表（JSON）。
+    连接按进程惰性创建，fork 出的 worker 进程各自打开只读查询用的连接；
+    写入（put_many / touch）只在主进程中进行。
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                keywords TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS extractions_last_used ON extractions (last_used)")
+
+    @property
+    def conn(self):
+        if self._conn is None or self._pid != os.getpid():
+            # 使用默认的隔离级别：写语句前隐式 BEGIN，`with self.conn` 结束时整体提交或回滚，
+            # 因此每次 put_many / touch 是一个事务，而不是每行各自提交
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._pid = os.getpid()
+        return self._conn
+
+    def get_many(self, keys):
+        """
+        返回 {键: 关键词列表}，只包含命中的键。
+        """
+        found = {}
+        keys = list(keys)
+        # SQLite 单条语句的参数个数有限，分块查询
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT key, keywords FROM extractions WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for key, keywords in rows:
+                found[key] = json.loads(keywords)
+        return found
+
+    def put_many(self, entries):
+        """
+        写入 [(键, 模型名, 关键词列表)]。关键词不是字符串列表时抛出 ValueError，整批都不写入。
+        """
+        entries = list(entries)
+        for key, _, keywords in entries:
+            if not isinstance(keywords, list) or not all(isinstance(keyword, str) for keyword in keywords):
+                raise ValueError(f"缓存值必须是关键词列表: {key} -> {keywords!r}")
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO extractions (key, model, keywords, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(key, model, json.dumps(keywords, ensure_ascii=False), now, now) for key, model, keywords in entries],
+            )
+
+    def touch(self, keys):
+        """
+        更新命中条目的最近使用时间，prune 按它判断条目是否过期。
+        """
+        now = time.time()
+        with self.conn:
+            self.conn.executemany("UPDATE extractions SET last_used = ? WHERE key = ?", [(now, key) for key in keys])
+
+    def stats(self):
+        total, oldest, newest = self.conn.execute(
+            "SELECT COUNT(*), MIN(last_used), MAX(last_used) FROM extractions"
+        ).fetchone()
+        by_model = self.conn.execute(
+            "SELECT model, COUNT(*) FROM extractions GROUP BY model ORDER BY COUNT(*) DESC"
+        ).fetchall()
+        return {
+            "entries": total,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "oldest_used": oldest,
+            "newest_used": newest,
+            "by_model": dict(by_model),
+        }
+
+    def prune(self, older_than_days=None, keep_model=None):
+        """
+        删除超过 older_than_days 天未使用的条目，以及（指定 keep_model 时）其他模型产生的条目。
+        返回删除的条目数。
+        """
+        conditions = []
+        params = []
+        if older_than_days is not None:
+            conditions.append("last_used < ?")
+            params.append(time.time() - older_than_days * 86400)
+        if keep_model is not None:
+            conditions.append("model != ?")
+            params.append(keep_model)
+        if not conditions:
+            return 0
+        with self.conn:
+            deleted = self.conn.execute(f"DELETE FROM extractions WHERE {' OR '.join(conditions)}", params).rowcount
+        self.conn.execute("VACUUM")
+        return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="关键词提取缓存的统计与清理")
+    parser.add_argument("--cache", default=CACHE_FILE, help="缓存文件路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="显示条目数、文件大小和各模型的条目数")
+    p_prune = sub.add_parser("prune", help="清理过期或其他模型的条目")
+    p_prune.add_argument("--days", type=float, default=None, help="删除超过该天数未使用的条目")
+    p_prune.add_argument("--keep-model", default=None, help="只保留该模型的条目")
+    args = parser.parse_args()
+
+    cache = ExtractionCache(args.cache)
+    if args.command == "stats":
+        stats = cache.stats()
+        print(f"条目数: {stats['entries']}，文件大小: {stats['file_bytes'] / 1024 / 1024:.1f} MB")
+        for label in ("oldest_used", "newest_used"):
+            if stats[label] is not None:
+                print(f"{label}: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stats[label]))}")
+        for model, count in stats["by_model"].items():
+            print(f"  {model}: {count}")
+    else:
+        if args.days is None and args.keep_model is None:
+            parser.error("prune 需要 --days 或 --keep-model")
+        deleted = cache.prune(older_than_days=args.days, keep_model=args.keep_model)
+        print(f"已删除 {deleted} 条缓存")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import os
+import shutil
+import time
+from pathlib import Path
+
+import onnxruntime
+import pandas as pd
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from optimum.onnxruntime import ORTModelForSeq2SeqLM
+from transformers import AutoTokenizer
+
+# 导出的 ONNX 模型目录与 int8 量化后的模型目录
+ONNX_DIR = "pretrained/keyphrase-generation-t5-small-inspec-onnx"
+QUANTIZED_DIR = "pretrained/keyphrase-generation-t5-small-inspec-onnx-int8"
+
+
+def export_onnx(model_name, onnx_dir=ONNX_DIR):
+    """
+    把 PyTorch T5 模型导出为 ONNX（编码器、解码器、带 KV 缓存的解码器三个文件），连同分词器一起保存。
+    """
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True)
+    model.save_pretrained(onnx_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(onnx_dir)
+    return onnx_dir
+
+
+def quantize_onnx(onnx_dir=ONNX_DIR, quantized_dir=QUANTIZED_DIR):
+    """
+    对每个 ONNX 文件做动态 int8 量化（权重离线量化，激活在运行时按批量化），
+    文件名保持不变，配置和分词器文件原样复制，量化目录可以直接用 ORTModelForSeq2SeqLM 加载。
+    """
+    os.makedirs(quantized_dir, exist_ok=True)
+    for path in sorted(Path(onnx_dir).iterdir()):
+        target = Path(quantized_dir) / path.name
+        if path.suffix == ".onnx":
+            quantize_dynamic(str(path), str(target), weight_type=QuantType.QInt8)
+        elif path.is_file():
+            shutil.copy(path, target)
+    return quantized_dir
+
+
+class OnnxKeyphraseGenerator:
+    """
+    基于 ONNX Runtime 的关键词生成器，调用方式和返回格式与对字符串列表调用 KeyphraseGenerationPipeline 相同：
+    generator(abstracts, batch_size=n) 返回 [[关键词, ...], ...]，每个摘要一个关键词列表。
+
+    输入的处理与 Text2TextGenerationPipeline 相同：加上模型配置中的 prefix，按批 padding，不截断，
+    因此与 PyTorch 后端比较时输入完全一致，差别只来自量化。
+    解码为贪心搜索，并使用带 KV 缓存的解码器（每步只输入最新的一个 token），
+    每个 ONNX Runtime 会话的线程数由 num_threads 控制。
+    """
+
+    def __init__(self, model_dir=QUANTIZED_DIR, keyphrase_sep_token=";", max_new_tokens=50, num_threads=None):
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.model = ORTModelForSeq2SeqLM.from_pretrained(
+            model_dir, use_cache=True, provider="CPUExecutionProvider", session_options=options
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.keyphrase_sep_token = keyphrase_sep_token
+        self.max_new_tokens = max_new_tokens
+
+    def __call__(self, abstracts, batch_size=None):
+        if isinstance(abstracts, str):
+            abstracts = [abstracts]
+        batch_size = batch_size or len(abstracts)
+        prefix = getattr(self.model.config, "prefix", None) or ""
+        results = []
+        for start in range(0, len(abstracts), batch_size):
+            batch = [prefix + abstract for abstract in abstracts[start:start + batch_size]]
+            inputs = self.tokenizer(batch, padding=True, truncation=False, return_tensors="pt")
+            output_ids = self.model.generate(
+                **inputs, max_new_tokens=self.max_new_tokens, num_beams=1, do_sample=False, use_cache=True
+            )
+            for text in self.tokenizer.batch_decode(output_ids, skip_special_tokens=True):
+                results.append([keyphrase.strip() for keyphrase in text.split(self.keyphrase_sep_token)
+                                if keyphrase != ""])
+        return results
+
+
+def _jaccard(a, b):
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def compare(csv_file, model_name, model_dir=QUANTIZED_DIR, sample=200, batch_size=16, seed=0):
+    """
+    在抽样的摘要上比较 PyTorch 与 ONNX 后端：关键词集合完全一致的比例、平均 Jaccard 相似度，
+    以及每篇摘要的平均耗时。
+    """
+    from extract_keywords import KeyphraseGenerationPipeline, MAX_NEW_TOKENS
+
+    df = pd.read_csv(csv_file)
+    df = df[df["abstract"].notna()]
+    abstracts = df.sample(n=min(sample, len(df)), random_state=seed)["abstract"].tolist()
+
+    backends = {
+        "torch": KeyphraseGenerationPipeline(model=model_name, max_new_tokens=MAX_NEW_TOKENS),
+        "onnx": OnnxKeyphraseGenerator(model_dir=model_dir, max_new_tokens=MAX_NEW_TOKENS),
+    }
+    outputs = {}
+    for name, generator in backends.items():
+        generator(abstracts[:batch_size], batch_size=batch_size)  # 预热
+        start = time.perf_counter()
+        results = generator(abstracts, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        # 两个后端对每个摘要都应返回一个关键词列表（见 OnnxKeyphraseGenerator），否则集合比较没有意义
+        if len(results) != len(abstracts) or not all(isinstance(keyphrases, list) for keyphrases in results):
+            raise ValueError(f"{name} 后端的输出不是每个摘要一个关键词列表")
+        outputs[name] = results
+        print(f"{name}: {elapsed / len(abstracts) * 1000:.1f} ms/篇")
+
+    pairs = list(zip(outputs["torch"], outputs["onnx"]))
+    exact = sum(1 for a, b in pairs if set(a) == set(b)) / len(pairs)
+    jaccard = sum(_jaccard(a, b) for a, b in pairs) / len(pairs)
+    print(f"关键词集合完全一致: {exact:.1%}，平均 Jaccard: {jaccard:.3f}（{len(pairs)} 篇）")
+    for a, b in [pair for pair in pairs if set(pair[0]) != set(pair[1])][:5]:
+        print(f"  torch: {a}\n  onnx:  {b}")
+    return exact, jaccard
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出 / 量化 ONNX 关键词生成模型，并与 PyTorch 版本比较")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="导出 ONNX 并做动态 int8 量化")
+    p_export.add_argument("--model", default="pretrained/keyphrase-generation-t5-small-inspec")
+    p_export.add_argument("--onnx-dir", default=ONNX_DIR)
+    p_export.add_argument("--quantized-dir", default=QUANTIZED_DIR)
+    p_compare = sub.add_parser("compare", help="在抽样摘要上比较两个后端的关键词与耗时")
+    p_compare.add_argument("--csv", default="R3.csv")
+    p_compare.add_argument("--model", default="pretrained/keyphrase-generation-t5-small-inspec")
+    p_compare.add_argument("--onnx-model", default=QUANTIZED_DIR)
+    p_compare.add_argument("--sample", type=int, default=200)
+    p_compare.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.model, args.onnx_dir)
+        quantize_onnx(args.onnx_dir, args.quantized_dir)
+        print(f"ONNX 模型: {args.onnx_dir}，int8 量化模型: {args.quantized_dir}")
+    else:
+        compare(args.csv, args.model, args.onnx_model, sample=args.sample, batch_size=args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import unittest
+
+from neo4j.exceptions import TransientError
+
+from build_graph_neo4j import BULK_QUERY, CONSTRAINTS, MAX_RETRY_TIME, Neo4jHandler, to_row
+
+
+class _Result:
+    def consume(self):
+        return None
+
+
+class _Tx:
+    def __init__(self, session):
+        self.session = session
+
+    def run(self, query, **params):
+        # 前 failures 次写入模拟死锁等临时错误
+        if self.session.driver.failures > 0:
+            self.session.driver.failures -= 1
+            raise TransientError("deadlock")
+        self.session.driver.writes.append((query, params))
+        return _Result()
+
+
+class _Session:
+    def __init__(self, driver, config):
+        self.driver = driver
+        self.config = config
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, statement):
+        self.driver.statements.append(statement)
+        return _Result()
+
+    def execute_write(self, fn, *args):
+        # 与驱动相同：可重试的错误整批重新执行事务函数（这里不计时，直到成功）
+        while True:
+            try:
+                return fn(_Tx(self), *args)
+            except TransientError:
+                self.driver.retries += 1
+
+
+class StubDriver:
+    """
+    记录语句和事务的桩驱动，不连接数据库。
+    """
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.statements = []
+        self.writes = []
+        self.sessions = []
+        self.retries = 0
+
+    def session(self, **config):
+        self.sessions.append(config)
+        return _Session(self, config)
+
+    def close(self):
+        pass
+
+
+def _records(n):
+    return [{"title": f"Paper {i}", "keywords": ["graph", "search", "graph"]} for i in range(n)]
+
+
+class BulkLoadTest(unittest.TestCase):
+    def test_batches_and_constraints(self):
+        driver = StubDriver()
+        stats = Neo4jHandler(driver=driver).bulk_load(iter(_records(5)), batch_size=2, report_every=0)
+
+        self.assertEqual(driver.statements, CONSTRAINTS)
+        self.assertEqual([query for query, _ in driver.writes], [BULK_QUERY] * 3)
+        self.assertEqual([len(params["rows"]) for _, params in driver.writes], [2, 2, 1])
+        self.assertEqual(driver.writes[0][1]["rows"][0], {"title": "Paper 0", "keywords": ["graph", "search"]})
+        self.assertEqual(stats["rows"], 5)
+        self.assertEqual(stats["batches"], 3)
+        self.assertEqual(stats["retries"], 0)
+        self.assertEqual(driver.sessions[-1], {"max_transaction_retry_time": MAX_RETRY_TIME})
+
+    def test_retry_count(self):
+        driver = StubDriver(failures=2)
+        stats = Neo4jHandler(driver=driver).bulk_load(iter(_records(3)), batch_size=2, max_retry_time=5,
+                                                      report_every=0)
+
+        # 失败的批次只由驱动重试，没有第二层重试
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(driver.retries, 2)
+        self.assertEqual([len(params["rows"]) for _, params in driver.writes], [2, 1])
+        self.assertEqual(driver.sessions[-1], {"max_transaction_retry_time": 5})
+
+
+class ToRowTest(unittest.TestCase):
+    def test_names_are_not_stripped(self):
+        # 与 create_graph 写入的 name 相同，重新导入不会产生重复的 Title / Keyword 节点
+        row = to_row({"title": " Paper A ", "keywords": [" graph", "", None, " graph", "search"]})
+        self.assertEqual(row, {"title": " Paper A ", "keywords": [" graph", "search"]})
+
+    def test_missing_title(self):
+        self.assertIsNone(to_row({"title": "", "keywords": ["graph"]}))
+        self.assertIsNone(to_row({"keywords": ["graph"]}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+
+import extract_keywords
+from extract_keywords import CACHE_PARAMS, MAX_NEW_TOKENS, extract_batch, process_batch
+from extraction_cache import ExtractionCache, cache_key
+
+# 每个摘要对应的模型输出文本（以 ";" 分隔的关键词）
+GENERATED = {"a1": "alpha1;beta1;", "a2": "alpha2", "a3": ""}
+
+
+class StubPipeline:
+    """
+    不加载模型的 KeyphraseGenerationPipeline 替身：postprocess 与 KeyphraseGenerationPipeline 相同，
+    __call__ 与 transformers 4.x 的 Text2TextGenerationPipeline.__call__ 相同——
+    输入为字符串列表且每个结果只有一条序列时，把每个结果解包。
+    """
+
+    keyphrase_sep_token = ";"
+
+    def postprocess(self, results):
+        return [[keyphrase.strip() for keyphrase in result.get("generated_text").split(self.keyphrase_sep_token)
+                 if keyphrase != ""] for result in results]
+
+    def __call__(self, *args, **kwargs):
+        inputs = args[0] if isinstance(args[0], list) else [args[0]]
+        result = [self.postprocess([{"generated_text": GENERATED[text]}]) for text in inputs]
+        if isinstance(args[0], str):
+            return result[0]
+        if all(isinstance(el, str) for el in args[0]) and all(len(res) == 1 for res in result):
+            return [res[0] for res in result]
+        return result
+
+
+class ExtractBatchTest(unittest.TestCase):
+    def setUp(self):
+        extract_keywords.generator = StubPipeline()
+        extract_keywords.cache = None
+
+    def test_keeps_every_keyphrase(self):
+        self.assertEqual(extract_batch(["a1", "a2", "a3"]), [["alpha1", "beta1"], ["alpha2"], []])
+
+    def test_single_abstract_batch(self):
+        self.assertEqual(extract_batch(["a1"]), [["alpha1", "beta1"]])
+
+    def test_matches_per_row_call(self):
+        # 原来的逐条脚本：generator(abstract) 返回 [[关键词, ...]]，取 [0]
+        generator = extract_keywords.generator
+        self.assertEqual(extract_batch(["a1", "a2"]), [generator("a1")[0], generator("a2")[0]])
+
+    def test_process_batch_writes_lists(self):
+        records, fresh, hits = process_batch([(1, "t1", "a1"), (2, "t2", "a2"), (3, "t3", "a1")])
+        self.assertEqual(records, [
+            {"id": 1, "title": "t1", "keywords": ["alpha1", "beta1"]},
+            {"id": 2, "title": "t2", "keywords": ["alpha2"]},
+            {"id": 3, "title": "t3", "keywords": ["alpha1", "beta1"]},
+        ])
+        self.assertEqual((fresh, hits), ([], []))
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        extract_keywords.generator = StubPipeline()
+        extract_keywords.cache = ExtractionCache(os.path.join(self.tmp.name, "cache.db"))
+        extract_keywords.cache_model = "torch:model"
+        extract_keywords.cache_params = CACHE_PARAMS
+
+    def tearDown(self):
+        extract_keywords.cache = None
+        self.tmp.cleanup()
+
+    def test_hits_return_lists(self):
+        batch = [(1, "t1", "a1"), (2, "t2", "a2")]
+        records, fresh, hits = process_batch(batch)
+        extract_keywords.cache.put_many(fresh)
+        self.assertEqual(hits, [])
+
+        cached, fresh, hits = process_batch(batch)
+        self.assertEqual(cached, records)
+        self.assertEqual((len(fresh), len(hits)), (0, 2))
+
+    def test_old_entries_are_not_hit(self):
+        # 早期的批量路径在旧的缓存键下保存了第一个关键词（字符串）
+        old_params = {"max_new_tokens": MAX_NEW_TOKENS, "keyphrase_sep_token": ";"}
+        old_key = cache_key("torch:model", old_params, "a1")
+        with extract_keywords.cache.conn:
+            extract_keywords.cache.conn.execute(
+                "INSERT INTO extractions (key, model, keywords, created, last_used) VALUES (?, ?, ?, 0, 0)",
+                (old_key, "torch:model", '"alpha1"'),
+            )
+        records, fresh, hits = process_batch([(1, "t1", "a1")])
+        self.assertEqual(records[0]["keywords"], ["alpha1", "beta1"])
+        self.assertEqual(hits, [])
+
+    def test_put_many_rejects_non_lists(self):
+        cache = extract_keywords.cache
+        with self.assertRaises(ValueError):
+            cache.put_many([("k1", "torch:model", ["alpha1"]), ("k2", "torch:model", "alpha2")])
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import pandas as pd
+
+from test_extract_keywords import GENERATED, StubPipeline
+
+# ONNX 后端是可选依赖，没有安装 optimum[onnxruntime] 时跳过
+HAS_ONNX = all(importlib.util.find_spec(name) is not None for name in ("onnxruntime", "optimum"))
+
+
+class _Tokenizer:
+    """
+    记录调用参数的分词器替身：token 序列就是摘要原文，解码时原样取回。
+    """
+
+    def __init__(self, generated):
+        self.generated = generated
+        self.calls = []
+
+    def __call__(self, texts, **kwargs):
+        self.calls.append((texts, kwargs))
+        return {"input_ids": list(texts)}
+
+    def batch_decode(self, output_ids, skip_special_tokens=True):
+        return [self.generated[text] for text in output_ids]
+
+
+class _Model:
+    def __init__(self, prefix=None):
+        self.config = SimpleNamespace(prefix=prefix)
+
+    def generate(self, input_ids, **kwargs):
+        prefix = self.config.prefix or ""
+        return [text[len(prefix):] for text in input_ids]
+
+
+def _generator(prefix=None, generated=GENERATED):
+    from onnx_backend import OnnxKeyphraseGenerator
+
+    generator = object.__new__(OnnxKeyphraseGenerator)
+    generator.model = _Model(prefix)
+    generator.tokenizer = _Tokenizer(generated)
+    generator.keyphrase_sep_token = ";"
+    generator.max_new_tokens = 50
+    return generator
+
+
+@unittest.skipUnless(HAS_ONNX, "需要 optimum[onnxruntime]")
+class OnnxGeneratorTest(unittest.TestCase):
+    def test_same_shape_as_pipeline(self):
+        abstracts = ["a1", "a2", "a3"]
+        self.assertEqual(_generator()(abstracts, batch_size=2), StubPipeline()(abstracts, batch_size=2))
+
+    def test_tokenizes_like_pipeline(self):
+        # 与 Text2TextGenerationPipeline 相同：加 prefix、按批 padding、不截断
+        generator = _generator(prefix="kp: ")
+        self.assertEqual(generator(["a1", "a2"]), [["alpha1", "beta1"], ["alpha2"]])
+        texts, kwargs = generator.tokenizer.calls[0]
+        self.assertEqual(texts, ["kp: a1", "kp: a2"])
+        self.assertTrue(kwargs["padding"])
+        self.assertFalse(kwargs["truncation"])
+
+
+@unittest.skipUnless(HAS_ONNX, "需要 optimum[onnxruntime]")
+class CompareTest(unittest.TestCase):
+    def test_compares_whole_keyphrase_lists(self):
+        import onnx_backend
+
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_file = os.path.join(tmp, "sample.csv")
+            pd.DataFrame({"id": [1, 2, 3], "abstract": ["a1", "a2", "a3"]}).to_csv(csv_file, index=False)
+            # a1 的第二个关键词不同：{alpha1, beta1} 与 {alpha1, gamma1} 的 Jaccard 为 1/3
+            onnx = _generator(generated=dict(GENERATED, a1="alpha1;gamma1"))
+            with mock.patch("extract_keywords.KeyphraseGenerationPipeline", lambda **kwargs: StubPipeline()), \
+                    mock.patch.object(onnx_backend, "OnnxKeyphraseGenerator", lambda **kwargs: onnx):
+                exact, jaccard = onnx_backend.compare(csv_file, "model", sample=3, batch_size=2)
+        self.assertAlmostEqual(exact, 2 / 3)
+        self.assertAlmostEqual(jaccard, (1 / 3 + 1 + 1) / 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
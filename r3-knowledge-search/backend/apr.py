@@ -45,6 +45,96 @@ def apriori(transactions, min_support=1):
 
     return frequent_itemsets
 
+if hasattr(int, "bit_count"):
+    _popcount = int.bit_count
+else:
+    def _popcount(bits):
+        return bin(bits).count("1")
+
+
+def _vertical_bitsets(transactions):
+    """
+    把事务转换为竖排格式：每个项一个整数位图，第 i 位为 1 表示第 i 个事务包含该项。
+    先收集下标再一次性转成整数，构建时间与事务总长度成线性。
+    """
+    positions = {}
+    for i, t in enumerate(transactions):
+        for item in t:
+            positions.setdefault(item, []).append(i)
+    n_bytes = (len(transactions) + 7) // 8
+    tidsets = {}
+    for item, idx in positions.items():
+        buf = bytearray(n_bytes)
+        for i in idx:
+            buf[i >> 3] |= 1 << (i & 7)
+        tidsets[item] = int.from_bytes(buf, "little")
+    return tidsets
+
+
+def eclat(transactions, min_support=1, max_size=None, maximal=False):
+    """
+    使用 Eclat（竖排位图）算法挖掘频繁项集，替代 Apriori 的候选自连接和逐事务扫描。
+    每个项集对应一个整数位图，扩展项集只需一次按位与，支持度即位图中 1 的个数。
+
+    参数：
+      transactions: 事务列表，每个事务是一个集合
+      min_support: 最小支持度
+      max_size: 项集的最大长度，None 表示不限制
+      maximal: 为 True 时只返回极大频繁项集（没有频繁超集的项集，长度受 max_size 限制）
+    返回：
+      [(项集, 支持度)]，项集为 frozenset
+    """
+    tidsets = _vertical_bitsets(transactions)
+    # 按支持度升序排列，使搜索树中靠前的分支更早被剪掉（同支持度时保持首次出现的顺序）
+    items = [(item, bits) for item, bits in tidsets.items() if _popcount(bits) >= min_support]
+    items.sort(key=lambda x: _popcount(x[1]))
+
+    result = []
+
+    def extend(prefix, candidates):
+        for pos, (item, bits) in enumerate(candidates):
+            itemset = prefix + (item,)
+            tail = []
+            if max_size is None or len(itemset) < max_size:
+                for other, other_bits in candidates[pos + 1:]:
+                    joined = bits & other_bits
+                    if _popcount(joined) >= min_support:
+                        tail.append((other, joined))
+            if not maximal or not tail:
+                result.append((frozenset(itemset), _popcount(bits)))
+            if tail:
+                extend(itemset, tail)
+
+    extend((), items)
+
+    if maximal:
+        # 搜索树中没有频繁扩展的项集仍可能是其他分支中项集的子集，按长度从大到小去掉这些子集
+        result.sort(key=lambda x: len(x[0]), reverse=True)
+        kept = []
+        for itemset, support in result:
+            if not any(itemset < other for other, _ in kept):
+                kept.append((itemset, support))
+        result = kept
+    return result
+
+
+def largest_frequent_itemset(transactions, min_support=2, min_size=2, max_size=None):
+    """
+    返回长度最大的频繁项集（长度相同时取支持度最高的，再相同时取最先找到的）。
+    最大的频繁项集一定是极大频繁项集，因此只需在极大模式下搜索。
+
+    返回：
+      (项集, 支持度)，不存在长度不小于 min_size 的频繁项集时返回 None
+    """
+    best = None
+    for itemset, support in eclat(transactions, min_support=min_support, max_size=max_size, maximal=True):
+        if len(itemset) < min_size:
+            continue
+        if best is None or (len(itemset), support) > (len(best[0]), best[1]):
+            best = (itemset, support)
+    return best
+
+
 def find_all_frequent_itemsets(transactions):
     """
     返回所有满足以下条件的频繁项集：
@@ -52,13 +142,8 @@ def find_all_frequent_itemsets(transactions):
       - 支持度大于 1
     返回值为一个列表，每个元素为 (项集, 支持度) 的元组
     """
-    freq_itemsets = apriori(transactions, min_support=1)
-    result = []
-    for level in freq_itemsets:
-        for itemset, support in level.items():
-            if len(itemset) > 1 and support > 1:
-                result.append((itemset, support))
-    return result
+    return [(itemset, support) for itemset, support in eclat(transactions, min_support=2)
+            if len(itemset) > 1]
 
 if __name__ == "__main__":
     # 输入字典：键不重要，值为事务的列表
@@ -1,17 +1,48 @@
+import base64
+import os
+import time
+from contextlib import asynccontextmanager
+
 import pandas as pd
-import networkx as nx
 from fastapi import FastAPI
 from fastapi import Query
+from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 from typing import List
-from neo4j import GraphDatabase
 
-from apr import find_all_frequent_itemsets
-from bm25 import query_bm25
-from graph_retrieve import find_nodes_within_distance
+from executor import ExecutionLayer, Saturated
 from initializer import initialize_data
-
-app = FastAPI()
+from neighborhood_index import NEIGHBORHOOD_DIR, load_neighborhood_index
+from neo4j_access import Neo4jGraphAccess
+from query_cache import QueryCache, query_key
+from search_engine import SearchEngine
+from session_store import create_session_store
+
+# 可选依赖：orjson 用于快速序列化 /search 响应，brotli-asgi 提供 br 压缩（没有时只用 gzip）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+@asynccontextmanager
+async def lifespan(app):
+    # 进程池已在模块导入时创建（见模块末尾），这里只处理 Neo4j：
+    # 数据库不可用时不影响启动，首次搜索时再创建索引
+    await graph_db.ensure_indexes()
+    try:
+        yield
+    finally:
+        executor.shutdown()
+        await graph_db.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,228 +52,305 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 超过该字节数的响应按 Accept-Encoding 压缩（br 优先，其次 gzip）
+COMPRESS_MIN_BYTES = int(os.environ.get("R3_COMPRESS_MIN_BYTES", 1024))
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESS_MIN_BYTES, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_BYTES)
+
+class FastJSONResponse(JSONResponse):
+    """
+    orjson 可用时用它序列化，否则与 JSONResponse 相同。
+    /search 直接返回该响应，跳过 FastAPI 对返回值逐层调用 jsonable_encoder 的开销。
+    """
+
+    def render(self, content):
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+# 预编译的数据快照目录（python snapshot.py compile 生成），没有快照时解析原始数据文件
+SNAPSHOT_DIR = os.environ.get("R3_SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_VERIFY = os.environ.get("R3_SNAPSHOT_VERIFY", "1") != "0"
+# 多个 uvicorn worker 时开启：索引直接使用快照的内存映射数组，所有 worker 共享一份物理内存
+SHARED_INDEX = os.environ.get("R3_SHARED_INDEX", "0") != "0"
+
 # 初始化所有缓存数据
-data = initialize_data()
+load_start = time.perf_counter()
+data = initialize_data(keep_networkx=False, snapshot_dir=SNAPSHOT_DIR, verify_snapshot=SNAPSHOT_VERIFY,
+                       shared=SHARED_INDEX)
+load_seconds = time.perf_counter() - load_start
 cached_data = data["cached_data"]
+metadata = data["metadata"]
 candidate_keywords = data["candidate_keywords"]
 tokenized_keywords = data["tokenized_keywords"]
 df_dict = data["df_dict"]
 N = data["N"]
 avgdl = data["avgdl"]
-G = data["graph"]
+bm25_index = data["bm25_index"]
+G = data["csr_graph"]  # 数组化只读图，查询路径不再使用 NetworkX
 title_index=data["title_index"]
 keyword_index=data["keyword_index"]
 
-paperID_to_keyIDs={}
-
-NEO4J_URI = "bolt://localhost:7687"
-NEO4J_USER = "neo4j"
-NEO4J_PASSWORD = "FFR3"
+# 离线预计算的关键词邻域索引（python neighborhood_index.py build / update），
+# 与当前图版本一致时 /search 直接合并各关键词的邻域排序，否则仍在 CSR 图上做 BFS
+neighborhoods = load_neighborhood_index(os.environ.get("R3_NEIGHBORHOOD_DIR", NEIGHBORHOOD_DIR), G)
+
+# 每次搜索的中间状态（论文 -> 命中关键词）按 search_id 保存，/path 据此生成解释路径。
+# 多个 worker 时使用 sqlite 后端在同一主机上共享
+SESSION_BACKEND = os.environ.get("R3_SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.environ.get("R3_SESSION_DB", "search_sessions.db")
+SESSION_MAX_BYTES = int(os.environ.get("R3_SESSION_MAX_BYTES", 64 * 1024 * 1024))
+SESSION_TTL = int(os.environ.get("R3_SESSION_TTL", 1800))
+sessions = create_session_store(SESSION_BACKEND, path=SESSION_DB_PATH,
+                                max_bytes=SESSION_MAX_BYTES, ttl=SESSION_TTL)
+
+# /search 结果缓存（排序后的 id 与 freq_graph，不含元数据），与上面加载的数据版本绑定：
+# 数据只在启动时加载一次，磁盘上的数据文件更新后需要重启（或重新加载数据）才会生效
+QUERY_CACHE_MAX_BYTES = int(os.environ.get("R3_QUERY_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+query_cache = QueryCache(max_bytes=QUERY_CACHE_MAX_BYTES, version=data["version"])
+
+# /search 每页返回的结果数（默认值与上限），其余结果通过 cursor 翻页获取
+SEARCH_PAGE_SIZE = int(os.environ.get("R3_SEARCH_PAGE_SIZE", 20))
+SEARCH_MAX_PAGE_SIZE = int(os.environ.get("R3_SEARCH_MAX_PAGE_SIZE", 200))
+
+# /search/batch 一次请求的查询数上限
+SEARCH_MAX_BATCH = int(os.environ.get("R3_SEARCH_MAX_BATCH", 100))
+
+# 检索流水线（BM25 -> 图扩展排序 -> 频繁关键词组合 -> 解释路径，见 search_engine.py）
+engine = SearchEngine(metadata, candidate_keywords, bm25_index, G, keyword_index, neighborhoods=neighborhoods)
+
+# 同步的检索阶段不在事件循环中执行：图计算进进程池（见 executor.py），进程池在模块末尾 fork
+executor = ExecutionLayer()
+
+# /neo4j 接口的异步驱动（连接池、超时、全文索引与结果缓存，见 neo4j_access.py），
+# 连接地址由 R3_NEO4J_URI / R3_NEO4J_USER / R3_NEO4J_PASSWORD 配置
+graph_db = Neo4jGraphAccess()
+
+@app.exception_handler(Saturated)
+async def handle_saturated(request: Request, exc: Saturated):
+    return JSONResponse(status_code=503, content={"error": "Server is busy, please retry later."},
+                        headers={"Retry-After": "1"})
+
+def read_memory_status():
+    """
+    读取当前进程的内存占用（/proc/self/status，单位 kB）：
+    RssAnon 为进程私有内存，RssFile / RssShmem 为文件映射和共享内存，可被多个 worker 共享。
+    """
+    status = {}
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile", "RssShmem"):
+                    status[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return status
+
+print(f"[Worker {os.getpid()}] 数据加载耗时 {load_seconds:.2f}s，内存 {read_memory_status()}")
+
+@app.get("/worker/stats", response_model=dict)
+async def get_worker_stats():
+    return {
+        "pid": os.getpid(),
+        "shared_index": SHARED_INDEX,
+        "load_seconds": load_seconds,
+        "memory_kb": read_memory_status(),
+    }
 
-neo4j_driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+@app.get("/executor/stats", response_model=dict)
+async def get_executor_stats():
+    return executor.stats()
 
 @app.get("/neo4j/default", response_model=dict)
 async def get_default_neo4j_graph():
-    with neo4j_driver.session() as session:
-        result = session.run("""
-            MATCH (n)-[r]-(m)
-            WITH n, r, m LIMIT 50
-            RETURN id(n) AS source_id, properties(n) AS source_props, labels(n) AS source_labels,
-                   id(m) AS target_id, properties(m) AS target_props, labels(m) AS target_labels,
-                   type(r) AS rel_type
-        """)
-
-        nodes = {}
-        links = []
-        for record in result:
-            for prefix in ['source', 'target']:
-                node_id = record[f"{prefix}_id"]
-                if node_id not in nodes:
-                    nodes[node_id] = {
-                        "id": node_id,
-                        "name": record[f"{prefix}_props"].get("name", f"{prefix}_{node_id}"),
-                        "labels": record[f"{prefix}_labels"],
-                        "properties": record[f"{prefix}_props"]
-                    }
-            links.append({
-                "source": record["source_id"],
-                "target": record["target_id"],
-                "type": record["rel_type"]
-            })
-
-        return {"nodes": list(nodes.values()), "links": links}
+    return await graph_db.default_graph()
 
 @app.get("/neo4j/search", response_model=dict)
-async def search_subgraph(query: str = Query(..., min_length=1)):
-    with neo4j_driver.session() as session:
-        result = session.run("""
-            MATCH path = (n)-[*..1]-(m)
-            WHERE toLower(n.name) CONTAINS toLower($query)
-            RETURN nodes(path) AS ns, relationships(path) AS rs
-        """, parameters={"query": query})
-
-        nodes = {}
-        links = []
-
-        for record in result:
-            for node in record["ns"]:
-                nid = node.id
-                if nid not in nodes:
-                    nodes[nid] = {
-                        "id": nid,
-                        "name": node.get("name", f"node_{nid}"),
-                        "labels": list(node.labels),
-                        "properties": dict(node)
-                    }
-
-            for rel in record["rs"]:
-                links.append({
-                    "source": rel.start_node.id,
-                    "target": rel.end_node.id,
-                    "type": rel.type
-                })
-
-        return {
-            "nodes": list(nodes.values()),
-            "links": links
-        }
-
-def get_frequent_pattern():
-    transactions = [set(keyIDs) for keyIDs in paperID_to_keyIDs.values()]
-    frequent_itemsets = find_all_frequent_itemsets(transactions)
-
-    if not frequent_itemsets:
-        return {"key_nodes": [], "paper_nodes": []}
-
-    max_itemset, _ = max(frequent_itemsets, key=lambda x: (len(x[0]), x[1]))
-    keyID_set = set(max_itemset)
-    matching_paperIDs = [pid for pid, keyIDs in paperID_to_keyIDs.items() if keyID_set.issubset(set(keyIDs))]
-
-    def get_node_info(node_id):
-        return {
-            "name": G.nodes[node_id].get("name", ""),
-            "type": G.nodes[node_id].get("type", "")
-        }
-
-    def get_paper_info(paper_id):
-        name = G.nodes[paper_id].get("name", "")
-        type_ = G.nodes[paper_id].get("type", "")
-        date = ""
-        for row in cached_data:
-            if row.get("id") == paper_id:
-                date = row.get("dc.date.issued[en_US]", "")
-                break
-        return {
-            "name": name,
-            "type": type_,
-            "date": date
-        }
-
-    key_nodes = [get_node_info(kid) for kid in keyID_set if kid in G]
-    paper_nodes = [get_paper_info(pid) for pid in matching_paperIDs if pid in G]
-
-    # 根据日期排序（默认升序）
-    paper_nodes.sort(key=lambda x: x["date"])
-
+async def search_subgraph(query: str = Query(..., min_length=1),
+                          page: int = Query(1, ge=1),
+                          page_size: int = Query(25, ge=1, le=100),
+                          neighbors: int = Query(10, ge=1, le=50)):
+    return await graph_db.search(query, page=page, page_size=page_size, neighbors=neighbors)
+
+@app.get("/neo4j/stats", response_model=dict)
+async def get_neo4j_stats():
+    return graph_db.stats()
+
+def run_search(query):
+    """
+    /search 的 CPU 密集部分，在进程池中执行（进程池只能调用模块级函数）。
+
+    返回 SearchEngine.search 的结果（不含耗时）：
+      ids: 按总距离排序的论文 id
+      paper_keys: {论文 id: [到达它的关键词节点]}
+      freq_graph: 频繁关键词组合对应的主题图
+      parents: 论文到命中关键词路径上的 BFS 前驱指针（SearchEngine.pack_parents 的紧凑形式），/path 用它重建解释路径
+    """
+    return run_search_batch([query])[0]
+
+def run_search_batch(queries):
+    """
+    /search/batch 中未命中缓存的查询一次交给进程池，批内共享 BM25 结果和关键词邻域。
+    """
+    results = engine.search_batch(queries)
+    return [{**{k: v for k, v in result.items() if k != "timings"},
+             "parents": engine.pack_parents(result["parents"], result["paper_keys"])} for result in results]
+
+def encode_cursor(search_id, offset):
+    return base64.urlsafe_b64encode(f"{search_id}:{offset}".encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    返回 (search_id, offset)，格式不合法时返回 None。
+    """
+    try:
+        search_id, _, offset = base64.urlsafe_b64decode(cursor.encode()).decode().rpartition(":")
+        return search_id, int(offset)
+    except ValueError:
+        return None
+
+def parse_fields(fields):
+    """
+    逗号分隔的列名，空字符串表示返回全部列；指定列时总是包含 id（/path 需要）。
+    """
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    return list(dict.fromkeys(["id"] + names)) if names else None
+
+def result_page(search_id, id_list, offset, limit, fields):
+    """
+    排序后的 id 列表中从 offset 开始的一页：按 id 取元数据（可只取部分列），并给出下一页的 cursor。
+    """
+    page_ids = id_list[offset:offset + limit]
+    end = offset + len(page_ids)
     return {
-        "key_nodes": key_nodes,
-        "paper_nodes": paper_nodes
+        'search_id': search_id,
+        'total': len(id_list),
+        'list': metadata.get_many(page_ids, fields=fields),
+        'next_cursor': encode_cursor(search_id, end) if end < len(id_list) else None,
     }
 
 @app.get("/search", response_model=dict)
-async def search(query: str):
-    if not query:
-        return []
-
-    keywords = query_bm25(query, candidate_keywords, tokenized_keywords, df_dict, N, avgdl)
-
-    # 基于关键词节点在图中搜索
-    raw_result = {}
-    for kw in keywords:
-        if kw not in keyword_index:
-            continue  # 忽略图中不存在的关键词节点
-        # id_k = G.nodes[kw].get('index')
-        id_k = keyword_index[kw]
-        nodes_within_5 = find_nodes_within_distance(G, id_k, max_distance=3)
-        raw_result[id_k] = nodes_within_5
-
-    # 收集所有节点 id
-    all_ids = set()
-    for lst in raw_result.values():
-        for id_, dis in lst:
-            all_ids.add(id_)
-
-    # 计算总距离
-    sum_result = {}
-    for id_ in all_ids:
-        total_distance = 0
-        for lst in raw_result.values():
-            total_distance += next((dis for cur_id, dis in lst if cur_id == id_), 7)
-        sum_result[id_] = total_distance
-
-    sorted_result = sorted(sum_result.items(), key=lambda x: x[1])
-    id_list = [i[0] for i in sorted_result]
-
-    qresult = [record for record in cached_data if record['id'] in id_list]
-
-    global paperID_to_keyIDs
-    paperID_to_keyIDs = {}
-    for key, lst in raw_result.items():
-        for id_, dis in lst:
-            if id_ in paperID_to_keyIDs:
-                paperID_to_keyIDs[id_].append(key)
-            else:
-                paperID_to_keyIDs[id_] = [key]
-
-    freq_graph=get_frequent_pattern()
+async def search(query: str = "", cursor: str = "",
+                 limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+                 fields: str = ""):
+    projection = parse_fields(fields)
+
+    # 翻页：从搜索会话中保存的排序结果取下一页，不重新检索
+    if cursor:
+        decoded = decode_cursor(cursor)
+        session = sessions.get(decoded[0]) if decoded else None
+        if session is None:
+            return {"error": "Unknown or expired cursor, please search again."}
+        search_id, offset = decoded
+        return FastJSONResponse(result_page(search_id, session["ids"], max(offset, 0), limit, projection))
 
-    return {
-        'list': qresult,
-        'freq_graph': freq_graph
-    }
+    if not query:
+        return {"error": "Missing query or cursor."}
+
+    # 词序列相同的查询直接复用缓存的排序结果
+    key = query_key(query)
+    cached = query_cache.get(key)
+    if cached is None:
+        cached = await executor.run_cpu(run_search, query)
+        query_cache.put(key, cached)
+    return FastJSONResponse(first_page(cached, limit, projection))
+
+def first_page(result, limit, fields):
+    """
+    为一次检索结果创建搜索会话，返回第一页和 freq_graph。
+    只为第一页从主键索引取元数据（元数据行留在主进程，不经过进程间传输）。
+    """
+    state = {"paper_keys": result["paper_keys"], "ids": result["ids"],
+             "parents": result["parents"], "version": data["version"]}
+    try:
+        search_id = sessions.create(state)
+    except ValueError as e:
+        # 会话超过后端容量时去掉前驱指针再保存，/path 改用图搜索补全路径
+        print(f"[Session] {e}，不保存前驱指针")
+        state["parents"] = {}
+        try:
+            search_id = sessions.create(state)
+        except ValueError as e:
+            # 排序结果本身就超过容量，无法保存会话（翻页和 /path 都依赖它）
+            print(f"[Session] {e}，无法保存搜索会话")
+            return {"error": "Too many results to keep for this search, please refine the query."}
+    response = result_page(search_id, result["ids"], 0, limit, fields)
+    response['freq_graph'] = result["freq_graph"]
+    # 图扩展达到访问节点数上限时结果不完整
+    response['truncated'] = result["truncated"]
+    return response
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    limit: int = Field(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE)
+    fields: str = ""
+
+@app.post("/search/batch", response_model=dict)
+async def search_batch(request: BatchSearchRequest):
+    """
+    一次提交多个查询，按顺序返回每个查询的第一页（格式与 /search 相同，各自有 search_id，可用 cursor 翻页）。
+    未命中缓存的查询在进程池中一起检索，共享 BM25 结果和关键词邻域。
+    """
+    if len(request.queries) > SEARCH_MAX_BATCH:
+        return {"error": f"Too many queries, at most {SEARCH_MAX_BATCH} per batch."}
+    projection = parse_fields(request.fields)
+
+    keys = [query_key(query) for query in request.queries]
+    found = {}
+    missing = {}
+    for key, query in zip(keys, request.queries):
+        if not query or key in found or key in missing:
+            continue
+        cached = query_cache.get(key)
+        if cached is None:
+            missing[key] = query
+        else:
+            found[key] = cached
+    if missing:
+        results = await executor.run_cpu(run_search_batch, list(missing.values()))
+        for key, result in zip(missing, results):
+            query_cache.put(key, result)
+            found[key] = result
+
+    return FastJSONResponse({"results": [
+        first_page(found[key], request.limit, projection) if query else {"error": "Empty query."}
+        for key, query in zip(keys, request.queries)
+    ]})
+
+@app.get("/cache/stats", response_model=dict)
+async def get_cache_stats():
+    return query_cache.stats()
+
+@app.get("/sessions/stats", response_model=dict)
+async def get_session_stats():
+    return sessions.stats()
 
 @app.get("/path/{paper_id}", response_model=dict)
-async def get_paths_from_node(paper_id: str):
+async def get_paths_from_node(paper_id: str, search_id: str = ""):
+    session = sessions.get(search_id) if search_id else None
+    if session is None:
+        return {"error": "Unknown or expired search_id, please search again."}
+    paperID_to_keyIDs = session["paper_keys"]
     if paper_id not in paperID_to_keyIDs:
-        return {"error": "This node was not part of the last search results."}
+        return {"error": "This node was not part of the search results."}
 
+    # 搜索时记录的前驱指针足以重建路径，只按路径长度走几步，直接在主进程中完成；
+    # 指针按节点编号保存，只在数据版本相同时使用，缺少指针时才需要在进程池中做图搜索
     keyword_indices = paperID_to_keyIDs[paper_id]
-    paths = []
-    query_name = G.nodes[paper_id].get("name", "")
-    query_uri = ""
-    for row in cached_data:
-        if row.get("id") == paper_id:
-            query_uri = row.get("dc.identifier.uri[en_US]", "")
-
-    for kwd_id in keyword_indices:
-        try:
-            path_nodes = nx.shortest_path(G, source=paper_id, target=kwd_id)
-            path_info = []
-            for id in path_nodes[1:]:
-                name = G.nodes[id].get("name", "")
-                type = G.nodes[id].get("type", "")
-
-                # 查找cached_data中该节点对应的URI
-                uri = ""
-                if type == "title":
-                    for row in cached_data:
-                        if row.get("id") == id:
-                            uri = row.get("dc.identifier.uri[en_US]", "")
-                            break
-
-                path_info.append({
-                    "name": name,
-                    "label": type,
-                    "uri": uri if type == "title" else None
-                })
-
-            paths.append(path_info) 
-        except (nx.NetworkXNoPath, nx.NodeNotFound):
-            paths.append([]) 
-
-    return {
-        "query_name": query_name,
-        "query_uri": query_uri,
-        "paths": paths
-    }
-
+    parents = engine.unpack_parents(session["parents"]) if session.get("version") == data["version"] else {}
+    path_list = engine.rebuild_paths(parents, paper_id, keyword_indices)
+    if any(path is None for path in path_list):
+        return await executor.run_cpu(explain_paths, paper_id, keyword_indices, path_list)
+    return explain_paths(paper_id, keyword_indices, path_list)
+
+def explain_paths(paper_id, keyword_indices, path_list=None):
+    # 模块级函数，供进程池调用
+    return engine.explain(paper_id, keyword_indices, path_list)
+
+# 模块导入的最后一步 fork 进程池：数据已加载完毕，worker 进程共享同一份只读数据，
+# 并且能按名字找到上面定义的 run_search 等函数；此时 Neo4j 驱动还没有建立连接，
+# I/O 线程池也还没有启动任何线程
+executor.start()
@@ -1,6 +1,7 @@
 import math
 import heapq
 import re
+from bisect import bisect_left
 
 # 定义简单的英文分词函数，利用正则表达式提取单词，全部转为小写
 def tokenize(text):
@@ -28,3 +29,245 @@ def query_bm25(query, candidate_keywords, tokenized_keywords, df, N, avgdl):
     top10_indices = heapq.nlargest(10, range(len(scores)), key=lambda i: scores[i])
     top10_keywords = [candidate_keywords[i] for i in top10_indices if scores[i] > 0]
     return top10_keywords
+
+
+# maxscore 模式下预先完整计算的最短倒排表长度上限
+TOPK_SEED_LIMIT = 4096
+
+
+class BM25Index:
+    """
+    关键词候选集上的 BM25 倒排索引，在 initialize_data 中构建一次。
+
+    倒排表按 CSR 方式平铺存储：词项 t 的倒排表位于
+    postings_doc[postings_ptr[t]:postings_ptr[t + 1]]，文档编号升序排列，
+    同一位置上保存词频与该词项对该文档的 BM25 得分贡献（按 k1、b 预先计算）。
+    查询时只访问包含查询词的文档，结果与 query_bm25 的逐文档扫描完全一致。
+
+    top_k 支持两种模式：
+      exhaustive: 累加所有查询词倒排表上的得分后取前 k 个
+      maxscore:   先用最短倒排表上的文档建立前 k 阈值，再利用每个词项的得分上界
+                  (max_weight) 跳过上界之和低于阈值的词项及文档（MaxScore 动态剪枝），
+                  结果与 exhaustive 相同
+    """
+
+    def __init__(self, vocab, postings_ptr, postings_doc, postings_tf, postings_weight,
+                 doc_len, idf, N, avgdl, k1=1.5, b=0.75, max_weight=None):
+        self.vocab = vocab                      # 词项 -> 词项编号
+        self.postings_ptr = postings_ptr        # 每个词项倒排表的起止位置
+        self.postings_doc = postings_doc        # 文档编号（即 candidate_keywords 的下标）
+        self.postings_tf = postings_tf          # 词频
+        self.postings_weight = postings_weight  # 预计算的 BM25 得分贡献
+        self.doc_len = doc_len
+        self.idf = idf
+        self.N = N
+        self.avgdl = avgdl
+        self.k1 = k1
+        self.b = b
+        # 每个词项在任一文档上的最大得分贡献，作为动态剪枝的上界
+        if max_weight is None:
+            max_weight = [
+                max(_as_list(postings_weight[postings_ptr[t]:postings_ptr[t + 1]]), default=0.0)
+                for t in range(len(postings_ptr) - 1)
+            ]
+        self.max_weight = max_weight
+
+    @classmethod
+    def build(cls, tokenized_keywords, k1=1.5, b=0.75):
+        N = len(tokenized_keywords)
+        doc_len = [len(doc) for doc in tokenized_keywords]
+        avgdl = sum(doc_len) / N if N > 0 else 0
+
+        # 逐文档统计词频，按文档编号顺序追加到各词项的倒排表
+        vocab = {}
+        term_postings = []
+        for doc_id, doc in enumerate(tokenized_keywords):
+            counts = {}
+            for token in doc:
+                counts[token] = counts.get(token, 0) + 1
+            for token, freq in counts.items():
+                term_id = vocab.get(token)
+                if term_id is None:
+                    term_id = vocab[token] = len(term_postings)
+                    term_postings.append([])
+                term_postings[term_id].append((doc_id, freq))
+
+        postings_ptr = [0]
+        postings_doc = []
+        postings_tf = []
+        postings_weight = []
+        idf = []
+        for plist in term_postings:
+            # 与 bm25_score 中完全相同的表达式，保证得分逐位一致
+            term_df = len(plist)
+            term_idf = math.log((N - term_df + 0.5) / (term_df + 0.5) + 1)
+            idf.append(term_idf)
+            for doc_id, freq in plist:
+                postings_doc.append(doc_id)
+                postings_tf.append(freq)
+                postings_weight.append(
+                    term_idf * (freq * (k1 + 1)) / (freq + k1 * (1 - b + b * doc_len[doc_id] / avgdl))
+                )
+            postings_ptr.append(len(postings_doc))
+
+        return cls(vocab, postings_ptr, postings_doc, postings_tf, postings_weight,
+                   doc_len, idf, N, avgdl, k1=k1, b=b)
+
+    def postings(self, term):
+        """
+        返回词项的 (文档编号列表, 得分贡献列表)，词项不存在时返回两个空列表。
+        """
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            return [], []
+        start, end = self.postings_ptr[term_id], self.postings_ptr[term_id + 1]
+        return _as_list(self.postings_doc[start:end]), _as_list(self.postings_weight[start:end])
+
+    def score(self, query_tokens):
+        """
+        按查询词顺序累加得分（与 bm25_score 的求和顺序一致），只返回得分大于 0 的文档。
+        返回值: {文档编号: 得分}
+        """
+        scores = {}
+        for term in query_tokens:
+            docs, weights = self.postings(term)
+            for doc_id, weight in zip(docs, weights):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        return scores
+
+    def top_k(self, query_tokens, k=10, mode="exhaustive"):
+        """
+        返回得分最高的 k 个 (文档编号, 得分)，得分相同时文档编号小的在前，
+        与 heapq.nlargest 在全量得分列表上的结果一致。两种模式结果相同。
+        """
+        if mode == "maxscore":
+            return self._top_k_maxscore(query_tokens, k)
+        if mode != "exhaustive":
+            raise ValueError(f"未知的 BM25 查询模式: {mode}")
+        scores = self.score(query_tokens)
+        return heapq.nlargest(k, scores.items(), key=lambda x: (x[1], -x[0]))
+
+    def _top_k_maxscore(self, query_tokens, k):
+        if k <= 0:
+            return []
+
+        query_terms = list(dict.fromkeys(term for term in query_tokens if term in self.vocab))
+        if not query_terms:
+            return []
+        docs = self.postings_doc
+        weights = self.postings_weight
+        spans = {}
+        max_weight = {}
+        for term in query_terms:
+            term_id = self.vocab[term]
+            spans[term] = (int(self.postings_ptr[term_id]), int(self.postings_ptr[term_id + 1]))
+            max_weight[term] = float(self.max_weight[term_id])
+
+        # 倒排表是内存映射数组（memoryview）时，直接在上面二分查找比在 list 上慢得多，
+        # 因此查询词的倒排表各取一份 list 再查找；本身是 list 时直接在原表的区间内查找
+        copy_postings = not isinstance(docs, list)
+        term_postings = {}
+
+        def exact_score(doc_id):
+            # 在各查询词倒排表中二分查找文档，按查询词顺序求和（与 score() 相同）
+            score = 0.0
+            for term in query_tokens:
+                span = spans.get(term)
+                if span is None:
+                    continue
+                postings = term_postings.get(term)
+                if postings is None:
+                    if copy_postings:
+                        postings = (_as_list(docs[span[0]:span[1]]), _as_list(weights[span[0]:span[1]]),
+                                    0, span[1] - span[0])
+                    else:
+                        postings = (docs, weights, span[0], span[1])
+                    term_postings[term] = postings
+                term_docs, term_weights, lo, hi = postings
+                pos = bisect_left(term_docs, doc_id, lo, hi)
+                if pos < hi and term_docs[pos] == doc_id:
+                    score += term_weights[pos]
+            return score
+
+        heap = []  # 小顶堆，元素为 (得分, -文档编号)；堆满后新文档需严格优于堆顶
+
+        def offer(doc_id):
+            entry = (exact_score(doc_id), -doc_id)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+        # 1. 先完整计算最短倒排表（通常是 IDF 最高的词）上的文档，迅速抬高阈值
+        scored = set()
+        shortest = min(query_terms, key=lambda t: spans[t][1] - spans[t][0])
+        if spans[shortest][1] - spans[shortest][0] <= TOPK_SEED_LIMIT:
+            for doc_id in _as_list(docs[spans[shortest][0]:spans[shortest][1]]):
+                scored.add(doc_id)
+                offer(doc_id)
+
+        # 2. 堆未满时按文档编号合并各倒排表，直到堆中有 k 个文档
+        cursor = {term: spans[term][0] for term in query_terms}
+        while len(heap) < k:
+            active = [t for t in query_terms if cursor[t] < spans[t][1]]
+            if not active:
+                break
+            doc_id = int(min(docs[cursor[t]] for t in active))
+            for term in active:
+                if docs[cursor[term]] == doc_id:
+                    cursor[term] += 1
+            if doc_id not in scored:
+                scored.add(doc_id)
+                offer(doc_id)
+        if len(heap) < k:
+            return [(-neg_doc, score) for score, neg_doc in sorted(heap, reverse=True)]
+
+        # 3. 按上界从小到大排列查询词，上界之和（按查询词顺序求和，与实际得分的求和顺序相同，
+        #    浮点加法单调，因此是精确上界）仍严格低于阈值的前缀为非必要词：
+        #    只出现在非必要词倒排表中的文档不可能进入前 k，只需扫描必要词倒排表的剩余部分
+        threshold = heap[0][0]
+        by_bound = sorted(query_terms, key=lambda t: max_weight[t])
+        n_optional = 0
+        while n_optional < len(by_bound):
+            prefix = set(by_bound[:n_optional + 1])
+            bound = 0.0
+            for term in query_tokens:
+                if term in prefix:
+                    bound += max_weight[term]
+            if bound >= threshold:
+                break
+            n_optional += 1
+        optional = set(by_bound[:n_optional])
+        essential = by_bound[n_optional:]
+
+        # 必要词上按任意顺序累加粗略得分（重复查询词按次数放大），加上非必要词上界后
+        # 放大 1e-9 覆盖浮点误差；仍低于阈值的文档直接跳过，其余文档计算精确得分
+        repeat = {term: query_tokens.count(term) for term in query_terms}
+        optional_slack = sum(max_weight[term] * repeat[term] for term in optional)
+        partial = {}
+        for term in essential:
+            factor = repeat[term]
+            start, end = cursor[term], spans[term][1]
+            for doc_id, weight in zip(_as_list(docs[start:end]), _as_list(weights[start:end])):
+                partial[doc_id] = partial.get(doc_id, 0.0) + weight * factor
+        for doc_id, rough in partial.items():
+            if doc_id in scored or (rough + optional_slack) * (1 + 1e-9) < heap[0][0]:
+                continue
+            offer(doc_id)
+
+        return [(-neg_doc, score) for score, neg_doc in sorted(heap, reverse=True)]
+
+
+def _as_list(seq):
+    # 倒排表既可能是 list，也可能是从快照加载的 numpy 数组或 memoryview
+    return seq.tolist() if hasattr(seq, "tolist") else seq
+
+
+def query_bm25_index(query, candidate_keywords, index, k=10, mode="exhaustive"):
+    """
+    基于倒排索引的 query_bm25，返回得分最高的 k 个候选关键词。
+    mode: "exhaustive" 全量累加，"maxscore" 动态剪枝，两者结果相同
+    """
+    query_tokens = tokenize(query)
+    top = index.top_k(query_tokens, k=k, mode=mode)
+    return [candidate_keywords[doc_id] for doc_id, score in top if score > 0]
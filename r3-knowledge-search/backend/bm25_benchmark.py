@@ -0,0 +1,81 @@
+import argparse
+import random
+import time
+
+from bm25 import BM25Index, tokenize
+
+
+def make_vocabulary(n_keywords, n_tokens, seed):
+    """
+    生成合成的候选关键词集合：词项服从 Zipf 分布，
+    少数高频词（类似 "learning"、"model"、"system"）拥有很长的倒排表。
+    """
+    rng = random.Random(seed)
+    tokens = [f"t{i}" for i in range(n_tokens)]
+    cum_weights = []
+    total = 0.0
+    for rank in range(n_tokens):
+        total += 1.0 / (rank + 1)
+        cum_weights.append(total)
+
+    keywords = []
+    for _ in range(n_keywords):
+        length = rng.randint(1, 4)
+        keywords.append(" ".join(rng.choices(tokens, cum_weights=cum_weights, k=length)))
+    return tokens, keywords
+
+
+def make_queries(tokens, n_queries, seed):
+    """
+    多词查询：每个查询混合 1~2 个高频词和 1~2 个中低频词。
+    """
+    rng = random.Random(seed + 1)
+    common = tokens[:20]
+    rare = tokens[20:5000]
+    queries = []
+    for _ in range(n_queries):
+        terms = rng.sample(common, rng.randint(1, 2)) + rng.sample(rare, rng.randint(1, 2))
+        rng.shuffle(terms)
+        queries.append(" ".join(terms))
+    return queries
+
+
+def run(index, queries, k, mode):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append(index.top_k(tokenize(query), k=k, mode=mode))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BM25 倒排索引 exhaustive 与 maxscore 模式的性能对比")
+    parser.add_argument("--keywords", type=int, default=1_000_000, help="候选关键词数量")
+    parser.add_argument("--tokens", type=int, default=50_000, help="词表大小")
+    parser.add_argument("--queries", type=int, default=200, help="查询数量")
+    parser.add_argument("--k", type=int, default=10, help="返回前 k 个关键词")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"生成 {args.keywords} 个合成关键词 ...")
+    tokens, keywords = make_vocabulary(args.keywords, args.tokens, args.seed)
+
+    start = time.perf_counter()
+    index = BM25Index.build([tokenize(kw) for kw in keywords])
+    print(f"索引构建耗时: {time.perf_counter() - start:.2f}s，"
+          f"倒排表总长度: {len(index.postings_doc)}，"
+          f"最长倒排表: {max(index.postings_ptr[t + 1] - index.postings_ptr[t] for t in range(len(index.idf)))}")
+
+    queries = make_queries(tokens, args.queries, args.seed)
+    exhaustive_time, exhaustive_results = run(index, queries, args.k, "exhaustive")
+    maxscore_time, maxscore_results = run(index, queries, args.k, "maxscore")
+
+    mismatches = sum(1 for a, b in zip(exhaustive_results, maxscore_results) if a != b)
+    print(f"exhaustive: {exhaustive_time / len(queries) * 1000:.2f} ms/查询")
+    print(f"maxscore:   {maxscore_time / len(queries) * 1000:.2f} ms/查询")
+    print(f"加速比:     {exhaustive_time / maxscore_time:.1f}x")
+    print(f"结果不一致的查询数: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from bm25 import BM25Index, tokenize
+
+
+class SparseBM25:
+    """
+    基于 SciPy 稀疏矩阵的向量化 BM25，用于离线批量打分（回放查询日志、调 k1/b、预热缓存）。
+
+    索引只保存词项 × 关键词的词频 CSR 矩阵、文档长度和 IDF；
+    权重矩阵按 (k1, b) 在首次使用时由词频矩阵算出并缓存，切换参数无需重建索引。
+    一批查询被编码为 查询 × 词项 的计数矩阵，与权重矩阵做一次稀疏矩阵乘法即得到全部得分，
+    再对每行用 argpartition 取前 k 个。
+    由于求和顺序不同，得分与 BM25Index 可能有最后一位的浮点差异。
+    """
+
+    def __init__(self, vocab, tf_matrix, doc_len, idf, avgdl, max_cached_weights=4):
+        self.vocab = vocab                      # 词项 -> 行号
+        self.tf_matrix = tf_matrix.tocsr()      # 词项 × 关键词 词频矩阵
+        self.doc_len = np.asarray(doc_len, dtype=np.float64)
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.avgdl = avgdl
+        self.max_cached_weights = max_cached_weights
+        self._weights = {}
+
+    @classmethod
+    def from_index(cls, index):
+        """
+        直接复用 BM25Index 的平铺倒排表作为 CSR 的 indptr/indices/data，不重新分词。
+        """
+        n_terms = len(index.postings_ptr) - 1
+        tf_matrix = sp.csr_matrix(
+            (
+                np.asarray(index.postings_tf, dtype=np.float64),
+                np.asarray(index.postings_doc, dtype=np.int64),
+                np.asarray(index.postings_ptr, dtype=np.int64),
+            ),
+            shape=(n_terms, index.N),
+        )
+        return cls(index.vocab, tf_matrix, index.doc_len, index.idf, index.avgdl)
+
+    @classmethod
+    def build(cls, tokenized_keywords):
+        return cls.from_index(BM25Index.build(tokenized_keywords))
+
+    def weights(self, k1=1.5, b=0.75):
+        """
+        返回 (k1, b) 对应的 词项 × 关键词 BM25 权重矩阵（CSR），结果按参数缓存。
+        """
+        key = (k1, b)
+        matrix = self._weights.get(key)
+        if matrix is not None:
+            return matrix
+
+        tf = self.tf_matrix
+        rows = np.repeat(np.arange(tf.shape[0]), np.diff(tf.indptr))
+        if self.avgdl > 0:
+            norm = k1 * (1 - b + b * self.doc_len[tf.indices] / self.avgdl)
+        else:
+            norm = np.full(len(tf.data), k1 * (1 - b))
+        data = self.idf[rows] * (tf.data * (k1 + 1)) / (tf.data + norm)
+        matrix = sp.csr_matrix((data, tf.indices, tf.indptr), shape=tf.shape)
+
+        if len(self._weights) >= self.max_cached_weights:
+            self._weights.pop(next(iter(self._weights)))
+        self._weights[key] = matrix
+        return matrix
+
+    def query_matrix(self, queries):
+        """
+        将查询编码为 查询 × 词项 的计数矩阵；重复的查询词计数累加，与逐词求和一致。
+        """
+        indptr = [0]
+        indices = []
+        for query in queries:
+            for token in tokenize(query):
+                term_id = self.vocab.get(token)
+                if term_id is not None:
+                    indices.append(term_id)
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float64)
+        matrix = sp.csr_matrix((data, indices, indptr), shape=(len(queries), self.tf_matrix.shape[0]))
+        matrix.sum_duplicates()
+        return matrix
+
+    def score_batch(self, queries, k1=1.5, b=0.75):
+        """
+        一次稀疏矩阵乘法计算一批查询在所有关键词上的得分，返回 查询 × 关键词 的 CSR 矩阵。
+        """
+        return (self.query_matrix(queries) @ self.weights(k1, b)).tocsr()
+
+    def top_k_batch(self, queries, k=10, k1=1.5, b=0.75, chunk_size=1024):
+        """
+        批量返回每个查询得分最高的 k 个 (关键词下标, 得分)，得分相同时下标小的在前。
+        chunk_size 控制一次矩阵乘法处理的查询数，限制得分矩阵的内存占用。
+        """
+        results = []
+        for start in range(0, len(queries), chunk_size):
+            scores = self.score_batch(queries[start:start + chunk_size], k1=k1, b=b)
+            for row in range(scores.shape[0]):
+                lo, hi = scores.indptr[row], scores.indptr[row + 1]
+                results.append(_row_top_k(scores.indices[lo:hi], scores.data[lo:hi], k))
+        return results
+
+
+def _row_top_k(doc_ids, row_scores, k):
+    positive = row_scores > 0
+    doc_ids, row_scores = doc_ids[positive], row_scores[positive]
+    if len(row_scores) > k:
+        # argpartition 找到第 k 大的得分，保留所有不低于它的候选，避免同分时漏掉下标更小的关键词
+        kth = row_scores[np.argpartition(-row_scores, k - 1)[k - 1]]
+        keep = row_scores >= kth
+        doc_ids, row_scores = doc_ids[keep], row_scores[keep]
+    order = np.lexsort((doc_ids, -row_scores))[:k]
+    return [(int(doc_ids[i]), float(row_scores[i])) for i in order]
+
+
+def query_bm25_batch(queries, candidate_keywords, sparse_index, k=10, k1=1.5, b=0.75):
+    """
+    批量版 query_bm25：对每个查询返回得分最高的 k 个候选关键词。
+    """
+    return [
+        [candidate_keywords[doc_id] for doc_id, _ in top]
+        for top in sparse_index.top_k_batch(queries, k=k, k1=k1, b=b)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线批量回放查询日志，输出每个查询的 BM25 关键词")
+    parser.add_argument("queries", help="查询日志文件，每行一个查询")
+    parser.add_argument("--keywords", default="new_kwds1.txt", help="候选关键词文件")
+    parser.add_argument("--output", default="bm25_batch.jsonl", help="输出 JSONL 文件")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--k1", type=float, nargs="+", default=[1.5], help="可给多个值做参数扫描")
+    parser.add_argument("--b", type=float, nargs="+", default=[0.75], help="可给多个值做参数扫描")
+    args = parser.parse_args()
+
+    with open(args.keywords, "r", encoding="utf-8") as f:
+        candidate_keywords = [line.strip() for line in f if line.strip()]
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    start = time.perf_counter()
+    index = SparseBM25.build([tokenize(keyword) for keyword in candidate_keywords])
+    print(f"索引构建耗时: {time.perf_counter() - start:.2f}s")
+
+    with open(args.output, "w", encoding="utf-8") as out:
+        for k1 in args.k1:
+            for b in args.b:
+                start = time.perf_counter()
+                keywords = query_bm25_batch(queries, candidate_keywords, index, k=args.k, k1=k1, b=b)
+                elapsed = time.perf_counter() - start
+                print(f"k1={k1} b={b}: {len(queries)} 个查询耗时 {elapsed:.2f}s")
+                for query, kws in zip(queries, keywords):
+                    out.write(json.dumps({"k1": k1, "b": b, "query": query, "keywords": kws},
+                                         ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+import json
+import os
+
+import numpy as np
+
+# 边表目录格式版本（见 CSRGraph.from_edge_list）
+EDGE_LIST_FORMAT = 1
+
+
+class CSRGraph:
+    """
+    只读的数组化图结构，用于线上查询路径，替代 NetworkX。
+
+    节点用 0..n-1 的整数编号，邻接关系以 CSR 形式保存：
+    节点 i 的邻居为 indices[indptr[i]:indptr[i + 1]]。
+    node_type 为每个节点一个字节的类型编码（对应 type_names 中的下标），
+    node_ids / names 保存整数编号与原图字符串 id、名称之间的映射。
+    对外接口仍使用原图中的字符串 id，与 NetworkX 版本的函数返回格式一致。
+    node_ids / names / id_to_index 也可以是快照中的只读序列和映射（见 snapshot.py），
+    此时数组与字符串表由同一主机上的多个进程共享。
+    """
+
+    def __init__(self, indptr, indices, node_type, type_names, node_ids, names, id_to_index=None):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.node_type = np.asarray(node_type, dtype=np.uint8)
+        self.type_names = list(type_names)
+        self.node_ids = node_ids
+        self.names = names
+        if id_to_index is None:
+            id_to_index = {node_id: i for i, node_id in enumerate(node_ids)}
+        self.id_to_index = id_to_index
+        self.title_type = self.type_names.index("title") if "title" in self.type_names else -1
+        self._hub_costs = {}
+
+    @classmethod
+    def from_edges(cls, node_ids, names, types, src, dst):
+        """
+        由节点列表和无向边 (src[i], dst[i])（整数编号）构建 CSR 图。
+        """
+        type_names = list(dict.fromkeys(types))
+        type_code = {name: code for code, name in enumerate(type_names)}
+        node_type = np.array([type_code[t] for t in types], dtype=np.uint8)
+
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        # 无向图：每条边在两端各存一次，自环只存一次
+        loop = src == dst
+        rows = np.concatenate([src, dst[~loop]])
+        cols = np.concatenate([dst, src[~loop]])
+        order = np.argsort(rows, kind="stable")
+        indices = cols[order].astype(np.int32)
+        counts = np.bincount(rows, minlength=len(node_ids))
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(indptr, indices, node_type, type_names, list(node_ids), list(names))
+
+    @classmethod
+    def from_networkx(cls, G):
+        node_ids = list(G.nodes)
+        id_to_index = {node_id: i for i, node_id in enumerate(node_ids)}
+        names = [G.nodes[node_id].get("name", "") for node_id in node_ids]
+        types = [G.nodes[node_id].get("type", "") for node_id in node_ids]
+        src = [id_to_index[u] for u, v in G.edges]
+        dst = [id_to_index[v] for u, v in G.edges]
+        return cls.from_edges(node_ids, names, types, src, dst)
+
+    @classmethod
+    def from_edge_list(cls, directory):
+        """
+        从 graph_build.py 写出的边表目录加载：
+          nodes.jsonl  每行 [节点 id, 类型, 名称]，论文在前、关键词在后，行号即整数编号
+          edges.npy    int32 (E, 2)，每行 [论文编号, 关键词编号]
+          meta.json    格式版本与节点、边数，最后写入
+        """
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != EDGE_LIST_FORMAT:
+            raise ValueError(f"边表格式版本 {meta.get('format')} 与当前版本 {EDGE_LIST_FORMAT} 不一致")
+        node_ids, types, names = [], [], []
+        with open(os.path.join(directory, "nodes.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                node_id, node_type, name = json.loads(line)
+                node_ids.append(node_id)
+                types.append(node_type)
+                names.append(name)
+        edges = np.load(os.path.join(directory, "edges.npy"), mmap_mode="r")
+        return cls.from_edges(node_ids, names, types, edges[:, 0], edges[:, 1])
+
+    def to_networkx(self):
+        import networkx as nx
+
+        G = nx.Graph()
+        for node_id, code, name in zip(self.node_ids, self.node_type.tolist(), self.names):
+            G.add_node(node_id, type=self.type_names[code], name=name)
+        rows = np.repeat(np.arange(len(self.node_ids)), np.diff(self.indptr))
+        G.add_edges_from((self.node_ids[u], self.node_ids[v])
+                         for u, v in zip(rows.tolist(), self.indices.tolist()) if u <= v)
+        return G
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __contains__(self, node_id):
+        return node_id in self.id_to_index
+
+    def node_name(self, node_id):
+        i = self.id_to_index.get(node_id)
+        return self.names[i] if i is not None else ""
+
+    def node_type_name(self, node_id):
+        i = self.id_to_index.get(node_id)
+        return self.type_names[self.node_type[i]] if i is not None else ""
+
+    def neighbors(self, node_id):
+        i = self.id_to_index[node_id]
+        return [self.node_ids[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]].tolist()]
+
+    def _gather(self, nodes, degree_cap=0):
+        """
+        返回 nodes 中每个节点的所有邻居，以及每个邻居对应的来源节点在 nodes 中的位置。
+        degree_cap > 0 时，邻居数超过它的节点只取 degree_cap 个邻居：在邻接表上等间隔抽样，结果是确定的。
+        """
+        starts = self.indptr[nodes]
+        degrees = self.indptr[nodes + 1] - starts
+        counts = np.minimum(degrees, degree_cap) if degree_cap else degrees
+        total = int(counts.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        owner = np.repeat(np.arange(len(nodes)), counts)
+        rank = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        if degree_cap:
+            rank = rank * degrees[owner] // counts[owner]
+        return self.indices[rank + starts[owner]].astype(np.int64), owner
+
+    def hub_costs(self, hub_weight):
+        """
+        每个节点作为路径中间节点时附加的距离：hub_weight * ln(度数 / 同类节点的平均度数)，不低于 0。
+        与 IDF 类似，连接的节点越多，经过它的路径越不能说明论文与关键词相关。
+        取值为 1/1024 的整数倍，按任意顺序求和结果都相同，BFS 与邻域索引的排序因此完全一致。
+        """
+        costs = self._hub_costs.get(hub_weight)
+        if costs is None:
+            degrees = np.diff(self.indptr).astype(np.float64)
+            ratio = np.ones(len(degrees))
+            for t in np.unique(self.node_type).tolist():
+                sel = self.node_type == t
+                ratio[sel] = np.maximum(degrees[sel], 1) / max(degrees[sel].mean(), 1.0)
+            costs = np.round(np.maximum(np.log(ratio), 0) * hub_weight * 1024) / 1024
+            self._hub_costs[hub_weight] = costs
+        return costs
+
+    def find_nodes_within_distance(self, start_node_id, max_distance=5):
+        """
+        与 graph_retrieve.find_nodes_within_distance 相同：
+        返回距离不超过 max_distance 的论文节点 [(节点, 距离)]。
+        """
+        dists = self.expand_from_seeds([start_node_id], max_distance=max_distance)
+        return [(node_id, d[start_node_id]) for node_id, d in dists.items()]
+
+    def expand_from_seeds(self, seed_ids, max_distance=5):
+        """
+        与 graph_retrieve.expand_from_seeds 相同的多源 BFS，在数组上逐层进行：
+        每个节点一个 uint64 位掩码，记录已经到达它的种子（超过 64 个种子时分批）。
+
+        返回：
+          {论文节点: {种子节点: 距离}}，内层按种子顺序排列
+        """
+        seeds = [seed for seed in dict.fromkeys(seed_ids) if seed in self.id_to_index]
+        hits = {}
+        for batch_start in range(0, len(seeds), 64):
+            batch = [self.id_to_index[s] for s in seeds[batch_start:batch_start + 64]]
+            for frontier, masks, dist in self._expand_levels(batch, max_distance):
+                is_title = self.node_type[frontier] == self.title_type
+                for node, mask in zip(frontier[is_title].tolist(), masks[is_title].tolist()):
+                    lst = hits.setdefault(node, [])
+                    while mask:
+                        low = mask & -mask
+                        lst.append((batch_start + low.bit_length() - 1, dist))
+                        mask ^= low
+        return {
+            self.node_ids[node]: {seeds[i]: d for i, d in sorted(lst)}
+            for node, lst in hits.items()
+        }
+
+    def rank_from_seeds(self, seed_ids, max_distance=5, miss_penalty=7, parents=None,
+                        degree_cap=0, max_visited=0, hub_weight=0.0, stats=None):
+        """
+        多源 BFS 与距离汇总全部在数组上完成，等价于
+        rank_by_distance(expand_from_seeds(...)) 但不为每个 (论文, 种子) 生成 Python 对象。
+        最多支持 64 个种子（BM25 每次只返回 10 个关键词）。
+        parents 为字典时同时记录前驱指针 {种子节点: {节点: 朝向该种子的上一个节点}}，
+        与 graph_retrieve.expand_from_seeds 相同，可用 graph_retrieve.rebuild_path 重建解释路径。
+
+        枢纽节点控制（默认全部关闭，结果与不加控制时相同）：
+          degree_cap: 除种子外，邻居数超过它的节点只向抽样的 degree_cap 个邻居扩展
+          max_visited: 每次查询最多访问的节点数，超过时截断当前层并停止扩展
+          hub_weight: 路径上每个中间节点附加 hub_costs(hub_weight) 的距离（沿 BFS 前驱计算），总距离为浮点数
+        stats 为字典时写入 visited（访问的节点数）和 truncated（是否因 max_visited 截断）。
+
+        返回：
+          ranked: 按总距离升序排列的 (论文节点, 总距离) 列表，同分时按节点编号排列
+          paper_keys: {论文节点: [到达它的种子节点]}，种子按原顺序排列
+        """
+        seeds = [seed for seed in dict.fromkeys(seed_ids) if seed in self.id_to_index]
+        if len(seeds) > 64:
+            raise ValueError("rank_from_seeds 最多支持 64 个种子节点")
+        n = len(self.node_ids)
+        seed_index = [self.id_to_index[s] for s in seeds]
+        reached = np.zeros(n, dtype=np.uint64)
+        dist_sum = np.zeros(n, dtype=np.int64)
+        links = [[] for _ in seeds] if parents is not None or hub_weight else None
+        for frontier, masks, dist in self._expand_levels(seed_index, max_distance, links=links,
+                                                         degree_cap=degree_cap, max_visited=max_visited,
+                                                         stats=stats):
+            reached[frontier] |= masks
+            dist_sum[frontier] += _popcount(masks) * dist
+        if hub_weight:
+            costs = self.hub_costs(hub_weight)
+            penalty = np.zeros(n)
+            for seed, chunks in zip(seed_index, links):
+                if not chunks:
+                    continue
+                nodes = np.concatenate([nodes for nodes, _ in chunks])
+                preds = np.concatenate([preds for _, preds in chunks])
+                targets = nodes[self.node_type[nodes] == self.title_type]
+                penalty[targets] += _path_costs(targets, nodes, preds, seed, costs, max_distance)
+        if parents is not None:
+            node_ids = self.node_ids
+            for seed, chunks in zip(seeds, links):
+                seed_parents = parents.setdefault(seed, {})
+                for nodes, preds in chunks:
+                    seed_parents.update(zip([node_ids[i] for i in nodes.tolist()],
+                                            [node_ids[i] for i in preds.tolist()]))
+
+        papers = np.flatnonzero((reached != 0) & (self.node_type == self.title_type))
+        masks = reached[papers]
+        totals = dist_sum[papers] + miss_penalty * (len(seeds) - _popcount(masks))
+        if hub_weight:
+            totals = totals + penalty[papers]
+        order = np.argsort(totals, kind="stable")
+        papers, masks, totals = papers[order], masks[order], totals[order]
+
+        # 同一个位掩码对应同一组关键词，只解码一次
+        decoded = {}
+        for mask in np.unique(masks).tolist():
+            decoded[mask] = [seeds[i] for i in range(len(seeds)) if mask >> i & 1]
+        paper_ids = [self.node_ids[i] for i in papers.tolist()]
+        ranked = list(zip(paper_ids, totals.tolist()))
+        paper_keys = {pid: decoded[mask] for pid, mask in zip(paper_ids, masks.tolist())}
+        return ranked, paper_keys
+
+    def _expand_levels(self, seed_index, max_distance, links=None, degree_cap=0, max_visited=0, stats=None):
+        """
+        逐层产出 (本层节点, 本层新到达的种子位掩码, 距离)，seed_index 最多 64 个。
+        links 为每个种子一个列表时，追加每层新到达节点及其前驱的 (节点数组, 前驱数组)。
+        degree_cap > 0 时，种子以外邻居数超过它的节点只向抽样的 degree_cap 个邻居扩展（见 _gather）。
+        最后一层只产出论文节点。max_visited > 0 时访问的不同节点总数不超过 max_visited：
+        超过时本层首次访问的节点只保留编号最小的一部分，并停止扩展。
+        stats 为字典时写入 visited（访问的不同节点数）与 truncated。
+        """
+        reached = np.zeros(len(self.node_ids), dtype=np.uint64)
+        frontier = np.asarray(seed_index, dtype=np.int64)
+        masks = np.left_shift(np.uint64(1), np.arange(len(seed_index), dtype=np.uint64))
+        frontier, masks = _merge_masks(frontier, masks)
+        room = max_visited if max_visited else None
+        visited = 0
+        truncated = False
+
+        for dist in range(max_distance + 1):
+            keep, cut = self._level_keep(frontier, dist == max_distance and dist > 0, reached, room)
+            frontier, masks = frontier[keep], masks[keep]
+            truncated |= cut
+            if len(frontier) == 0:
+                break
+            # 多源 BFS 中同一节点可能在不同层被不同种子到达，只在第一次到达时计数
+            fresh = int(np.count_nonzero(reached[frontier] == 0))
+            visited += fresh
+            if room is not None:
+                room -= fresh
+            reached[frontier] |= masks
+            yield frontier, masks, dist
+            if dist >= max_distance or truncated:
+                break
+
+            # 只向邻居传播尚未到达该邻居的种子位；种子自身的邻居不抽样
+            neighbors, owner = self._gather(frontier, degree_cap if dist > 0 else 0)
+            new_masks = masks[owner] & ~reached[neighbors]
+            keep = new_masks != 0
+            neighbors, owner, new_masks = neighbors[keep], owner[keep], new_masks[keep]
+            frontier_next, masks_next = _merge_masks(neighbors, new_masks)
+            if room is not None:
+                # 只为下一层保留下来的节点记录前驱
+                keep, _ = self._level_keep(frontier_next, dist + 1 == max_distance, reached, room)
+                if not keep.all():
+                    keep = np.isin(neighbors, frontier_next[keep])
+                    neighbors, owner, new_masks = neighbors[keep], owner[keep], new_masks[keep]
+            if links is not None:
+                self._record_links(frontier, neighbors, owner, new_masks, links)
+            frontier, masks = frontier_next, masks_next
+        if stats is not None:
+            stats["visited"] = visited
+            stats["truncated"] = truncated
+
+    def _level_keep(self, frontier, last, reached, room):
+        """
+        本层保留的节点（布尔掩码）与是否截断：最后一层只保留论文；
+        room 不为 None 时，首次访问的节点最多保留 room 个（按编号），已访问过的节点不受影响。
+        """
+        keep = self.node_type[frontier] == self.title_type if last else np.ones(len(frontier), dtype=bool)
+        if room is None:
+            return keep, False
+        new = np.flatnonzero(keep & (reached[frontier] == 0))
+        if len(new) <= room:
+            return keep, False
+        keep[new[room:]] = False
+        return keep, True
+
+    @staticmethod
+    def _record_links(frontier, neighbors, owner, new_masks, links):
+        # 按种子位拆分本层的 (邻居, 来源) 对，同一邻居被多个来源到达时取第一个
+        present = int(np.bitwise_or.reduce(new_masks)) if len(new_masks) else 0
+        while present:
+            low = present & -present
+            i = low.bit_length() - 1
+            present ^= low
+            sel = (new_masks & np.uint64(low)) != 0
+            nodes, first = np.unique(neighbors[sel], return_index=True)
+            links[i].append((nodes, frontier[owner[sel][first]]))
+
+    def shortest_path(self, source_id, target_id, max_depth=None):
+        """
+        无权最短路径，返回从 source 到 target 的节点 id 列表；
+        节点不存在、不连通或路径长于 max_depth 条边时返回空列表。
+
+        双向 BFS：每次扩展两侧中较小的一层，访问的节点数远少于单向搜索；
+        只有已访问的节点记录在字典中，不分配与全图等长的数组。
+        """
+        if source_id not in self.id_to_index or target_id not in self.id_to_index:
+            return []
+        source = self.id_to_index[source_id]
+        target = self.id_to_index[target_id]
+        if source == target:
+            return [source_id]
+        # 每侧：{节点: (前驱, 深度)}
+        visited = ({source: (-1, 0)}, {target: (-1, 0)})
+        frontiers = [np.array([source], dtype=np.int64), np.array([target], dtype=np.int64)]
+        depths = [0, 0]
+        while len(frontiers[0]) and len(frontiers[1]):
+            if max_depth is not None and depths[0] + depths[1] >= max_depth:
+                return []
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            mine, other = visited[side], visited[1 - side]
+            frontier = frontiers[side]
+            depth = depths[side] + 1
+            neighbors, owner = self._gather(frontier)
+            next_nodes = []
+            meet = None
+            for node, i in zip(neighbors.tolist(), owner.tolist()):
+                if node in mine:
+                    continue
+                mine[node] = (int(frontier[i]), depth)
+                next_nodes.append(node)
+                # 同一层内可能在多个节点相遇，取另一侧深度最小的，保证路径最短
+                if node in other and (meet is None or other[node][1] < other[meet][1]):
+                    meet = node
+            if meet is not None:
+                forward = _walk(visited[0], meet)
+                backward = _walk(visited[1], meet)
+                path = forward[::-1] + backward[1:]
+                return [self.node_ids[i] for i in path]
+            frontiers[side] = np.array(next_nodes, dtype=np.int64)
+            depths[side] = depth
+        return []
+
+
+def _walk(visited, node):
+    # 沿前驱走回起点，返回 [node, ..., 起点]
+    path = [node]
+    while visited[path[-1]][0] >= 0:
+        path.append(visited[path[-1]][0])
+    return path
+
+
+def _path_costs(targets, nodes, preds, seed, costs, max_steps):
+    """
+    沿前驱指针从 targets 走回 seed，累加途经的中间节点（不含 targets 与 seed）的 costs。
+    nodes / preds 为该种子到达的全部节点及其前驱。
+    """
+    order = np.argsort(nodes, kind="stable")
+    nodes, preds = nodes[order], preds[order]
+    total = np.zeros(len(targets))
+    current = np.array(targets, dtype=np.int64)
+    active = np.flatnonzero(current != seed)
+    for _ in range(max_steps):
+        if len(active) == 0:
+            break
+        pred = preds[np.searchsorted(nodes, current[active])].astype(np.int64)
+        inner = pred != seed
+        active, pred = active[inner], pred[inner]
+        total[active] += costs[pred]
+        current[active] = pred
+    return total
+
+
+def _popcount(masks):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(masks).astype(np.int64)
+    bits = np.unpackbits(masks.astype(np.uint64).view(np.uint8)).reshape(-1, 64)
+    return bits.sum(axis=1).astype(np.int64)
+
+
+def _merge_masks(nodes, masks):
+    """
+    合并同一节点的多个位掩码（按位或），返回按节点编号排序的 (节点, 掩码)。
+    """
+    if len(nodes) == 0:
+        return nodes, masks
+    order = np.argsort(nodes, kind="stable")
+    nodes, masks = nodes[order], masks[order]
+    unique_nodes, starts = np.unique(nodes, return_index=True)
+    return unique_nodes, np.bitwise_or.reduceat(masks, starts)
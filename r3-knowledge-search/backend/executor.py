@@ -0,0 +1,101 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# 阻塞 I/O 使用的线程数（Neo4j 接口已改用异步驱动，见 neo4j_access.py）
+IO_WORKERS = int(os.environ.get("R3_IO_WORKERS", 8))
+# CPU 密集阶段（BM25、BFS、频繁模式挖掘、路径解释）使用的进程数，0 表示改用线程池
+CPU_WORKERS = int(os.environ.get("R3_CPU_WORKERS", os.cpu_count() or 1))
+# 每个池允许的最大排队 + 执行中任务数，超过后直接返回 503
+MAX_PENDING = int(os.environ.get("R3_MAX_PENDING", 64))
+
+
+class Saturated(Exception):
+    """
+    任务池已满，请求被拒绝（由 back.py 转换为 HTTP 503）。
+    """
+
+
+def _noop():
+    return None
+
+
+class ExecutionLayer:
+    """
+    把同步的检索阶段从事件循环中移出：
+      - run_io: 阻塞 I/O 交给线程池
+      - run_cpu: CPU 密集的图计算交给进程池
+
+    进程池使用 fork 启动，子进程直接继承父进程中已加载的 CSR 图、BM25 索引和元数据（写时复制，只读共享），
+    提交给进程池的只有查询参数和结果。不支持 fork 的平台上退回线程池。
+
+    fork 只复制调用它的线程，其他线程持有的锁在子进程中永远不会释放，
+    因此 start() 必须在数据库驱动建立连接、提交任何 I/O 任务之前调用（back.py 在模块导入的最后一步调用）。
+    uvicorn 此时已在运行事件循环，子进程会继承循环的文件描述符，但 worker 只执行提交的函数，不使用它们；
+    numpy / BLAS 等原生库自带的线程池不在此列，它们自行处理 fork。
+
+    每个池的排队深度有上限，超过时抛出 Saturated，而不是让请求无限排队拖高尾延迟。
+    计数只在事件循环线程中修改，无需加锁。
+    """
+
+    def __init__(self, io_workers=IO_WORKERS, cpu_workers=CPU_WORKERS, max_pending=MAX_PENDING):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.max_pending = max_pending
+        self.io_pool = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="r3-io")
+        self.cpu_pool = None
+        self.pending = {"io": 0, "cpu": 0}
+        self.rejected = {"io": 0, "cpu": 0}
+
+    def start(self):
+        """
+        创建并预热 CPU 进程池。应在全部数据加载之后、产生其他线程（数据库连接、I/O 任务）之前调用。
+        fork 上下文下所有 worker 进程在第一次提交时一次性创建，之后才启动进程池自己的管理线程。
+        """
+        if self.cpu_pool is not None or self.cpu_workers <= 0:
+            return
+        if "fork" not in multiprocessing.get_all_start_methods():
+            return
+        self.cpu_pool = ProcessPoolExecutor(
+            max_workers=self.cpu_workers,
+            mp_context=multiprocessing.get_context("fork"),
+        )
+        # 提交空任务，让所有 worker 进程在启动时就 fork 出来
+        for future in [self.cpu_pool.submit(_noop) for _ in range(self.cpu_workers)]:
+            future.result()
+
+    def shutdown(self):
+        if self.cpu_pool is not None:
+            self.cpu_pool.shutdown(wait=False, cancel_futures=True)
+            self.cpu_pool = None
+        self.io_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run_io(self, fn, *args):
+        return await self._run("io", self.io_pool, fn, args)
+
+    async def run_cpu(self, fn, *args):
+        # 进程池未启动（例如未 fork 或 CPU_WORKERS=0）时仍在线程池中执行，至少不阻塞事件循环
+        if self.cpu_pool is None:
+            return await self._run("cpu", self.io_pool, fn, args)
+        return await self._run("cpu", self.cpu_pool, fn, args)
+
+    async def _run(self, kind, pool, fn, args):
+        if self.pending[kind] >= self.max_pending:
+            self.rejected[kind] += 1
+            raise Saturated(f"{kind} 任务池已满（{self.max_pending} 个任务排队或执行中）")
+        self.pending[kind] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, fn, *args)
+        finally:
+            self.pending[kind] -= 1
+
+    def stats(self):
+        return {
+            "io_workers": self.io_workers,
+            "cpu_workers": self.cpu_workers if self.cpu_pool is not None else 0,
+            "max_pending": self.max_pending,
+            "pending": dict(self.pending),
+            "rejected": dict(self.rejected),
+        }
@@ -1,63 +1,483 @@
+import argparse
 import json
+import os
+import time
+
 import networkx as nx
-import matplotlib.pyplot as plt
-
-# 文件路径
-file_path = 'result_id.jsonl'
-
-titles = []           # 用于存储文章标题
-keywords_set = set()  # 用于存储所有不重复的关键词
-edges = []            # 用于存储文章标题和关键词之间的关系
-ids=[]
-
-# 读取 JSONL 文件数据
-with open(file_path, 'r', encoding='utf-8') as f:
-    for line in f:
-        if line.strip():  # 忽略空行
-            data = json.loads(line)
-            id = data.get('id', '').strip()
-            if id:
-                ids.append(id)
-            title = data.get('title', '').strip()
+import numpy as np
+from array import array
+
+from csr_graph import EDGE_LIST_FORMAT, CSRGraph
+
+# 文件路径（相对于 --dir 指定的数据目录）
+RESULT_FILE = 'result_id.jsonl'
+GRAPH_FILE = 'graph3.gml'
+TITLE_INDEX_FILE = 'title_index.json'
+KEYWORD_INDEX_FILE = 'keyword_index.json'
+# 关键词 id 分配状态：出现过的全部关键词及其 id（关键词被删除后仍保留，id 不会复用）、下一个可分配的 id、图版本号
+STATE_FILE = 'graph_state.json'
+# 每次构建追加一行变更记录，下游索引据此只更新变化的部分
+CHANGELOG_FILE = 'graph_changelog.jsonl'
+# 紧凑边表目录（格式见 CSRGraph.from_edge_list），流式构建只写这种格式，不写 GML
+EDGE_LIST_DIR = 'graph_edges'
+# 流式构建的边缓冲区大小（边数），写满后追加到磁盘
+EDGE_CHUNK = 1 << 20
+
+
+def normalize_record(data):
+    """
+    从 JSONL 记录中取出 (论文 id, 标题, 关键词列表)，关键词去空白、转小写并按首次出现去重。
+    """
+    paper_id = str(data.get('id', '')).strip()
+    title = data.get('title', '').strip()
+    keywords = []
+    for kw in data.get('keywds', []):
+        kw = kw.strip().lower()
+        if kw:
+            keywords.append(kw)
+    return paper_id, title, list(dict.fromkeys(keywords))
+
+
+def read_papers(file_path):
+    """
+    读取提取结果 JSONL，返回 {论文 id: (标题, 关键词列表)}，保持文件中的顺序。
+    """
+    papers = {}
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():  # 忽略空行
+                paper_id, title, keywords = normalize_record(json.loads(line))
+                if paper_id:
+                    papers[paper_id] = (title, keywords)
+    return papers
+
+
+def read_delta(file_path):
+    """
+    读取增量文件，每行一个操作：
+      {"op": "upsert", "id": ..., "title": ..., "keywds": [...]}  新增或更新论文（省略的字段保持原值）
+      {"op": "delete", "id": ...}                                  删除论文
+    op 省略时视为 upsert。
+    """
+    ops = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                data = json.loads(line)
+                op = data.get('op', 'upsert')
+                if op not in ('upsert', 'delete'):
+                    raise ValueError(f"未知的增量操作: {op}")
+                ops.append((op, data))
+    return ops
+
+
+def apply_delta(papers, ops):
+    """
+    在 papers 的副本上按顺序执行增量操作，返回新的 {论文 id: (标题, 关键词列表)}。
+    """
+    papers = dict(papers)
+    for op, data in ops:
+        paper_id, title, keywords = normalize_record(data)
+        if not paper_id:
+            continue
+        if op == 'delete':
+            papers.pop(paper_id, None)
+            continue
+        old_title, old_keywords = papers.get(paper_id, ('', []))
+        papers[paper_id] = (
+            title if 'title' in data else old_title,
+            keywords if 'keywds' in data else old_keywords,
+        )
+    return papers
+
+
+def load_graph(graph_file, edge_list_dir=None):
+    """
+    从已有的图恢复 ({论文 id: (标题, 关键词列表)}, {关键词: 关键词 id})，图不存在时返回两个空字典。
+    边表目录存在时优先从边表读取（流式构建只写边表；两者都存在时内容一致，边表读取更快）。
+    """
+    if edge_list_dir and os.path.exists(os.path.join(edge_list_dir, 'meta.json')):
+        G = CSRGraph.from_edge_list(edge_list_dir).to_networkx()
+    elif os.path.exists(graph_file):
+        G = nx.read_gml(graph_file)
+    else:
+        return {}, {}
+    keyword_index = {attrs['name']: node for node, attrs in G.nodes(data=True) if attrs.get('type') == 'keyword'}
+    papers = {}
+    for node, attrs in G.nodes(data=True):
+        if attrs.get('type') == 'title':
+            papers[node] = (attrs.get('name', ''), [G.nodes[nb]['name'] for nb in G.neighbors(node)
+                                                    if G.nodes[nb].get('type') == 'keyword'])
+    return papers, keyword_index
+
+
+def load_state(state_file, keyword_index):
+    """
+    读取关键词 id 分配状态。状态文件不存在时（例如旧版本构建的图）用现有图中的关键词 id 初始化，
+    使第一次增量构建不改变已有关键词的 id。
+    """
+    if os.path.exists(state_file):
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    ids = [int(idx) for idx in keyword_index.values() if str(idx).isdigit()]
+    return {
+        'version': 0,
+        'next_keyword_id': max(ids) + 1 if ids else 0,
+        'keyword_ids': dict(keyword_index),
+    }
+
+
+def assign_keyword_ids(live, state):
+    """
+    返回当前图中关键词（live）的 {关键词: id}，按 id 排列。
+    已分配过 id 的关键词沿用原 id；新关键词按字典序依次分配 next_keyword_id 起的递增 id，
+    因此同样的输入总是得到同样的 id，与集合的遍历顺序无关。
+    """
+    keyword_ids = state['keyword_ids']
+    for kw in sorted(live - keyword_ids.keys()):
+        keyword_ids[kw] = str(state['next_keyword_id'])
+        state['next_keyword_id'] += 1
+    return {kw: keyword_ids[kw] for kw in sorted(live, key=lambda kw: int(keyword_ids[kw]))}
+
+
+def build_graph(papers, keyword_index):
+    """
+    由论文和关键词 id 构建二部图：论文节点在前（保持 papers 的顺序），关键词节点按 id 排列。
+    """
+    G = nx.Graph()
+
+    # 添加文章标题节点（设置属性 type 为 'title' 和对应的 index）
+    for paper_id, (title, _) in papers.items():
+        G.add_node(paper_id, type='title', name=title)
+
+    # 添加关键词节点（设置属性 type 为 'keyword' 和对应的 index）
+    for kw, idx in keyword_index.items():
+        G.add_node(idx, type='keyword', name=kw)
+
+    # 添加边：每条边表示文章标题与关键词之间的关联
+    for paper_id, (_, keywords) in papers.items():
+        for kw in keywords:
+            G.add_edge(paper_id, keyword_index[kw])
+    return G
+
+
+def _changed(old, new):
+    # 关键词顺序不影响图结构，只比较标题和关键词集合
+    return old[0] != new[0] or set(old[1]) != set(new[1])
+
+
+def diff_papers(old_papers, new_papers, old_keyword_index, keyword_index):
+    """
+    比较构建前后的论文与关键词，返回变更记录（边以 [论文 id, 关键词 id] 表示）。
+    """
+    def edges(papers, index):
+        return {(paper_id, index[kw]) for paper_id, (_, keywords) in papers.items() for kw in keywords}
+
+    old_edges = edges(old_papers, old_keyword_index)
+    new_edges = edges(new_papers, keyword_index)
+    return {
+        'papers_added': [pid for pid in new_papers if pid not in old_papers],
+        'papers_updated': [pid for pid in new_papers if pid in old_papers and _changed(old_papers[pid], new_papers[pid])],
+        'papers_deleted': [pid for pid in old_papers if pid not in new_papers],
+        'keywords_added': {kw: idx for kw, idx in keyword_index.items() if kw not in old_keyword_index},
+        'keywords_removed': {kw: idx for kw, idx in old_keyword_index.items() if kw not in keyword_index},
+        'edges_added': sorted(new_edges - old_edges),
+        'edges_removed': sorted(old_edges - new_edges),
+    }
+
+
+def _write_json(path, data, **kwargs):
+    # 先写临时文件再替换，检索服务或快照编译不会读到写了一半的文件
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **kwargs)
+    os.replace(tmp, path)
+
+
+def _read_keyword_list(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _update_keyword_list(path, added, removed):
+    """
+    更新候选关键词文件（如 new_kwds1.txt）：删除已移除的关键词，追加新增的关键词，其余行保持原样。
+    """
+    lines = _read_keyword_list(path)
+    existing = set(lines)
+    lines = [kw for kw in lines if kw not in removed] + sorted(kw for kw in added if kw not in existing)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.writelines(kw + '\n' for kw in lines)
+    os.replace(tmp, path)
+
+
+def write_edge_list(papers, keyword_index, directory):
+    """
+    把内存中的论文和关键词写成边表目录（与流式构建的输出格式相同）。
+    """
+    os.makedirs(directory, exist_ok=True)
+    paper_rows = {paper_id: row for row, paper_id in enumerate(papers)}
+    keyword_rows = {kw: len(papers) + rank for rank, kw in enumerate(keyword_index)}
+    with open(os.path.join(directory, 'nodes.jsonl.tmp'), 'w', encoding='utf-8') as f:
+        for paper_id, (title, _) in papers.items():
+            f.write(json.dumps([paper_id, 'title', title], ensure_ascii=False) + '\n')
+        for kw, idx in keyword_index.items():
+            f.write(json.dumps([idx, 'keyword', kw], ensure_ascii=False) + '\n')
+    edges = np.array([(paper_rows[paper_id], keyword_rows[kw])
+                      for paper_id, (_, keywords) in papers.items() for kw in keywords],
+                     dtype=np.int32).reshape(-1, 2)
+    np.save(os.path.join(directory, 'edges.tmp.npy'), edges)
+    _finish_edge_list(directory, len(papers), len(keyword_index), len(edges))
+
+
+def _finish_edge_list(directory, papers, keywords, edges):
+    # meta.json 最后写入，读取方以它的存在判断边表完整
+    os.replace(os.path.join(directory, 'nodes.jsonl.tmp'), os.path.join(directory, 'nodes.jsonl'))
+    os.replace(os.path.join(directory, 'edges.tmp.npy'), os.path.join(directory, 'edges.npy'))
+    _write_json(os.path.join(directory, 'meta.json'),
+                {'format': EDGE_LIST_FORMAT, 'papers': papers, 'keywords': keywords, 'edges': edges})
+
+
+def update_graph(transform, mode, data_dir='.', keyword_list=None):
+    """
+    读取已有的图，用 transform(旧论文字典) 得到新的论文字典，分配关键词 id 并写出图、索引、状态和变更记录。
+    没有任何变化时不写文件。返回变更记录，没有变化时返回 None。
+
+    这是保持 id 稳定的重建，而不是增量 I/O：无论变化多少，都会完整读取旧图（GML 或边表），
+    并重写整个图、title_index.json 和 keyword_index.json。"增量"体现在关键词 id 不变、
+    变更记录只包含差异，下游索引（neighborhood_index.py update）据此只重算受影响的部分。
+    没有旧图时（第一次构建）变更记录只写计数并标记 rebuild，不列出全部论文、关键词和边。
+    """
+    paths = {name: os.path.join(data_dir, name)
+             for name in (GRAPH_FILE, TITLE_INDEX_FILE, KEYWORD_INDEX_FILE, STATE_FILE, CHANGELOG_FILE)}
+    edge_list_dir = os.path.join(data_dir, EDGE_LIST_DIR)
+    old_papers, old_keyword_index = load_graph(paths[GRAPH_FILE], edge_list_dir)
+    state = load_state(paths[STATE_FILE], old_keyword_index)
+    new_papers = transform(old_papers)
+    keyword_index = assign_keyword_ids({kw for _, keywords in new_papers.values() for kw in keywords}, state)
+
+    changes = diff_papers(old_papers, new_papers, old_keyword_index, keyword_index)
+    if old_papers and not any(changes.values()):
+        return None
+    state['version'] += 1
+    if old_papers:
+        entry = {'version': state['version'], 'time': time.time(), 'mode': mode, **changes}
+    else:
+        # 第一次构建的差异就是整个图，下游只能整体重建，记录计数即可
+        entry = {'version': state['version'], 'time': time.time(), 'mode': mode, 'rebuild': True,
+                 'papers': len(new_papers), 'keywords': len(keyword_index), 'edges': len(changes['edges_added'])}
+
+    G = build_graph(new_papers, keyword_index)
+    tmp = paths[GRAPH_FILE] + '.tmp'
+    nx.write_gml(G, tmp)
+    os.replace(tmp, paths[GRAPH_FILE])
+    # 已经使用边表时同步更新，保证两种格式内容一致
+    if os.path.exists(os.path.join(edge_list_dir, 'meta.json')):
+        write_edge_list(new_papers, keyword_index, edge_list_dir)
+
+    # 为文章标题和关键词生成唯一索引
+    # 假设文章标题在文件中是唯一的
+    title_index = {title: paper_id for paper_id, (title, _) in new_papers.items() if title}
+    _write_json(paths[TITLE_INDEX_FILE], title_index, indent=2)
+    _write_json(paths[KEYWORD_INDEX_FILE], keyword_index, indent=2)
+    if keyword_list:
+        _update_keyword_list(keyword_list, changes['keywords_added'], changes['keywords_removed'])
+    _write_json(paths[STATE_FILE], state)
+
+    # 变更记录最后写入：记录存在即说明对应版本的文件已全部写完
+    with open(paths[CHANGELOG_FILE], 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return entry
+
+
+def full_build(result_file=RESULT_FILE, data_dir='.', keyword_list=None):
+    """
+    用完整的提取结果重建图。已有关键词沿用原 id，不在结果中的论文视为删除。
+    """
+    return update_graph(lambda old_papers: read_papers(result_file), 'full', data_dir, keyword_list)
+
+
+def incremental_build(delta_file, data_dir='.', keyword_list=None):
+    """
+    在已有的图上应用增量文件（新增、更新、删除论文）。仍会读取并重写整个图，见 update_graph。
+    """
+    ops = read_delta(delta_file)
+    return update_graph(lambda old_papers: apply_delta(old_papers, ops), 'delta', data_dir, keyword_list)
+
+
+def _duplicate_ids(result_file, id_hashes):
+    """
+    id_hashes 为按读取顺序记录的论文 id 哈希。哈希有重复时重新扫描输入，
+    只统计哈希冲突的 id，排除不同 id 的哈希碰撞，返回真正重复的 id（排序后）。
+    """
+    hashes = np.sort(np.frombuffer(id_hashes, dtype=np.int64))
+    candidates = set(hashes[1:][hashes[1:] == hashes[:-1]].tolist())
+    if not candidates:
+        return []
+    counts = {}
+    with open(result_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            paper_id = normalize_record(json.loads(line))[0]
+            if paper_id and hash(paper_id) in candidates:
+                counts[paper_id] = counts.get(paper_id, 0) + 1
+    return sorted(paper_id for paper_id, count in counts.items() if count > 1)
+
+
+def stream_build(result_file=RESULT_FILE, data_dir='.', keyword_list=None, edge_chunk=EDGE_CHUNK):
+    """
+    单遍流式全量构建，内存占用与论文数无关，适合数百万篇论文的输入：
+      - 论文节点逐行写入 nodes.jsonl，title_index.json 边读边写；
+      - 边以论文 id 对应的行号为键，(论文行号, 关键词临时编号) 以 int32 对缓存在定长缓冲区中，
+        缓冲区写满即追加到磁盘上的临时文件；
+      - 内存中只保留关键词 -> 临时编号的字典。
+    读完后按 assign_keyword_ids 的规则确定关键词 id，再分块把临时编号改写为关键词的节点编号，得到 edges.npy。
+    输出边表目录与 keyword_index.json / title_index.json，不写 GML。
+    论文 id 必须唯一：读取时记下每个 id 的 64 位哈希（每篇论文 8 字节），读完后排序检查，
+    有重复 id 时删除临时文件并抛出 ValueError，不写出任何结果
+    （非流式构建对重复 id 保留最后一条记录，流式构建无法回改已写出的节点行）。
+    返回变更记录（流式构建不计算与旧图的差异，下游应整体重建）。
+    """
+    directory = os.path.join(data_dir, EDGE_LIST_DIR)
+    os.makedirs(directory, exist_ok=True)
+    keyword_index_file = os.path.join(data_dir, KEYWORD_INDEX_FILE)
+    title_index_file = os.path.join(data_dir, TITLE_INDEX_FILE)
+    edges_tmp = os.path.join(directory, 'edges.bin.tmp')
+
+    # 旧图的关键词 id 从 keyword_index.json 取，不需要读取整个旧图
+    old_keyword_index = {}
+    if os.path.exists(keyword_index_file):
+        with open(keyword_index_file, 'r', encoding='utf-8') as f:
+            old_keyword_index = json.load(f)
+    state = load_state(os.path.join(data_dir, STATE_FILE), old_keyword_index)
+
+    slots = {}  # 关键词 -> 临时编号（首次出现顺序）
+    buffer = array('i')
+    id_hashes = array('q')
+    papers = 0
+    edges = 0
+    with open(result_file, 'r', encoding='utf-8') as f, \
+            open(os.path.join(directory, 'nodes.jsonl.tmp'), 'w', encoding='utf-8') as nodes_out, \
+            open(title_index_file + '.tmp', 'w', encoding='utf-8') as titles_out, \
+            open(edges_tmp, 'wb') as edges_out:
+        separator = '{\n  '
+        for line in f:
+            if not line.strip():
+                continue
+            paper_id, title, keywords = normalize_record(json.loads(line))
+            if not paper_id:
+                continue
+            id_hashes.append(hash(paper_id))
+            nodes_out.write(json.dumps([paper_id, 'title', title], ensure_ascii=False) + '\n')
             if title:
-                titles.append(title)
-            # 读取关键词列表
-            for kw in data.get('keywds', []):
-                kw = kw.strip().lower()
-                if kw:
-                    keywords_set.add(kw)
-                    # 添加文章标题与关键词之间的边
-                    edges.append((title, kw))
-
-# 为文章标题和关键词生成唯一索引
-# 假设文章标题在文件中是唯一的
-title_index = {title: idx for idx, title in zip(ids,titles)}
-keyword_index = {kw: str(idx) for idx, kw in enumerate(keywords_set)}
-index_title = {idx:title for idx, title in zip(ids,titles)}
-index_keyword = {idx:kw for idx, kw in enumerate(keywords_set)}
-
-# 构建图
-G = nx.Graph()
-
-# 添加文章标题节点（设置属性 type 为 'title' 和对应的 index）
-for title in titles:
-    G.add_node(title_index[title], type='title', name=title)
-
-# 添加关键词节点（设置属性 type 为 'keyword' 和对应的 index）
-for kw in keywords_set:
-    G.add_node(keyword_index[kw], type='keyword', name=kw)
-
-# 添加边：每条边表示文章标题与关键词之间的关联
-for title, kw in edges:
-    G.add_edge(title_index[title], keyword_index[kw])
-
-nx.write_gml(G, 'graph3.gml')
-
-with open('title_index.json', 'w', encoding='utf-8') as f:
-    json.dump(title_index, f, ensure_ascii=False, indent=2)
-
-with open('keyword_index.json', 'w', encoding='utf-8') as f:
-    json.dump(keyword_index, f, ensure_ascii=False, indent=2)
+                titles_out.write(separator + json.dumps(title, ensure_ascii=False) + ': ' + json.dumps(paper_id))
+                separator = ',\n  '
+            for kw in keywords:
+                buffer.append(papers)
+                buffer.append(slots.setdefault(kw, len(slots)))
+            papers += 1
+            if len(buffer) >= 2 * edge_chunk:
+                buffer.tofile(edges_out)
+                edges += len(buffer) // 2
+                del buffer[:]
+        buffer.tofile(edges_out)
+        edges += len(buffer) // 2
+        titles_out.write('{}\n' if separator == '{\n  ' else '\n}\n')
+
+        duplicates = _duplicate_ids(result_file, id_hashes)
+        if duplicates:
+            for f_out in (nodes_out, titles_out, edges_out):
+                f_out.close()
+            for path in (os.path.join(directory, 'nodes.jsonl.tmp'), title_index_file + '.tmp', edges_tmp):
+                os.remove(path)
+            shown = ', '.join(duplicates[:10]) + (' ...' if len(duplicates) > 10 else '')
+            raise ValueError(f"{result_file} 中有 {len(duplicates)} 个重复的论文 id（{shown}），"
+                             f"流式构建要求 id 唯一，请先去重或改用非流式构建（保留最后一条记录）")
+
+        keyword_index = assign_keyword_ids(slots.keys(), state)
+        for kw, idx in keyword_index.items():
+            nodes_out.write(json.dumps([idx, 'keyword', kw], ensure_ascii=False) + '\n')
+
+    # 临时编号 -> 关键词节点编号（论文在前，关键词按 id 排在其后）
+    lookup = np.empty(len(slots), dtype=np.int32)
+    for rank, kw in enumerate(keyword_index):
+        lookup[slots[kw]] = papers + rank
+    raw = np.memmap(edges_tmp, dtype=np.int32, mode='r', shape=(edges, 2)) if edges else np.empty((0, 2), np.int32)
+    out = np.lib.format.open_memmap(os.path.join(directory, 'edges.tmp.npy'), mode='w+', dtype=np.int32,
+                                    shape=(edges, 2))
+    for start in range(0, edges, edge_chunk):
+        chunk = raw[start:start + edge_chunk]
+        out[start:start + edge_chunk, 0] = chunk[:, 0]
+        out[start:start + edge_chunk, 1] = lookup[chunk[:, 1]]
+    out.flush()
+    del raw, out
+    os.remove(edges_tmp)
+    _finish_edge_list(directory, papers, len(keyword_index), edges)
+
+    os.replace(title_index_file + '.tmp', title_index_file)
+    _write_json(keyword_index_file, keyword_index, indent=2)
+    changes = {
+        'keywords_added': {kw: idx for kw, idx in keyword_index.items() if kw not in old_keyword_index},
+        'keywords_removed': {kw: idx for kw, idx in old_keyword_index.items() if kw not in keyword_index},
+    }
+    if keyword_list:
+        removed = {kw for kw in _read_keyword_list(keyword_list) if kw not in keyword_index}
+        _update_keyword_list(keyword_list, keyword_index, removed)
+    state['version'] += 1
+    _write_json(os.path.join(data_dir, STATE_FILE), state)
+
+    entry = {'version': state['version'], 'time': time.time(), 'mode': 'stream',
+             'papers': papers, 'keywords': len(keyword_index), 'edges': edges, **changes}
+    with open(os.path.join(data_dir, CHANGELOG_FILE), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="由关键词提取结果构建论文-关键词图（全量或增量）")
+    parser.add_argument("--input", default=RESULT_FILE, help="全量构建使用的提取结果 JSONL")
+    parser.add_argument("--delta", default=None, help="增量文件（JSONL，upsert / delete），指定时只在已有图上应用增量")
+    parser.add_argument("--stream", action="store_true",
+                        help="单遍流式全量构建，只写紧凑边表（graph_edges/）和索引文件，适合超大输入")
+    parser.add_argument("--dir", default=".", help="图、索引、状态和变更记录所在目录")
+    parser.add_argument("--keyword-list", default=None,
+                        help="同步更新的候选关键词文件（如 new_kwds1.txt），新增关键词追加在末尾")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.delta:
+        entry = incremental_build(args.delta, args.dir, args.keyword_list)
+    elif args.stream:
+        try:
+            entry = stream_build(args.input, args.dir, args.keyword_list)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print(f"图版本 {entry['version']}（stream）: 论文 {entry['papers']}，关键词 {entry['keywords']}，"
+              f"边 {entry['edges']}；耗时 {time.perf_counter() - start:.2f}s")
+        return
+    else:
+        entry = full_build(args.input, args.dir, args.keyword_list)
+    if entry is None:
+        print("图没有变化，未写入文件")
+        return
+    if entry.get('rebuild'):
+        print(f"图版本 {entry['version']}（{entry['mode']}，首次构建）: 论文 {entry['papers']}，"
+              f"关键词 {entry['keywords']}，边 {entry['edges']}；耗时 {time.perf_counter() - start:.2f}s")
+        return
+    print(f"图版本 {entry['version']}（{entry['mode']}）: 新增论文 {len(entry['papers_added'])}，"
+          f"更新 {len(entry['papers_updated'])}，删除 {len(entry['papers_deleted'])}；"
+          f"新增关键词 {len(entry['keywords_added'])}，移除 {len(entry['keywords_removed'])}；"
+          f"新增边 {len(entry['edges_added'])}，删除边 {len(entry['edges_removed'])}；"
+          f"耗时 {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
+
 
 # 输出节点信息（可选）
 # print("文章标题节点及索引：", title_index)
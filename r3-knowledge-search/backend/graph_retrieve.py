@@ -2,7 +2,7 @@
 import networkx as nx
 from collections import deque
 
-def find_nodes_within_distance(G, start_node_id, max_distance=5):
+def find_nodes_within_distance(G, start_node_id, max_distance=5, parents=None):
     """
     使用 BFS 从 start_node 开始遍历，返回距离小于或等于 max_distance 的所有节点及其距离。
 
@@ -10,6 +10,8 @@ def find_nodes_within_distance(G, start_node_id, max_distance=5):
       G: NetworkX 图
       start_node: 起始节点
       max_distance: 最大距离（包含此距离）的节点将被返回
+      parents: 传入字典时记录前驱指针 {节点: BFS 中的上一个节点}，
+               之后可以用 rebuild_path 在 O(路径长度) 内得到任一节点到 start_node 的最短路径
 
     返回：
       一个列表，列表中的每个元素是 (节点, 距离) 元组
@@ -36,9 +38,103 @@ def find_nodes_within_distance(G, start_node_id, max_distance=5):
             for neighbor in G.neighbors(node_id):
                 if neighbor not in visited:
                     queue.append((neighbor, dist + 1))
+                    # 第一次入队时的来源节点即最短路径上的前驱
+                    if parents is not None and neighbor != start_node_id:
+                        parents.setdefault(neighbor, node_id)
     return result
 
 
+def rebuild_path(parents, node_id, start_node_id, max_length=None):
+    """
+    沿前驱指针从 node_id 走回 start_node_id，返回 [node_id, ..., start_node_id]。
+    指针缺失（节点不在那次 BFS 的范围内）或超过 max_length 步时返回 None，由调用方回退到图搜索。
+    """
+    path = [node_id]
+    while path[-1] != start_node_id:
+        if max_length is not None and len(path) > max_length:
+            return None
+        parent = parents.get(path[-1])
+        if parent is None:
+            return None
+        path.append(parent)
+    return path
+
+
+def expand_from_seeds(G, seed_ids, max_distance=5, parents=None):
+    """
+    从所有种子节点同时出发做一次逐层 BFS，得到每个论文节点到各种子节点的最短距离。
+    每个节点用一个整数位掩码记录已经到达它的种子，同一层上新到达的种子位即为该层距离；
+    结果与对每个种子分别调用 find_nodes_within_distance 相同。
+
+    参数：
+      G: NetworkX 图
+      seed_ids: 种子节点（关键词节点）列表，重复和不在图中的节点会被忽略
+      max_distance: 最大距离（包含此距离）
+      parents: 传入字典时按种子记录前驱指针 {种子节点: {节点: 朝向该种子的上一个节点}}
+
+    返回：
+      {论文节点: {种子节点: 距离}}，外层按首次到达的顺序，内层按种子顺序排列
+    """
+    seeds = [seed for seed in dict.fromkeys(seed_ids) if seed in G]
+    reached = {}
+    frontier = {}
+    for i, seed in enumerate(seeds):
+        frontier[seed] = frontier.get(seed, 0) | (1 << i)
+
+    hits = {}  # 论文节点 -> [(种子序号, 距离)]
+    dist = 0
+    while frontier:
+        for node_id, mask in frontier.items():
+            reached[node_id] = reached.get(node_id, 0) | mask
+            if G.nodes[node_id].get('type') == 'title':
+                lst = hits.setdefault(node_id, [])
+                while mask:
+                    low = mask & -mask
+                    lst.append((low.bit_length() - 1, dist))
+                    mask ^= low
+        if dist >= max_distance:
+            break
+
+        # 只向邻居传播尚未到达该邻居的种子位
+        next_frontier = {}
+        for node_id, mask in frontier.items():
+            for neighbor in G.neighbors(node_id):
+                new_mask = mask & ~reached.get(neighbor, 0)
+                if new_mask:
+                    if parents is not None:
+                        # 只记录该邻居在本层第一次被某个种子到达时的来源
+                        fresh = new_mask & ~next_frontier.get(neighbor, 0)
+                        while fresh:
+                            low = fresh & -fresh
+                            parents.setdefault(seeds[low.bit_length() - 1], {})[neighbor] = node_id
+                            fresh ^= low
+                    next_frontier[neighbor] = next_frontier.get(neighbor, 0) | new_mask
+        frontier = next_frontier
+        dist += 1
+
+    return {node_id: {seeds[i]: d for i, d in sorted(lst)} for node_id, lst in hits.items()}
+
+
+def rank_by_distance(paper_dists, n_seeds, miss_penalty=7):
+    """
+    一次遍历计算每篇论文到所有种子的距离之和，未到达的种子记为 miss_penalty。
+
+    参数：
+      paper_dists: expand_from_seeds 的返回值
+      n_seeds: 种子（去重后）的数量
+      miss_penalty: 未到达时的距离惩罚
+
+    返回：
+      按总距离升序排列的 (论文节点, 总距离) 列表，总距离相同时保持 paper_dists 的顺序
+    """
+    totals = [
+        (node_id, sum(dists.values()) + miss_penalty * (n_seeds - len(dists)))
+        for node_id, dists in paper_dists.items()
+    ]
+    totals.sort(key=lambda x: x[1])
+    return totals
+
+
 if __name__ =='__main__':
     G = nx.read_gml('graph1.gml')
     # 示例：假设图 G 已经构建，并且存在关键词节点 "fading channels"
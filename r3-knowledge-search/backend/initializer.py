@@ -1,13 +1,60 @@
 import json
+import os
 import pandas as pd
 import networkx as nx
-from bm25 import tokenize
+from bm25 import tokenize, BM25Index
+from bm25_sparse import SparseBM25
+from csr_graph import CSRGraph
+from metadata_store import MetadataStore
+from query_cache import fingerprint_version
+from snapshot import load_snapshot
+
+# 流式构建写出的紧凑边表目录（见 graph_build.py），存在时优先于 graph3.gml
+EDGE_LIST_DIR = "graph_edges"
+# 检索依赖的数据文件（相对于工作目录），它们的指纹作为从原始文件加载时的数据版本
+DATA_FILES = ["filtered_data.csv", "new_kwds1.txt", "title_index.json", "keyword_index.json", "graph3.gml",
+              os.path.join(EDGE_LIST_DIR, "meta.json")]
+
+
+def load_graph_files(keep_networkx=True, data_dir="."):
+    """
+    读取 data_dir 中的图：边表目录存在时直接构建 CSRGraph，否则解析 graph3.gml。
+    返回：(NetworkX 图或 None, CSRGraph)
+    """
+    edge_list_dir = os.path.join(data_dir, EDGE_LIST_DIR)
+    if os.path.exists(os.path.join(edge_list_dir, "meta.json")):
+        csr_graph = CSRGraph.from_edge_list(edge_list_dir)
+        return (csr_graph.to_networkx() if keep_networkx else None), csr_graph
+    G = nx.read_gml(os.path.join(data_dir, 'graph3.gml'))
+    return (G if keep_networkx else None), CSRGraph.from_networkx(G)
+
+
+def initialize_data(keep_networkx=True, snapshot_dir=None, verify_snapshot=True, shared=False):
+    """
+    加载检索所需的全部数据。
+    keep_networkx: 是否在返回值中保留 NetworkX 图（线上查询只使用 csr_graph，可传 False 节省内存）
+    snapshot_dir: 快照根目录（见 snapshot.py），存在可用快照时直接以内存映射方式加载，
+                  否则回退到解析原始数据文件
+    返回值中的 version 标识实际加载的数据："snapshot:<快照目录名>" 或 "files:<数据文件指纹>"
+    verify_snapshot: 加载快照时是否校验每个文件的 sha256
+    shared: 从快照加载时直接使用内存映射数组上的只读视图，多个 worker 共享一份物理内存
+    """
+    if snapshot_dir:
+        data = load_snapshot(snapshot_dir, verify=verify_snapshot, shared=shared)
+        if data is not None:
+            if keep_networkx:
+                data["graph"], _ = load_graph_files(keep_networkx=True)
+            return data
 
-def initialize_data():
     try:
+        # 在读取之前记录文件指纹，作为本次加载的数据版本
+        version = "files:" + fingerprint_version(DATA_FILES)
+
         # 读取 CSV 数据
         df = pd.read_csv("filtered_data.csv")
         cached_data = df.to_dict(orient="records")
+        # 按论文 id 建立主键索引
+        metadata = MetadataStore(cached_data)
 
         # 读取关键词文件
         candidate_keywords = []
@@ -31,7 +78,11 @@ def initialize_data():
                     df_dict[token] = df_dict.get(token, 0) + 1
                     seen.add(token)
 
-        
+        # BM25 倒排索引（倒排表、词频、文档长度、IDF）
+        bm25_index = BM25Index.build(tokenized_keywords)
+        # 向量化 BM25（词项 × 关键词 CSR 矩阵），用于批量打分
+        bm25_sparse = SparseBM25.from_index(bm25_index)
+
         with open('title_index.json', 'r', encoding='utf-8') as f:
             title_index = json.load(f)
 
@@ -39,31 +90,41 @@ def initialize_data():
         with open('keyword_index.json', 'r', encoding='utf-8') as f:
             keyword_index = json.load(f)
 
-        # 缓存图结构
-        G = nx.read_gml('graph3.gml')
+        # 缓存图结构，并转换为查询路径使用的数组化图
+        G, csr_graph = load_graph_files(keep_networkx)
 
         return {
             "cached_data": cached_data,
+            "metadata": metadata,
             "candidate_keywords": candidate_keywords,
             "tokenized_keywords": tokenized_keywords,
             "df_dict": df_dict,
             "N": N,
             "avgdl": avgdl,
+            "bm25_index": bm25_index,
+            "bm25_sparse": bm25_sparse,
             "graph": G,
+            "csr_graph": csr_graph,
             "title_index":title_index,
-            "keyword_index":keyword_index
+            "keyword_index":keyword_index,
+            "version": version
         }
 
     except Exception as e:
         print(f"[Init Error] {e}")
         return {
             "cached_data": [],
+            "metadata": MetadataStore([]),
             "candidate_keywords": [],
             "tokenized_keywords": [],
             "df_dict": {},
             "N": 0,
             "avgdl": 0,
+            "bm25_index": BM25Index.build([]),
+            "bm25_sparse": SparseBM25.build([]),
             "graph": nx.Graph(),  # 返回空图
+            "csr_graph": CSRGraph.from_networkx(nx.Graph()),
             "title_index":{},
-            "keyword_index":{}
+            "keyword_index":{},
+            "version": "empty"
         }
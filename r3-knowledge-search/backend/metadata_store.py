@@ -0,0 +1,64 @@
+class MetadataStore:
+    """
+    以论文 id 为主键的元数据存储，替代对 cached_data 的线性扫描。
+
+    records 为 cached_data 中的行字典，存储只建立 id -> 行 的索引，不复制数据。
+    id 重复时 by_id 保留第一条记录（与原来扫描到第一条即 break 的行为一致），
+    duplicates 另外记录这些 id 的全部行（按原顺序），get_many 和 field(last=True) 用它保持原来的结果。
+    by_id 可以直接传入 id -> 行 的只读映射（同时传入 duplicates），此时不再遍历 records 建立索引。
+    """
+
+    def __init__(self, records, key="id", by_id=None, duplicates=None):
+        self.records = records
+        if by_id is not None:
+            # 由调用方提供的只读映射（例如快照中按 id 排序的共享索引）
+            self.by_id = by_id
+            self.duplicates = duplicates or {}
+            return
+        self.by_id = {}
+        self.duplicates = {}
+        for record in records:
+            paper_id = record.get(key)
+            first = self.by_id.setdefault(paper_id, record)
+            if first is not record:
+                self.duplicates.setdefault(paper_id, [first]).append(record)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, paper_id):
+        return paper_id in self.by_id
+
+    def get(self, paper_id, default=None):
+        return self.by_id.get(paper_id, default)
+
+    def get_many(self, paper_ids, fields=None):
+        """
+        按给定顺序返回论文的元数据行，跳过不存在的 id；id 重复的论文返回它的全部行。
+        fields 为列名列表时只返回这些列（行中不存在的列省略）。
+        """
+        get = self.by_id.get
+        records = []
+        for paper_id in paper_ids:
+            if paper_id in self.duplicates:
+                records.extend(self.duplicates[paper_id])
+                continue
+            record = get(paper_id)
+            if record is not None:
+                records.append(record)
+        if fields:
+            return [{f: record[f] for f in fields if f in record} for record in records]
+        return records
+
+    def field(self, paper_id, column, default="", last=False):
+        """
+        返回某篇论文的某一列，论文或列不存在时返回 default。
+        last 为 True 时 id 重复的论文取最后一行（原来不 break 的扫描取到的是最后一行）。
+        """
+        if last and paper_id in self.duplicates:
+            record = self.duplicates[paper_id][-1]
+        else:
+            record = self.by_id.get(paper_id)
+        if record is None:
+            return default
+        return record.get(column, default)
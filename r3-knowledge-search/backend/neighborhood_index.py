@@ -0,0 +1,564 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from csr_graph import _path_costs
+from initializer import load_graph_files
+
+# 索引目录（相对于数据目录）与格式版本，数组布局变化时递增
+NEIGHBORHOOD_DIR = "keyword_neighborhoods"
+NEIGHBORHOOD_FORMAT = 1
+# 默认预计算的最大距离，与 /search 的图扩展距离一致
+MAX_DISTANCE = 3
+# 图构建状态与变更记录（由 graph_build.py 写出），用于判断索引是否过期以及增量更新
+STATE_FILE = "graph_state.json"
+CHANGELOG_FILE = "graph_changelog.jsonl"
+# 每个关键词的邻域保存为下列数组中的一段，按关键词的节点编号排列（offsets 长度为关键词数 + 1）：
+#   papers / dists / parents: 距离不超过 max_distance 的论文节点（按编号升序）、距离、BFS 前驱
+#   inner / inner_parents:    距离小于 max_distance 的非论文节点（按编号升序）及其前驱，用于重建解释路径
+ARRAYS = {
+    "keywords": np.int32,
+    "offsets": np.int64,
+    "papers": np.int32,
+    "dists": np.uint8,
+    "parents": np.int32,
+    "inner_offsets": np.int64,
+    "inner": np.int32,
+    "inner_parents": np.int32,
+}
+# 热点关键词的内存缓存上限（字节）
+CACHE_BYTES = int(os.environ.get("R3_NEIGHBORHOOD_CACHE_BYTES", 64 * 1024 * 1024))
+
+
+def keyword_trees(graph, keyword_indices, max_distance=MAX_DISTANCE, degree_cap=0, max_visited=0):
+    """
+    对每个关键词（CSRGraph 中的整数编号）做距离不超过 max_distance 的 BFS，
+    按输入顺序产出 (关键词, papers, dists, parents, inner, inner_parents)。
+    每 64 个关键词共用一次位掩码 BFS（CSRGraph._expand_levels），与 rank_from_seeds 的距离和前驱完全相同。
+    degree_cap 与 rank_from_seeds 的含义相同；max_visited > 0 时每组 BFS 最多访问这么多节点，
+    被截断的一组关键词的邻域不完整，产出 (关键词, None, None, None, None, None)。
+    """
+    keyword_indices = list(keyword_indices)
+    for start in range(0, len(keyword_indices), 64):
+        batch = keyword_indices[start:start + 64]
+        links = [[] for _ in batch]
+        levels = [[] for _ in batch]
+        stats = {}
+        # _expand_levels 在产出第 d 层之前记录该层的前驱，新增的块即为距离 d 的节点
+        seen = [0] * len(batch)
+        for _, _, dist in graph._expand_levels(batch, max_distance, links=links, degree_cap=degree_cap,
+                                               max_visited=max_visited, stats=stats):
+            for i, chunks in enumerate(links):
+                levels[i].extend((nodes, preds, dist) for nodes, preds in chunks[seen[i]:])
+                seen[i] = len(chunks)
+        if stats["truncated"]:
+            for keyword in batch:
+                yield (keyword, None, None, None, None, None)
+            continue
+
+        for keyword, level in zip(batch, levels):
+            if level:
+                nodes = np.concatenate([nodes for nodes, _, _ in level])
+                preds = np.concatenate([preds for _, preds, _ in level])
+                dists = np.concatenate([np.full(len(nodes), dist, dtype=np.uint8) for nodes, _, dist in level])
+            else:
+                nodes = preds = np.empty(0, dtype=np.int64)
+                dists = np.empty(0, dtype=np.uint8)
+            is_title = graph.node_type[nodes] == graph.title_type
+            order = np.argsort(nodes[is_title], kind="stable")
+            inner = ~is_title & (dists < max_distance)
+            inner_order = np.argsort(nodes[inner], kind="stable")
+            yield (keyword,
+                   nodes[is_title][order].astype(np.int32), dists[is_title][order],
+                   preds[is_title][order].astype(np.int32),
+                   nodes[inner][inner_order].astype(np.int32), preds[inner][inner_order].astype(np.int32))
+
+
+# 并行构建时由主进程在 fork 之前设置，worker 进程直接继承只读的图
+_graph = None
+_max_distance = MAX_DISTANCE
+_degree_cap = 0
+
+
+def _build_chunk(keyword_indices):
+    return list(keyword_trees(_graph, keyword_indices, _max_distance, _degree_cap))
+
+
+def parallel_trees(graph, keyword_indices, max_distance=MAX_DISTANCE, workers=1, degree_cap=0):
+    """
+    keyword_trees 的多进程版本：关键词按 64 个一组分给 fork 出的 worker，结果仍按输入顺序产出。
+    """
+    global _graph, _max_distance, _degree_cap
+    keyword_indices = list(keyword_indices)
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        yield from keyword_trees(graph, keyword_indices, max_distance, degree_cap)
+        return
+    _graph, _max_distance, _degree_cap = graph, max_distance, degree_cap
+    chunks = [keyword_indices[i:i + 64] for i in range(0, len(keyword_indices), 64)]
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        for trees in pool.imap(_build_chunk, chunks):
+            yield from trees
+
+
+def write_index(directory, trees, graph, max_distance, graph_version, degree_cap=0):
+    """
+    把按关键词编号升序产出的邻域写入 directory：先写到临时目录，每个数组以原始字节追加，
+    全部写完后写 meta.json 并替换旧目录，检索服务不会读到写了一半的索引。
+    返回 meta。
+    """
+    tmp = directory + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    files = {name: open(os.path.join(tmp, name + ".bin"), "wb") for name in ARRAYS}
+    counts = {"keywords": 0, "papers": 0, "inner": 0}
+    try:
+        files["offsets"].write(np.zeros(1, dtype=np.int64).tobytes())
+        files["inner_offsets"].write(np.zeros(1, dtype=np.int64).tobytes())
+        for keyword, papers, dists, parents, inner, inner_parents in trees:
+            counts["keywords"] += 1
+            counts["papers"] += len(papers)
+            counts["inner"] += len(inner)
+            files["keywords"].write(np.int32(keyword).tobytes())
+            files["offsets"].write(np.int64(counts["papers"]).tobytes())
+            files["inner_offsets"].write(np.int64(counts["inner"]).tobytes())
+            for name, values in (("papers", papers), ("dists", dists), ("parents", parents),
+                                 ("inner", inner), ("inner_parents", inner_parents)):
+                files[name].write(np.ascontiguousarray(values, dtype=ARRAYS[name]).tobytes())
+    finally:
+        for f in files.values():
+            f.close()
+
+    with open(os.path.join(tmp, "node_ids.json"), "w", encoding="utf-8") as f:
+        json.dump(list(graph.node_ids), f, ensure_ascii=False)
+    meta = {
+        "format": NEIGHBORHOOD_FORMAT,
+        "max_distance": max_distance,
+        "degree_cap": degree_cap,
+        "graph_version": graph_version,
+        "nodes": len(graph),
+        "node_ids_sha256": node_ids_digest(graph.node_ids),
+        "keywords": counts["keywords"],
+        "entries": counts["papers"],
+        "inner_entries": counts["inner"],
+        "built": time.time(),
+    }
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+    # 已打开的内存映射在旧文件被删除后仍然有效
+    old = directory + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old)
+    os.replace(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+def node_ids_digest(node_ids):
+    """
+    节点 id 序列（按编号顺序）的 sha256，索引中的编号只对 id 序列完全相同的图有效。
+    """
+    h = hashlib.sha256()
+    for node_id in node_ids:
+        h.update(str(node_id).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def read_graph_version(data_dir="."):
+    """
+    当前图版本（graph_state.json 中的 version），没有状态文件的旧图记为 0。
+    """
+    path = os.path.join(data_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("version", 0)
+
+
+def read_changelog(data_dir=".", since_version=0):
+    """
+    返回版本号大于 since_version 的变更记录。
+    """
+    path = os.path.join(data_dir, CHANGELOG_FILE)
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                if entry["version"] > since_version:
+                    entries.append(entry)
+    return entries
+
+
+def _keyword_nodes(graph):
+    return np.flatnonzero(graph.node_type != graph.title_type)
+
+
+def build_index(graph, directory, max_distance=MAX_DISTANCE, workers=1, graph_version=0, degree_cap=0):
+    """
+    为图中全部关键词节点构建邻域索引。degree_cap 与检索时的设置一致时索引才会被使用。
+    """
+    trees = parallel_trees(graph, _keyword_nodes(graph).tolist(), max_distance, workers, degree_cap)
+    return write_index(directory, trees, graph, max_distance, graph_version, degree_cap)
+
+
+def _keywords_near(graph, nodes, depth):
+    # 距离 nodes 不超过 depth 的非论文节点
+    seen = np.zeros(len(graph), dtype=bool)
+    frontier = np.unique(np.asarray(nodes, dtype=np.int64))
+    seen[frontier] = True
+    for _ in range(depth):
+        neighbors, _ = graph._gather(frontier)
+        frontier = np.unique(neighbors[~seen[neighbors]])
+        seen[frontier] = True
+    found = np.flatnonzero(seen)
+    return found[graph.node_type[found] != graph.title_type]
+
+
+def update_index(graph, directory, entries, workers=1, graph_version=0):
+    """
+    按变更记录更新已有的索引，只重新计算邻域可能变化的关键词，其余关键词的邻域从旧索引复制。
+
+    变化的边 (论文, 关键词) 只影响 BFS 树中在 max_distance - 1 步以内包含某个端点的关键词：
+      - 旧图中：旧索引里该关键词的树包含这样的端点（或关键词本身就是端点）；
+      - 新图中：从端点出发 max_distance - 1 步以内能到达的关键词。
+    流式构建和第一次构建（rebuild）的记录不含边的差异，此时调用方应全量重建；
+    按 degree_cap 抽样构建的索引依赖各节点的邻接表顺序，调用方同样应全量重建。
+    """
+    old = NeighborhoodIndex(directory)
+    depth = old.max_distance - 1
+    endpoints = set()
+    for entry in entries:
+        for paper_id, keyword_id in entry["edges_added"] + entry["edges_removed"]:
+            endpoints.update((paper_id, keyword_id))
+
+    old_ids = old.node_ids
+    old_lookup = {node_id: i for i, node_id in enumerate(old_ids)}
+    remap = np.array([graph.id_to_index.get(node_id, -1) for node_id in old_ids], dtype=np.int64)
+
+    # 旧图中受影响的关键词（按旧编号）
+    old_endpoints = np.array(sorted(old_lookup[x] for x in endpoints if x in old_lookup), dtype=np.int64)
+    n_old = len(old.keywords)
+    owner = np.repeat(np.arange(n_old), np.diff(old.offsets))
+    inner_owner = np.repeat(np.arange(n_old), np.diff(old.inner_offsets))
+    touched = (np.isin(old.papers, old_endpoints) & (old.dists <= depth)) | (remap[old.papers] < 0)
+    inner_touched = np.isin(old.inner, old_endpoints) | (remap[old.inner] < 0)
+    stale = np.zeros(n_old, dtype=bool)
+    stale[owner[touched]] = True
+    stale[inner_owner[inner_touched]] = True
+    stale |= np.isin(old.keywords, old_endpoints) | (remap[old.keywords] < 0)
+    affected = set(remap[old.keywords[stale]].tolist())
+
+    # 新图中受影响的关键词
+    new_endpoints = [graph.id_to_index[x] for x in endpoints if x in graph.id_to_index]
+    affected.update(_keywords_near(graph, new_endpoints, depth).tolist())
+
+    reusable = {int(remap[k]): i for i, k in enumerate(old.keywords.tolist()) if not stale[i]}
+    keywords = _keyword_nodes(graph).tolist()
+    recompute = [k for k in keywords if k in affected or k not in reusable]
+
+    def merged():
+        fresh = parallel_trees(graph, recompute, old.max_distance, workers)
+        for k in keywords:
+            if k in reusable:
+                yield (k,) + _remap_tree(old, reusable[k], remap)
+            else:
+                yield next(fresh)
+
+    meta = write_index(directory, merged(), graph, old.max_distance, graph_version, old.degree_cap)
+    meta["recomputed"] = len(recompute)
+    return meta
+
+
+def _remap_tree(index, i, remap):
+    # 把旧索引中第 i 个关键词的邻域换成新图的节点编号，并按新编号重新排序
+    a, b = index.offsets[i], index.offsets[i + 1]
+    papers = remap[index.papers[a:b]]
+    order = np.argsort(papers, kind="stable")
+    a2, b2 = index.inner_offsets[i], index.inner_offsets[i + 1]
+    inner = remap[index.inner[a2:b2]]
+    inner_order = np.argsort(inner, kind="stable")
+    return (papers[order], index.dists[a:b][order], remap[index.parents[a:b]][order],
+            inner[inner_order], remap[index.inner_parents[a2:b2]][inner_order])
+
+
+def rank_trees(graph, seeds, trees, max_distance=MAX_DISTANCE, miss_penalty=7, parents=None,
+               degree_cap=0, max_visited=0, hub_weight=0.0, stats=None):
+    """
+    合并各种子的邻域（keyword_trees / NeighborhoodIndex.lookup 的结果，与 seeds 一一对应，
+    种子已去重且不超过 64 个），返回与 CSRGraph.rank_from_seeds 相同的 (ranked, paper_keys)；
+    只使用距离不超过 max_distance 的论文，parents 为字典时按种子填入前驱指针。
+    邻域须按同一个 degree_cap 计算。某个邻域不完整（None），或合并后访问的节点数超过 max_visited 时，
+    改为调用 graph.rank_from_seeds 做有界的 BFS，结果与只用 BFS 时相同。
+    """
+    visited = _visited(graph, seeds, trees, max_distance)
+    if visited is None or (max_visited and visited > max_visited):
+        return graph.rank_from_seeds(seeds, max_distance=max_distance, miss_penalty=miss_penalty, parents=parents,
+                                     degree_cap=degree_cap, max_visited=max_visited, hub_weight=hub_weight,
+                                     stats=stats)
+    if stats is not None:
+        stats["visited"] = visited
+        stats["truncated"] = False
+    node_ids = graph.node_ids
+    costs = graph.hub_costs(hub_weight) if hub_weight else None
+
+    papers, dists, owners, penalties = [], [], [], []
+    for i, (seed, (p, d, par, inner, inner_par)) in enumerate(zip(seeds, trees)):
+        keep = d <= max_distance
+        papers.append(p[keep])
+        dists.append(d[keep].astype(np.int64))
+        owners.append(np.full(int(keep.sum()), i, dtype=np.uint64))
+        if costs is not None:
+            penalties.append(_path_costs(p[keep], np.concatenate([inner, p[keep]]),
+                                         np.concatenate([inner_par, par[keep]]),
+                                         graph.id_to_index[seed], costs, max_distance))
+        if parents is not None:
+            seed_parents = parents.setdefault(seed, {})
+            seed_parents.update(zip([node_ids[j] for j in inner.tolist()],
+                                    [node_ids[j] for j in inner_par.tolist()]))
+            seed_parents.update(zip([node_ids[j] for j in p[keep].tolist()],
+                                    [node_ids[j] for j in par[keep].tolist()]))
+    if not seeds or not sum(len(p) for p in papers):
+        return [], {}
+
+    papers = np.concatenate(papers)
+    dists = np.concatenate(dists)
+    masks = np.left_shift(np.uint64(1), np.concatenate(owners))
+    order = np.argsort(papers, kind="stable")
+    papers, dists, masks = papers[order], dists[order], masks[order]
+    unique_papers, starts = np.unique(papers, return_index=True)
+    masks = np.bitwise_or.reduceat(masks, starts)
+    totals = np.add.reduceat(dists, starts) + miss_penalty * (len(seeds) - np.diff(np.append(starts, len(papers))))
+    if costs is not None:
+        totals = totals + np.add.reduceat(np.concatenate(penalties)[order], starts)
+    # 论文按编号升序，稳定排序后同分的论文仍按编号排列
+    order = np.argsort(totals, kind="stable")
+    unique_papers, masks, totals = unique_papers[order], masks[order], totals[order]
+
+    decoded = {}
+    for mask in np.unique(masks).tolist():
+        decoded[mask] = [seeds[i] for i in range(len(seeds)) if mask >> i & 1]
+    paper_ids = [node_ids[i] for i in unique_papers.tolist()]
+    ranked = list(zip(paper_ids, totals.tolist()))
+    paper_keys = {pid: decoded[mask] for pid, mask in zip(paper_ids, masks.tolist())}
+    return ranked, paper_keys
+
+
+def _visited(graph, seeds, trees, max_distance):
+    """
+    多源 BFS 会访问的节点数：种子、距离不超过 max_distance 的论文与邻域中的非论文节点。
+    邻域按更大的距离构建时会多算，只会让调用方更早改用有界的 BFS。有邻域不完整时返回 None。
+    """
+    if any(tree is None for tree in trees):
+        return None
+    nodes = [np.array([graph.id_to_index[seed] for seed in seeds], dtype=np.int64)]
+    for p, d, _, inner, _ in trees:
+        nodes.append(p[d <= max_distance].astype(np.int64))
+        nodes.append(inner.astype(np.int64))
+    return len(np.unique(np.concatenate(nodes)))
+
+
+class NeighborhoodIndex:
+    """
+    关键词邻域索引：离线为每个关键词预先计算距离不超过 max_distance 的论文及距离，
+    /search 直接合并各关键词的邻域完成排序，不再做图遍历。
+
+    数组以只读内存映射打开，同一主机上的多个 worker 共享页缓存；
+    热点关键词的邻域另外放在按字节数淘汰的 LRU 中。
+    传入 graph 时可以用 rank_from_seeds 代替 CSRGraph.rank_from_seeds（返回值相同），
+    索引中没有的关键词当场做 BFS，结果同样进入 LRU。
+    """
+
+    def __init__(self, directory=NEIGHBORHOOD_DIR, graph=None, cache_bytes=CACHE_BYTES):
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != NEIGHBORHOOD_FORMAT:
+            raise ValueError(f"邻域索引格式版本 {self.meta.get('format')} 与当前版本 {NEIGHBORHOOD_FORMAT} 不一致")
+        self.directory = directory
+        self.graph = graph
+        self.max_distance = self.meta["max_distance"]
+        self.degree_cap = self.meta.get("degree_cap", 0)
+        lengths = {
+            "keywords": self.meta["keywords"], "offsets": self.meta["keywords"] + 1,
+            "inner_offsets": self.meta["keywords"] + 1,
+            "papers": self.meta["entries"], "dists": self.meta["entries"], "parents": self.meta["entries"],
+            "inner": self.meta["inner_entries"], "inner_parents": self.meta["inner_entries"],
+        }
+        for name, dtype in ARRAYS.items():
+            if lengths[name]:
+                array = np.memmap(os.path.join(directory, name + ".bin"), dtype=dtype, mode="r",
+                                  shape=(lengths[name],))
+            else:
+                array = np.empty(0, dtype=dtype)
+            setattr(self, name, array)
+        self.cache_bytes = cache_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.computed = 0
+        self._cache = OrderedDict()  # 关键词编号 -> (papers, dists, parents, inner, inner_parents)
+        self._lock = threading.Lock()
+
+    @property
+    def node_ids(self):
+        # 构建索引时图的节点 id，只在增量更新时读取
+        with open(os.path.join(self.directory, "node_ids.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def lookup(self, keyword):
+        """
+        返回关键词（整数编号）的 (papers, dists, parents, inner, inner_parents)。
+        """
+        with self._lock:
+            tree = self._cache.get(keyword)
+            if tree is not None:
+                self._cache.move_to_end(keyword)
+                self.hits += 1
+                return tree
+            self.misses += 1
+
+        i = int(np.searchsorted(self.keywords, keyword))
+        if i < len(self.keywords) and self.keywords[i] == keyword:
+            a, b = self.offsets[i], self.offsets[i + 1]
+            a2, b2 = self.inner_offsets[i], self.inner_offsets[i + 1]
+            tree = (np.array(self.papers[a:b]), np.array(self.dists[a:b]), np.array(self.parents[a:b]),
+                    np.array(self.inner[a2:b2]), np.array(self.inner_parents[a2:b2]))
+        else:
+            tree = next(keyword_trees(self.graph, [keyword], self.max_distance, self.degree_cap))[1:]
+            self.computed += 1
+
+        size = sum(array.nbytes for array in tree)
+        with self._lock:
+            if keyword not in self._cache and size <= self.cache_bytes:
+                self._cache[keyword] = tree
+                self.total_bytes += size
+                while self.total_bytes > self.cache_bytes:
+                    _, old = self._cache.popitem(last=False)
+                    self.total_bytes -= sum(array.nbytes for array in old)
+        return tree
+
+    def rank_from_seeds(self, seed_ids, max_distance=MAX_DISTANCE, miss_penalty=7, parents=None,
+                        degree_cap=0, max_visited=0, hub_weight=0.0, stats=None):
+        """
+        与 CSRGraph.rank_from_seeds 的参数和返回值相同，距离取自预计算的邻域。
+        max_distance 不能超过构建索引时的距离，degree_cap 须与构建时相同；
+        访问的节点数超过 max_visited 时改用有界的 BFS（见 rank_trees）。
+        """
+        if max_distance > self.max_distance:
+            raise ValueError(f"邻域索引只覆盖距离 {self.max_distance} 以内的节点")
+        if degree_cap != self.degree_cap:
+            raise ValueError(f"邻域索引按度数上限 {self.degree_cap} 构建")
+        graph = self.graph
+        seeds = [seed for seed in dict.fromkeys(seed_ids) if seed in graph.id_to_index]
+        if len(seeds) > 64:
+            raise ValueError("rank_from_seeds 最多支持 64 个种子节点")
+        trees = [self.lookup(graph.id_to_index[seed]) for seed in seeds]
+        return rank_trees(graph, seeds, trees, max_distance, miss_penalty, parents,
+                          degree_cap=degree_cap, max_visited=max_visited, hub_weight=hub_weight, stats=stats)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "keywords": self.meta["keywords"],
+                "entries": self.meta["entries"],
+                "max_distance": self.max_distance,
+                "degree_cap": self.degree_cap,
+                "graph_version": self.meta["graph_version"],
+                "cache_entries": len(self._cache),
+                "cache_bytes": self.total_bytes,
+                "max_cache_bytes": self.cache_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "computed": self.computed,
+            }
+
+
+def load_neighborhood_index(directory, graph, data_dir=".", cache_bytes=CACHE_BYTES):
+    """
+    加载与当前图一致的邻域索引；索引不存在、格式不符或落后于图版本时返回 None，调用方继续使用 BFS。
+    """
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        return None
+    try:
+        index = NeighborhoodIndex(directory, graph, cache_bytes=cache_bytes)
+    except (OSError, ValueError) as e:
+        print(f"[Neighborhood] 索引无法加载: {e}")
+        return None
+    version = read_graph_version(data_dir)
+    if index.meta["graph_version"] != version or index.meta["nodes"] != len(graph):
+        print(f"[Neighborhood] 索引对应图版本 {index.meta['graph_version']}，当前图版本 {version}，"
+              f"请运行 neighborhood_index.py update；暂时使用 BFS")
+        return None
+    # 版本和节点数相同时节点编号仍可能不同（例如换了数据目录或重新生成了图），逐个比对节点 id；
+    # 没有记录摘要的旧索引读取 node_ids.json 计算
+    stored = index.meta.get("node_ids_sha256") or node_ids_digest(index.node_ids)
+    if stored != node_ids_digest(graph.node_ids):
+        print(f"[Neighborhood] 索引的节点 id 与当前图不一致，请运行 neighborhood_index.py update；暂时使用 BFS")
+        return None
+    print(f"[Neighborhood] 已加载 {directory}：关键词 {index.meta['keywords']}，最大距离 {index.max_distance}")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线构建 / 增量更新关键词邻域索引（每个关键词到论文的距离）")
+    parser.add_argument("command", choices=["build", "update", "stats"],
+                        help="build 全量构建；update 按 graph_changelog.jsonl 更新（需要时自动全量构建）；stats 显示索引信息")
+    parser.add_argument("--dir", default=".", help="图、状态和变更记录所在的数据目录")
+    parser.add_argument("--out", default=None, help=f"索引目录，默认 <dir>/{NEIGHBORHOOD_DIR}")
+    parser.add_argument("--max-distance", type=int, default=MAX_DISTANCE, help="预计算的最大距离（仅全量构建）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行构建的进程数")
+    parser.add_argument("--degree-cap", type=int, default=None,
+                        help="按与检索相同的枢纽节点度数上限（R3_HUB_DEGREE_CAP）构建，默认 build 为 0、update 沿用原索引")
+    args = parser.parse_args()
+    directory = args.out or os.path.join(args.dir, NEIGHBORHOOD_DIR)
+
+    if args.command == "stats":
+        index = NeighborhoodIndex(directory)
+        print(json.dumps(index.meta, ensure_ascii=False, indent=2))
+        return
+
+    _, graph = load_graph_files(keep_networkx=False, data_dir=args.dir)
+    version = read_graph_version(args.dir)
+    start = time.perf_counter()
+    meta = None
+    if args.command == "update" and os.path.exists(os.path.join(directory, "meta.json")):
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            old_meta = json.load(f)
+        entries = read_changelog(args.dir, old_meta["graph_version"])
+        old_cap = old_meta.get("degree_cap", 0)
+        if args.degree_cap is None:
+            args.degree_cap = old_cap
+        if (old_meta["graph_version"] == version and old_meta["nodes"] == len(graph) and old_cap == args.degree_cap
+                and old_meta.get("node_ids_sha256") == node_ids_digest(graph.node_ids)):
+            print(f"索引已是最新（图版本 {version}）")
+            return
+        # 变更记录完整且都带有边的差异、且没有按度数上限抽样时才能增量更新
+        versions = [entry["version"] for entry in entries]
+        if (old_meta.get("format") == NEIGHBORHOOD_FORMAT and old_cap == args.degree_cap == 0
+                and versions == list(range(old_meta["graph_version"] + 1, version + 1))
+                and all("edges_added" in entry and entry["mode"] != "stream" for entry in entries)):
+            meta = update_index(graph, directory, entries, workers=args.workers, graph_version=version)
+    if meta is None:
+        meta = build_index(graph, directory, max_distance=args.max_distance, workers=args.workers,
+                           graph_version=version, degree_cap=args.degree_cap or 0)
+        meta["recomputed"] = meta["keywords"]
+    print(f"邻域索引（图版本 {version}）: 关键词 {meta['keywords']}，重新计算 {meta['recomputed']}，"
+          f"论文条目 {meta['entries']}，耗时 {time.perf_counter() - start:.2f}s，已写入 {directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+
+from neo4j import AsyncGraphDatabase, Query
+from neo4j.exceptions import DriverError, Neo4jError
+
+NEO4J_URI = os.environ.get("R3_NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.environ.get("R3_NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.environ.get("R3_NEO4J_PASSWORD", "FFR3")
+# 连接池大小与各阶段超时（秒）：取连接、建立连接、单个查询事务
+NEO4J_POOL_SIZE = int(os.environ.get("R3_NEO4J_POOL_SIZE", 20))
+NEO4J_ACQUIRE_TIMEOUT = float(os.environ.get("R3_NEO4J_ACQUIRE_TIMEOUT", 5))
+NEO4J_CONNECT_TIMEOUT = float(os.environ.get("R3_NEO4J_CONNECT_TIMEOUT", 5))
+NEO4J_QUERY_TIMEOUT = float(os.environ.get("R3_NEO4J_QUERY_TIMEOUT", 10))
+# 邻域结果缓存：条目数上限与有效期（秒），图由导入脚本更新，过期后重新查询
+NEO4J_CACHE_SIZE = int(os.environ.get("R3_NEO4J_CACHE_SIZE", 512))
+NEO4J_CACHE_TTL = float(os.environ.get("R3_NEO4J_CACHE_TTL", 300))
+
+# Title / Keyword 节点 name 属性上的全文索引
+FULLTEXT_INDEX = "node_names"
+FULLTEXT_INDEX_QUERY = (
+    f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX} IF NOT EXISTS FOR (n:Title|Keyword) ON EACH [n.name]"
+)
+
+DEFAULT_QUERY = """
+MATCH (n)-[r]-(m)
+WITH n, r, m LIMIT 50
+RETURN elementId(n) AS source_id, properties(n) AS source_props, labels(n) AS source_labels,
+       elementId(m) AS target_id, properties(m) AS target_props, labels(m) AS target_labels,
+       type(r) AS rel_type
+"""
+
+# 按全文索引得分分页取命中节点，每个命中节点最多带 $neighbors 个邻居
+SEARCH_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $term) YIELD node, score
+WITH node, score ORDER BY score DESC SKIP $skip LIMIT $limit
+CALL {
+    WITH node
+    OPTIONAL MATCH (node)-[r]-(m)
+    RETURN r, m LIMIT $neighbors
+}
+RETURN elementId(node) AS id, properties(node) AS props, labels(node) AS labels, score,
+       collect(CASE WHEN r IS NULL THEN NULL ELSE {
+           id: elementId(m), props: properties(m), labels: labels(m),
+           type: type(r), outgoing: elementId(startNode(r)) = elementId(node)
+       } END) AS neighbors
+ORDER BY score DESC
+"""
+
+
+def fulltext_query(text):
+    """
+    把用户输入转换为全文索引查询：按词切分后每个词做前缀匹配，所有词都须出现。
+    只保留字母数字，Lucene 的特殊字符不会进入查询。没有可用的词时返回 None。
+    """
+    tokens = re.findall(r"\w+", text.lower())
+    if not tokens:
+        return None
+    return " AND ".join(f"{token}*" for token in tokens)
+
+
+def _node(node_id, props, labels):
+    return {
+        "id": node_id,
+        "name": props.get("name", f"node_{node_id}"),
+        "labels": labels,
+        "properties": props,
+    }
+
+
+class Neo4jGraphAccess:
+    """
+    /neo4j 接口使用的异步图数据库访问层：
+      - 异步驱动，连接池大小、取连接 / 建连接 / 查询的超时都显式配置，
+        数据库变慢时请求在超时后失败，而不是占满线程或无限等待；
+      - 搜索走全文索引，按得分分页，每页的命中节点数和每个节点的邻居数都有上限；
+      - 结果按 (查询, 页码, 页大小, 邻居上限) 做带有效期的 LRU 缓存，
+        同一个查询同时到达的多个请求只向数据库发一次查询。
+    """
+
+    def __init__(self, uri=NEO4J_URI, user=NEO4J_USER, password=NEO4J_PASSWORD, driver=None,
+                 cache_size=NEO4J_CACHE_SIZE, cache_ttl=NEO4J_CACHE_TTL, query_timeout=NEO4J_QUERY_TIMEOUT):
+        self.driver = driver if driver is not None else AsyncGraphDatabase.driver(
+            uri, auth=(user, password),
+            max_connection_pool_size=NEO4J_POOL_SIZE,
+            connection_acquisition_timeout=NEO4J_ACQUIRE_TIMEOUT,
+            connection_timeout=NEO4J_CONNECT_TIMEOUT,
+        )
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.query_timeout = query_timeout
+        self.index_ready = False
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._cache = OrderedDict()  # key -> (过期时间, 结果)
+        self._inflight = {}  # key -> 正在执行的查询任务
+        self._index_lock = asyncio.Lock()
+
+    async def close(self):
+        await self.driver.close()
+
+    async def ensure_indexes(self):
+        """
+        创建全文索引（已存在时不做任何事）。数据库不可用时返回 False，下次搜索时再试。
+        """
+        if self.index_ready:
+            return True
+        async with self._index_lock:
+            if self.index_ready:
+                return True
+            try:
+                async with self.driver.session() as session:
+                    result = await session.run(FULLTEXT_INDEX_QUERY)
+                    await result.consume()
+                self.index_ready = True
+            except (Neo4jError, DriverError, OSError) as e:
+                print(f"[Neo4j] 全文索引创建失败: {e}")
+        return self.index_ready
+
+    async def _fetch(self, text, parameters=None):
+        async with self.driver.session() as session:
+            result = await session.run(Query(text, timeout=self.query_timeout), parameters or {})
+            return [record async for record in result]
+
+    async def _cached(self, key, load):
+        """
+        缓存命中时直接返回；未命中时执行 load()，同一个键的并发请求共享同一次查询。
+        查询失败返回 {"error": ...}，失败结果不缓存。
+        """
+        now = time.monotonic()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(load())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        try:
+            value = await asyncio.shield(task)
+        except (Neo4jError, DriverError, OSError) as e:
+            self.errors += 1
+            print(f"[Neo4j] 查询失败: {e}")
+            return {"error": "Graph database is unavailable or the query timed out, please retry later."}
+
+        self._cache[key] = (time.monotonic() + self.cache_ttl, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+    async def default_graph(self):
+        return await self._cached(("default",), self._load_default)
+
+    async def _load_default(self):
+        nodes = {}
+        links = []
+        for record in await self._fetch(DEFAULT_QUERY):
+            for prefix in ['source', 'target']:
+                node_id = record[f"{prefix}_id"]
+                if node_id not in nodes:
+                    nodes[node_id] = _node(node_id, record[f"{prefix}_props"], record[f"{prefix}_labels"])
+            links.append({
+                "source": record["source_id"],
+                "target": record["target_id"],
+                "type": record["rel_type"]
+            })
+        return {"nodes": list(nodes.values()), "links": links}
+
+    async def search(self, query, page=1, page_size=25, neighbors=10):
+        """
+        全文检索 name 属性，返回第 page 页（从 1 开始）命中节点及其邻居组成的子图：
+          {"nodes", "links", "page", "page_size", "has_more"}
+        """
+        term = fulltext_query(query)
+        if term is None:
+            return {"nodes": [], "links": [], "page": page, "page_size": page_size, "has_more": False}
+        if not await self.ensure_indexes():
+            return {"error": "Graph database is unavailable, please retry later."}
+        key = ("search", term, page, page_size, neighbors)
+        return await self._cached(key, lambda: self._load_search(term, page, page_size, neighbors))
+
+    async def _load_search(self, term, page, page_size, neighbors):
+        # 多取一个命中节点，用来判断是否还有下一页
+        records = await self._fetch(SEARCH_QUERY, {
+            "index": FULLTEXT_INDEX, "term": term,
+            "skip": (page - 1) * page_size, "limit": page_size + 1, "neighbors": neighbors,
+        })
+        has_more = len(records) > page_size
+
+        nodes = {}
+        links = {}
+        for record in records[:page_size]:
+            node_id = record["id"]
+            nodes.setdefault(node_id, _node(node_id, record["props"], record["labels"]))
+            for neighbor in record["neighbors"]:
+                nodes.setdefault(neighbor["id"], _node(neighbor["id"], neighbor["props"], neighbor["labels"]))
+                source, target = (node_id, neighbor["id"]) if neighbor["outgoing"] else (neighbor["id"], node_id)
+                # 两个命中节点相邻时同一条边会出现两次
+                links[(source, target, neighbor["type"])] = {"source": source, "target": target,
+                                                             "type": neighbor["type"]}
+
+        return {
+            "nodes": list(nodes.values()),
+            "links": list(links.values()),
+            "page": page,
+            "page_size": page_size,
+            "has_more": has_more,
+        }
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "pool_size": NEO4J_POOL_SIZE,
+            "query_timeout": self.query_timeout,
+            "index_ready": self.index_ready,
+            "cache_entries": len(self._cache),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": self.hits / lookups if lookups else 0.0,
+            "inflight": len(self._inflight),
+            "errors": self.errors,
+        }
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from bm25 import tokenize
+
+# 每条缓存除结果外的估计固定开销（字节），用于内存计量
+ENTRY_OVERHEAD = 256
+
+
+def query_key(query):
+    """
+    缓存键：bm25.tokenize 得到的词序列。大小写、标点、多余空格不同的查询共享同一条缓存；
+    词的顺序和重复次数会影响 BM25 得分，因此保留原序列而不是集合。
+    """
+    return tuple(tokenize(query))
+
+
+def file_fingerprint(paths):
+    """
+    返回数据文件的指纹 [(路径, 修改时间, 大小)]，文件不存在时记为 (路径, None, None)。
+    """
+    fingerprint = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            fingerprint.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            fingerprint.append((path, None, None))
+    return fingerprint
+
+
+def fingerprint_version(paths):
+    """
+    数据文件指纹的短哈希，作为从原始文件加载的数据的版本号。
+    """
+    text = json.dumps(file_fingerprint(paths), ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class QueryCache:
+    """
+    /search 的结果缓存，放在 BM25、图扩展、排序和频繁模式挖掘之前。
+
+    只缓存与元数据无关的部分（排序后的论文 id、论文 -> 关键词、freq_graph），
+    元数据仍在每次请求时按 id 从 MetadataStore 取，因此缓存很小，也不会与元数据不一致。
+    按估计字节数做 LRU 淘汰。
+
+    缓存的结果只对产生它们的那份已加载数据有效，version 为该数据的版本
+    （initialize_data 返回的 data["version"]：快照目录名或原始数据文件指纹）。
+    进程内的数据加载后不再变化，磁盘上的文件变化不影响缓存；重新加载数据后调用 set_version，
+    版本不同时清空缓存。
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, version=None):
+        self.max_bytes = max_bytes
+        self.version = version
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (结果, 字节数)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = len(json.dumps(value, ensure_ascii=False)) + len(" ".join(key)) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.total_bytes += size
+            # 超出容量时淘汰最久未使用的结果
+            while self.total_bytes > self.max_bytes:
+                _, (_, old_size) = self._entries.popitem(last=False)
+                self.total_bytes -= old_size
+                self.evictions += 1
+
+    def invalidate(self):
+        """
+        清空缓存。
+        """
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+            self.invalidations += 1
+
+    def set_version(self, version):
+        """
+        数据重新加载后调用：版本变化时清空缓存。
+        """
+        if version != self.version:
+            self.invalidate()
+            self.version = version
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
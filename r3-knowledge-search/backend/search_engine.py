@@ -0,0 +1,349 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from apr import largest_frequent_itemset
+from bm25 import query_bm25_index
+from graph_retrieve import rebuild_path
+from initializer import initialize_data
+from neighborhood_index import NEIGHBORHOOD_DIR, keyword_trees, load_neighborhood_index, rank_trees
+from query_cache import query_key
+
+# 图扩展的最大距离与未到达关键词的距离惩罚
+MAX_DISTANCE = 3
+MISS_PENALTY = 7
+# BM25 关键词检索模式："exhaustive" 全量累加，"maxscore" 动态剪枝（结果相同）
+BM25_MODE = "maxscore"
+# 每个查询使用的 BM25 关键词数
+KEYWORDS_PER_QUERY = 10
+# 枢纽节点控制（含义见 CSRGraph.rank_from_seeds）：
+#   度数上限，除种子外邻居数超过它的节点只向抽样的邻居扩展，0 表示不限制（邻域索引须按同一上限构建）
+#   每次查询最多访问的节点数，超过时截断扩展并在结果中标记 truncated，0 表示不限制
+#   经过枢纽节点的路径附加的距离权重，0 表示不降权
+HUB_DEGREE_CAP = int(os.environ.get("R3_HUB_DEGREE_CAP", 0))
+MAX_VISITED = int(os.environ.get("R3_SEARCH_MAX_VISITED", 0))
+HUB_WEIGHT = float(os.environ.get("R3_HUB_WEIGHT", 0))
+
+
+class SearchEngine:
+    """
+    进程内的检索流水线：BM25 关键词 -> 图扩展排序 -> 频繁关键词组合 -> 解释路径。
+    back.py 的 /search、/search/batch、/path 和离线回放脚本都通过它检索，结果完全相同。
+
+    search_batch 一次处理多个查询：
+      - 词序列相同的查询（query_key 相同）只做一次 BM25 和排序；
+      - 所有查询的关键词合并后，每个关键词的邻域（距离与 BFS 前驱）只取一次：
+        有邻域索引时从索引读取，否则每 64 个关键词共用一次位掩码 BFS，各查询再合并自己的邻域。
+    邻域不完整或合并后超过 max_visited 的查询改用有界的 BFS，最坏情况下的耗时与访问节点数上限成正比。
+    """
+
+    def __init__(self, metadata, candidate_keywords, bm25_index, graph, keyword_index, neighborhoods=None,
+                 max_distance=MAX_DISTANCE, miss_penalty=MISS_PENALTY, bm25_mode=BM25_MODE,
+                 keywords_per_query=KEYWORDS_PER_QUERY, degree_cap=HUB_DEGREE_CAP, max_visited=MAX_VISITED,
+                 hub_weight=HUB_WEIGHT):
+        self.metadata = metadata
+        self.candidate_keywords = candidate_keywords
+        self.bm25_index = bm25_index
+        self.graph = graph
+        self.keyword_index = keyword_index
+        # 邻域索引覆盖的距离不够时不使用，仍在图上做 BFS
+        if neighborhoods is not None and neighborhoods.max_distance < max_distance:
+            neighborhoods = None
+        if neighborhoods is not None and neighborhoods.degree_cap != degree_cap:
+            print(f"[Neighborhood] 索引按度数上限 {neighborhoods.degree_cap} 构建，与当前设置 {degree_cap} 不同，使用 BFS")
+            neighborhoods = None
+        self.neighborhoods = neighborhoods
+        self.max_distance = max_distance
+        self.miss_penalty = miss_penalty
+        self.bm25_mode = bm25_mode
+        self.keywords_per_query = keywords_per_query
+        self.degree_cap = degree_cap
+        self.max_visited = max_visited
+        self.hub_weight = hub_weight
+
+    @classmethod
+    def from_data(cls, data, neighborhoods=None, **kwargs):
+        """
+        由 initialize_data 的返回值构建。
+        """
+        return cls(data["metadata"], data["candidate_keywords"], data["bm25_index"], data["csr_graph"],
+                   data["keyword_index"], neighborhoods=neighborhoods, **kwargs)
+
+    @classmethod
+    def load(cls, snapshot_dir=None, neighborhood_dir=NEIGHBORHOOD_DIR, **kwargs):
+        """
+        从当前工作目录的数据文件（或快照）加载，邻域索引可用时一并加载。
+        """
+        data = initialize_data(keep_networkx=False, snapshot_dir=snapshot_dir)
+        neighborhoods = load_neighborhood_index(neighborhood_dir, data["csr_graph"]) if neighborhood_dir else None
+        return cls.from_data(data, neighborhoods=neighborhoods, **kwargs)
+
+    def keywords(self, query):
+        return query_bm25_index(query, self.candidate_keywords, self.bm25_index,
+                                k=self.keywords_per_query, mode=self.bm25_mode)
+
+    def seeds(self, keywords):
+        return [self.keyword_index[kw] for kw in keywords if kw in self.keyword_index]
+
+    def search(self, query):
+        return self.search_batch([query])[0]
+
+    def search_batch(self, queries):
+        """
+        按输入顺序返回每个查询的结果：
+          {"keywords": BM25 关键词,
+           "ids": 按总距离排序的论文 id,
+           "paper_keys": {论文 id: [到达它的关键词节点]},
+           "freq_graph": 频繁关键词组合对应的主题图,
+           "parents": BFS 前驱指针 {关键词节点: {节点: 朝向该关键词的上一个节点}}，用于重建解释路径,
+           "visited": 图扩展访问的节点数,
+           "truncated": 是否因 max_visited 截断了扩展（结果不完整）,
+           "timings": 各阶段耗时（毫秒），共享的邻域读取按查询数平均分摊}
+        重复的查询共享同一个结果对象。
+        """
+        distinct = {}
+        for query in queries:
+            distinct.setdefault(query_key(query), query)
+
+        timings = {key: {} for key in distinct}
+        seed_lists = {}
+        keywords = {}
+        for key, query in distinct.items():
+            start = time.perf_counter()
+            keywords[key] = self.keywords(query)
+            seed_lists[key] = [seed for seed in dict.fromkeys(self.seeds(keywords[key]))
+                               if seed in self.graph.id_to_index]
+            timings[key]["bm25"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        trees = self._trees([seed for seeds in seed_lists.values() for seed in seeds]) if len(distinct) > 1 else None
+        shared = (time.perf_counter() - start) * 1000 / max(len(distinct), 1)
+
+        ranking = {"max_distance": self.max_distance, "miss_penalty": self.miss_penalty,
+                   "degree_cap": self.degree_cap, "max_visited": self.max_visited, "hub_weight": self.hub_weight}
+        results = {}
+        for key in distinct:
+            start = time.perf_counter()
+            parents = {}
+            stats = {}
+            seeds = seed_lists[key]
+            if trees is None:
+                ranker = self.neighborhoods if self.neighborhoods is not None else self.graph
+                ranked, paper_keys = ranker.rank_from_seeds(seeds, parents=parents, stats=stats, **ranking)
+            else:
+                ranked, paper_keys = rank_trees(self.graph, seeds, [trees[seed] for seed in seeds],
+                                                parents=parents, stats=stats, **ranking)
+            timings[key]["rank"] = shared + (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            freq_graph = self.frequent_pattern(paper_keys)
+            timings[key]["pattern"] = (time.perf_counter() - start) * 1000
+
+            results[key] = {
+                "keywords": keywords[key],
+                "ids": [pid for pid, _ in ranked],
+                "paper_keys": paper_keys,
+                "freq_graph": freq_graph,
+                "parents": parents,
+                "visited": stats["visited"],
+                "truncated": stats["truncated"],
+                "timings": timings[key],
+            }
+        return [results[query_key(query)] for query in queries]
+
+    def _trees(self, seed_ids):
+        """
+        一批查询的全部关键词的邻域 {关键词节点 id: (papers, dists, parents, inner, inner_parents)}，每个关键词只取一次。
+        没有邻域索引时每 64 个关键词共用一次不限访问节点数的 BFS：max_visited 是对单个查询的限制，
+        由 rank_trees 按每个查询合并后的访问节点数检查，超过时该查询改用有界的 BFS。
+        """
+        graph = self.graph
+        seed_ids = list(dict.fromkeys(seed_ids))
+        indices = [graph.id_to_index[seed] for seed in seed_ids]
+        if self.neighborhoods is not None:
+            return {seed: self.neighborhoods.lookup(k) for seed, k in zip(seed_ids, indices)}
+        trees = keyword_trees(graph, indices, self.max_distance, self.degree_cap)
+        return {seed: tree[1:] for seed, tree in zip(seed_ids, trees)}
+
+    def frequent_pattern(self, paper_keys):
+        # 只需要长度最大（其次支持度最高）且支持度大于 1 的关键词组合
+        G = self.graph
+        transactions = [set(keyIDs) for keyIDs in paper_keys.values()]
+        largest = largest_frequent_itemset(transactions, min_support=2, min_size=2)
+
+        if largest is None:
+            return {"key_nodes": [], "paper_nodes": []}
+
+        max_itemset, _ = largest
+        keyID_set = set(max_itemset)
+        matching_paperIDs = [pid for pid, keyIDs in paper_keys.items() if keyID_set.issubset(set(keyIDs))]
+
+        def get_node_info(node_id):
+            return {
+                "name": G.node_name(node_id),
+                "type": G.node_type_name(node_id)
+            }
+
+        def get_paper_info(paper_id):
+            return {
+                "name": G.node_name(paper_id),
+                "type": G.node_type_name(paper_id),
+                "date": self.metadata.field(paper_id, "dc.date.issued[en_US]", "")
+            }
+
+        key_nodes = [get_node_info(kid) for kid in keyID_set if kid in G]
+        paper_nodes = [get_paper_info(pid) for pid in matching_paperIDs if pid in G]
+
+        # 根据日期排序（默认升序）
+        paper_nodes.sort(key=lambda x: x["date"])
+
+        return {
+            "key_nodes": key_nodes,
+            "paper_nodes": paper_nodes
+        }
+
+    def pack_parents(self, parents, paper_keys):
+        """
+        只保留论文到其命中关键词的路径上的前驱指针，并改用图节点编号的平行数组
+        {关键词节点: [[节点编号...], [前驱编号...]]}，供搜索会话和结果缓存保存。
+        编号只对同一份数据有效，读取方需确认数据版本一致后再用 unpack_parents 还原。
+        """
+        index = self.graph.id_to_index
+        packed = {}
+        for paper_id, keyword_ids in paper_keys.items():
+            for kwd_id in keyword_ids:
+                seed_parents = parents.get(kwd_id, {})
+                kept = packed.setdefault(kwd_id, {})
+                node = paper_id
+                # 沿前驱走回关键词，遇到已保留的节点说明其后的路径已经记录过
+                while node != kwd_id and node not in kept:
+                    parent = seed_parents.get(node)
+                    if parent is None:
+                        break
+                    kept[node] = parent
+                    node = parent
+        return {kwd_id: [[index[node] for node in kept], [index[parent] for parent in kept.values()]]
+                for kwd_id, kept in packed.items()}
+
+    def unpack_parents(self, packed):
+        """
+        pack_parents 的逆过程，返回 rebuild_paths 使用的 {关键词节点: {节点: 前驱}}。
+        """
+        node_ids = self.graph.node_ids
+        return {kwd_id: {node_ids[node]: node_ids[parent] for node, parent in zip(nodes, prevs)}
+                for kwd_id, (nodes, prevs) in packed.items()}
+
+    def rebuild_paths(self, parents, paper_id, keyword_indices):
+        """
+        用搜索时记录的前驱指针重建论文到每个关键词的路径，缺少指针的为 None。
+        """
+        return [rebuild_path(parents.get(kwd_id, {}), paper_id, kwd_id, max_length=self.max_distance)
+                for kwd_id in keyword_indices]
+
+    def explain(self, paper_id, keyword_indices, path_list=None):
+        """
+        生成论文到每个命中关键词的解释路径。path_list 中已重建的路径直接使用，
+        缺失的（None）用限定深度的双向 BFS 补上。
+        """
+        G = self.graph
+        metadata = self.metadata
+        paths = []
+        query_name = G.node_name(paper_id)
+        # 与原来的扫描一致：查询论文取最后一条同 id 记录，路径上的论文取第一条
+        query_uri = metadata.field(paper_id, "dc.identifier.uri[en_US]", "", last=True)
+
+        for i, kwd_id in enumerate(keyword_indices):
+            path_nodes = path_list[i] if path_list is not None else None
+            if path_nodes is None:
+                path_nodes = G.shortest_path(paper_id, kwd_id, max_depth=self.max_distance)
+            if not path_nodes:
+                paths.append([])
+                continue
+            path_info = []
+            for id in path_nodes[1:]:
+                name = G.node_name(id)
+                type = G.node_type_name(id)
+
+                # 查找该节点对应的URI
+                uri = ""
+                if type == "title":
+                    uri = metadata.field(id, "dc.identifier.uri[en_US]", "")
+
+                path_info.append({
+                    "name": name,
+                    "label": type,
+                    "uri": uri if type == "title" else None
+                })
+
+            paths.append(path_info)
+
+        return {
+            "query_name": query_name,
+            "query_uri": query_uri,
+            "paths": paths
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在进程内回放查询日志：完整检索流水线，输出带耗时的 JSONL")
+    parser.add_argument("queries", help="查询日志文件，每行一个查询")
+    parser.add_argument("--output", default="search_replay.jsonl", help="输出 JSONL 文件")
+    parser.add_argument("--batch-size", type=int, default=32, help="每次 search_batch 处理的查询数，1 表示逐个检索")
+    parser.add_argument("--top", type=int, default=20, help="每个查询输出的论文数")
+    parser.add_argument("--snapshot-dir", default=None, help="数据快照目录（见 snapshot.py），默认解析原始数据文件")
+    parser.add_argument("--neighborhood-dir", default=NEIGHBORHOOD_DIR, help="关键词邻域索引目录，空字符串表示不使用")
+    args = parser.parse_args()
+
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    engine = SearchEngine.load(snapshot_dir=args.snapshot_dir, neighborhood_dir=args.neighborhood_dir)
+    batch_latencies = []
+    amortized = []
+    truncated = 0
+    start = time.perf_counter()
+    with open(args.output, "w", encoding="utf-8") as out:
+        for offset in range(0, len(queries), args.batch_size):
+            batch = queries[offset:offset + args.batch_size]
+            batch_start = time.perf_counter()
+            results = engine.search_batch(batch)
+            # 批内的查询同时完成：整批的耗时是这批每个查询的等待时间，
+            # 按查询数平均分摊后的耗时才是每个查询实际占用的计算时间，两者分开统计
+            batch_ms = (time.perf_counter() - batch_start) * 1000
+            query_ms = batch_ms / len(batch)
+            batch_latencies.append(batch_ms)
+            for query, result in zip(batch, results):
+                amortized.append(query_ms)
+                truncated += result["truncated"]
+                out.write(json.dumps({
+                    "query": query,
+                    "keywords": result["keywords"],
+                    "total": len(result["ids"]),
+                    "visited": result["visited"],
+                    "truncated": result["truncated"],
+                    "results": result["ids"][:args.top],
+                    "timings": {name: round(ms, 3) for name, ms in result["timings"].items()},
+                    "batch_ms": round(batch_ms, 3),
+                    "amortized_ms": round(query_ms, 3),
+                }, ensure_ascii=False) + "\n")
+    elapsed = time.perf_counter() - start
+
+    if batch_latencies:
+        p50, p95 = np.percentile(batch_latencies, [50, 95])
+        q50, q95 = np.percentile(amortized, [50, 95])
+        if truncated:
+            print(f"{truncated} 个查询的图扩展达到访问节点数上限 {engine.max_visited}，结果被截断")
+        print(f"回放 {len(queries)} 个查询（批大小 {args.batch_size}，共 {len(batch_latencies)} 批），耗时 {elapsed:.2f}s，"
+              f"吞吐量 {len(queries) / elapsed:.1f} 查询/秒")
+        print(f"  每批延迟 p50 {p50:.1f}ms / p95 {p95:.1f}ms（批内每个查询都要等整批完成）")
+        print(f"  每个查询分摊耗时 p50 {q50:.2f}ms / p95 {q95:.2f}ms（批耗时 / 批内查询数）")
+        print(f"结果已保存到 {args.output}")
+    else:
+        print("查询日志为空")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# 每条会话除负载外的估计固定开销（字节），用于内存计量
+ENTRY_OVERHEAD = 128
+
+
+class MemorySessionBackend:
+    """
+    进程内的会话后端：按字节数计量的 LRU，并带过期时间（TTL）。
+    只在单个 worker 内共享。
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=1800):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # key -> (过期时间, 负载)
+        self._lock = threading.Lock()
+
+    def put(self, key, payload):
+        size = len(payload) + len(key) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            raise ValueError(f"会话 {size} 字节超过容量上限 {self.max_bytes} 字节")
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.time() + self.ttl, payload)
+            self.total_bytes += size
+            # 超出容量时淘汰最久未使用的会话
+            while self.total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= len(entry[1]) + len(key) + ENTRY_OVERHEAD
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._entries),
+                    "bytes": self.total_bytes, "max_bytes": self.max_bytes}
+
+
+class SQLiteSessionBackend:
+    """
+    基于本地 SQLite 文件的会话后端，同一主机上的多个 uvicorn worker 共享同一份会话。
+    同样按字节数做 LRU 淘汰（按最近访问时间），并带过期时间（TTL）。
+    """
+
+    def __init__(self, path="search_sessions.db", max_bytes=256 * 1024 * 1024, ttl=1800):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed)")
+
+    def put(self, key, payload):
+        size = len(payload) + len(key) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            raise ValueError(f"会话 {size} 字节超过容量上限 {self.max_bytes} 字节")
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM sessions WHERE expires < ?", (now,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (id, payload, size, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, size, now + self.ttl, now),
+                )
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM sessions").fetchone()[0]
+                # 超出容量时按最近访问时间淘汰
+                while total > self.max_bytes:
+                    old_key, old_size = conn.execute(
+                        "SELECT id, size FROM sessions ORDER BY accessed LIMIT 1"
+                    ).fetchone()
+                    conn.execute("DELETE FROM sessions WHERE id = ?", (old_key,))
+                    total -= old_size
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires FROM sessions WHERE id = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM sessions WHERE id = ?", (key,))
+                return None
+            self._conn.execute("UPDATE sessions SET accessed = ? WHERE id = ?", (now, key))
+            return bytes(row[0])
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions"
+            ).fetchone()
+        return {"backend": "sqlite", "entries": entries, "bytes": total, "max_bytes": self.max_bytes}
+
+
+class SearchSessionStore:
+    """
+    保存每次 /search 的中间状态（例如 论文 -> 命中关键词 的映射），供 /path 按 search_id 读取。
+    状态以 JSON 编码后交给后端存储，后端可替换为进程内 LRU 或跨 worker 共享的 SQLite。
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self, state):
+        """
+        保存状态并返回 search_id；状态编码后超过后端容量时抛出 ValueError，而不是静默丢弃。
+        """
+        search_id = uuid.uuid4().hex
+        self.backend.put(search_id, json.dumps(state, ensure_ascii=False).encode("utf-8"))
+        return search_id
+
+    def get(self, search_id):
+        payload = self.backend.get(search_id)
+        if payload is None:
+            return None
+        return json.loads(payload)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+def create_session_store(backend="memory", path="search_sessions.db", max_bytes=64 * 1024 * 1024, ttl=1800):
+    """
+    按名称创建会话存储：backend 为 "memory"（单 worker）或 "sqlite"（同一主机多 worker 共享）。
+    """
+    if backend == "memory":
+        return SearchSessionStore(MemorySessionBackend(max_bytes=max_bytes, ttl=ttl))
+    if backend == "sqlite":
+        return SearchSessionStore(SQLiteSessionBackend(path=path, max_bytes=max_bytes, ttl=ttl))
+    raise ValueError(f"未知的会话后端: {backend}")
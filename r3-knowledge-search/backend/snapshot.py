@@ -0,0 +1,655 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import time
+import zlib
+
+import numpy as np
+import scipy.sparse as sp
+
+from bm25 import BM25Index
+from bm25_sparse import SparseBM25
+from csr_graph import CSRGraph
+from metadata_store import MetadataStore
+from query_cache import file_fingerprint
+
+# 快照格式版本，数组布局变化时递增；版本不一致的快照不会被加载
+SNAPSHOT_FORMAT = 3
+# 快照根目录下记录当前快照名称的文件
+LATEST_FILE = "LATEST"
+# 编译新快照后保留的快照个数（含新快照）
+SNAPSHOT_KEEP = 3
+
+
+def encode_cells(values):
+    """
+    把一列值编码为 (offsets, data)：每个值编码为 JSON 文本并以逗号结尾依次拼接，
+    第 i 个值位于 data[offsets[i]:offsets[i + 1] - 1]。
+    整列可用 json.loads("[" + data[:-1] + "]") 一次解码，也可以按下标单独解码。
+    """
+    offsets = [0]
+    chunks = []
+    pos = 0
+    for value in values:
+        chunk = json.dumps(value, ensure_ascii=False, default=_json_default).encode("utf-8") + b","
+        chunks.append(chunk)
+        pos += len(chunk)
+        offsets.append(pos)
+    data = np.frombuffer(b"".join(chunks), dtype=np.uint8)
+    return np.asarray(offsets, dtype=np.int64), data
+
+
+def decode_cells(offsets, data):
+    """
+    解码 encode_cells 编码的整列，返回列表。
+    """
+    if len(offsets) <= 1:
+        return []
+    return json.loads(b"[" + data[:-1].tobytes() + b"]")
+
+
+# C 实现的 JSON 扫描器，解码单个单元格时省去 json.loads 的类型检查和空白处理
+_scan_json = json.JSONDecoder().scan_once
+
+
+def encode_key(value):
+    """
+    查找键的编码方式，与 encode_cells 中单元格的编码相同。
+    """
+    return json.dumps(value, ensure_ascii=False, default=_json_default).encode("utf-8")
+
+
+def hash_index(offsets, data):
+    """
+    为一列单元格建立开放寻址哈希表（线性探测，负载不超过 1/2），供 CellIndex 查找：
+    槽位保存 行号 + 1，0 表示空槽；键重复时只登记最先出现的一行（与字典 setdefault 一致）。
+    """
+    raw = data.tobytes()
+    starts = offsets[:-1].tolist()
+    ends = (offsets[1:] - 1).tolist()
+    n = len(starts)
+    size = 1
+    while size < 2 * n:
+        size *= 2
+    mask = size - 1
+    table = np.zeros(size, dtype=np.int32 if n < 2 ** 31 - 1 else np.int64)
+    slots = table.tolist()
+    for row in range(n):
+        key = raw[starts[row]:ends[row]]
+        h = zlib.crc32(key) & mask
+        while slots[h]:
+            other = slots[h] - 1
+            if raw[starts[other]:ends[other]] == key:
+                break
+            h = (h + 1) & mask
+        else:
+            slots[h] = row + 1
+    table[:] = slots
+    return table
+
+
+def _json_default(value):
+    # pandas 读出的 numpy 标量
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"无法编码为 JSON: {type(value)}")
+
+
+def _duplicate_rows(records, key="id"):
+    """
+    {编码后的 id: [行号, ...]}，只包含出现多于一次的 id。
+    """
+    rows = {}
+    for i, record in enumerate(records):
+        rows.setdefault(encode_key(record.get(key)), []).append(i)
+    return {k: group for k, group in rows.items() if len(group) > 1}
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class CellTable:
+    """
+    快照中的一列 JSON 单元格，按下标惰性解码，行为与只读列表一致。
+    底层数组是只读的内存映射，同一主机上的多个 worker 共享同一份物理内存，
+    每个进程只为实际访问到的单元格创建 Python 对象。
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+        # memoryview 的下标访问直接返回 Python int / bytes 切片，比 numpy 标量快得多
+        self._off = memoryview(offsets)
+        self._buf = memoryview(data)
+
+    def __len__(self):
+        return len(self._off) - 1
+
+    def raw(self, i):
+        """
+        返回第 i 个单元格的编码字节。
+        """
+        return bytes(self._buf[self._off[i]:self._off[i + 1] - 1])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return _scan_json(self._buf[self._off[i]:self._off[i + 1] - 1].tobytes().decode("utf-8"), 0)[0]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def tolist(self):
+        return decode_cells(self.offsets, self.data)
+
+
+class CellIndex:
+    """
+    以哈希表实现的只读映射，代替 {键: 值} 字典：
+    键为 keys（CellTable）中的单元格，table 为 hash_index 建立的哈希表，
+    查找时对编码后的键做 crc32 并线性探测，直接比较内存映射中的字节，不解码单元格；
+    命中第 row 行时返回 values[row]（values 为 None 时返回行号）。键重复时返回最先出现的一行。
+
+    按编码后的字节比较时 1 与 "1"、1 与 1.0 互不相等，因此查找前先把键转换成表中键的类型（以第一行为准）：
+    表中是字符串时整数键转为十进制字符串；表中是数值时规范的整数字符串（如 "42"，不含 "042"）转为整数；
+    值为整数的浮点数按整数查找。
+    """
+
+    def __init__(self, keys, table, values=None):
+        self.keys_table = keys
+        self.table = table
+        self.values_table = values
+        self._slots = memoryview(table)
+        self._mask = len(table) - 1
+        self._size = int(np.count_nonzero(table))
+        self._string_keys = len(keys) > 0 and keys.raw(0)[:1] == b'"'
+
+    def _find(self, key):
+        return self._find_raw(encode_key(self._normalize(key)))
+
+    def _normalize(self, key):
+        if isinstance(key, str):
+            if not self._string_keys and key.lstrip("-").isdigit() and str(int(key)) == key:
+                return int(key)
+            return key
+        if isinstance(key, (bool, np.bool_)):
+            return key
+        if isinstance(key, (float, np.floating)) and float(key).is_integer():
+            key = int(key)
+        if isinstance(key, (int, np.integer)):
+            return str(int(key)) if self._string_keys else int(key)
+        return key
+
+    def _find_raw(self, target):
+        slots, mask = self._slots, self._mask
+        off, buf = self.keys_table._off, self.keys_table._buf
+        if not len(slots):
+            return -1
+        h = zlib.crc32(target) & mask
+        while True:
+            row = slots[h] - 1
+            if row < 0:
+                return -1
+            # memoryview 与 bytes 直接比较内容，不复制
+            if buf[off[row]:off[row + 1] - 1] == target:
+                return row
+            h = (h + 1) & mask
+
+    def _value(self, row):
+        return row if self.values_table is None else self.values_table[row]
+
+    def get(self, key, default=None):
+        row = self._find(key)
+        return default if row < 0 else self._value(row)
+
+    def __getitem__(self, key):
+        row = self._find(key)
+        if row < 0:
+            raise KeyError(key)
+        return self._value(row)
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __len__(self):
+        return self._size
+
+    def items(self):
+        # 按原始顺序遍历，跳过重复键的后续行
+        keys = self.keys_table
+        for row in range(len(keys)):
+            if self._find_raw(keys.raw(row)) == row:
+                yield keys[row], self._value(row)
+
+    def keys(self):
+        for key, _ in self.items():
+            yield key
+
+    def __iter__(self):
+        return self.keys()
+
+    def values(self):
+        for _, value in self.items():
+            yield value
+
+
+class ColumnarRecords:
+    """
+    按列存储的元数据，第 i 行在访问时才组装成 {列名: 值} 字典，行为与只读的行字典列表一致。
+    """
+
+    def __init__(self, columns, tables):
+        self.columns = columns
+        self.tables = tables
+
+    def __len__(self):
+        return len(self.tables[0]) if self.tables else 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        # 一行的所有单元格拼成一个 JSON 数组，一次解码
+        values = json.loads(b"[" + b",".join(table.raw(i) for table in self.tables) + b"]")
+        return dict(zip(self.columns, values))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class TokenizedKeywords:
+    """
+    以词项编号 CSR 保存的分词结果，按需还原为词列表，行为与 list[list[str]] 一致（只读）。
+    """
+
+    def __init__(self, doc_ptr, doc_terms, terms):
+        self.doc_ptr = doc_ptr
+        self.doc_terms = doc_terms
+        self.terms = terms
+
+    def __len__(self):
+        return len(self.doc_ptr) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        terms = self.terms
+        return [terms[t] for t in self.doc_terms[self.doc_ptr[i]:self.doc_ptr[i + 1]].tolist()]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def compile_snapshot(data, root, sources=(), keep=SNAPSHOT_KEEP):
+    """
+    把 initialize_data 的结果写成一个版本化快照目录：root/<时间戳>/，
+    其中每个数组一个 .npy 文件，manifest.json 记录格式版本、标量参数、
+    每个文件的 sha256 以及源数据文件的指纹。写完后更新 root/LATEST，
+    并只保留最新的 keep 个快照（0 表示不清理）。
+
+    返回：
+      快照目录路径
+    """
+    # 目录名精确到微秒；同一时刻的多次编译（或残留的同名目录）依次加后缀 -1、-2 ...，
+    # 用 makedirs 占用临时目录，不会删除或覆盖其他编译进程正在写的目录
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    attempt = 0
+    while True:
+        version = stamp if attempt == 0 else f"{stamp}-{attempt}"
+        target = os.path.join(root, version)
+        tmp = target + ".tmp"
+        if not os.path.exists(target):
+            try:
+                os.makedirs(tmp)
+                break
+            except FileExistsError:
+                pass
+        attempt += 1
+
+    arrays = {}
+
+    def add_cells(prefix, values, hashed=False):
+        offsets, cells = encode_cells(values)
+        arrays[prefix + ".offsets"], arrays[prefix + ".data"] = offsets, cells
+        if hashed:
+            arrays[prefix + ".hash"] = hash_index(offsets, cells)
+
+    # 图：CSR 邻接数组、节点类型、节点 id 与名称
+    graph = data["csr_graph"]
+    arrays["graph.indptr"] = graph.indptr
+    arrays["graph.indices"] = graph.indices
+    arrays["graph.node_type"] = graph.node_type
+    add_cells("graph.node_ids", graph.node_ids, hashed=True)
+    add_cells("graph.names", graph.names)
+
+    # BM25：词表按词项编号排列，倒排表与统计量原样保存
+    index = data["bm25_index"]
+    terms = [None] * len(index.vocab)
+    for term, term_id in index.vocab.items():
+        terms[term_id] = term
+    add_cells("bm25.terms", terms, hashed=True)
+    # 词频存为 float64、倒排表位置尽量用 int32，使 SciPy 可以直接引用这些数组而不复制
+    n_postings = len(index.postings_doc)
+    arrays["bm25.postings_ptr"] = np.asarray(index.postings_ptr, dtype=np.int32 if n_postings < 2 ** 31 else np.int64)
+    arrays["bm25.postings_doc"] = np.asarray(index.postings_doc, dtype=np.int32)
+    arrays["bm25.postings_tf"] = np.asarray(index.postings_tf, dtype=np.float64)
+    arrays["bm25.postings_weight"] = np.asarray(index.postings_weight, dtype=np.float64)
+    arrays["bm25.doc_len"] = np.asarray(index.doc_len, dtype=np.int32)
+    arrays["bm25.idf"] = np.asarray(index.idf, dtype=np.float64)
+    arrays["bm25.max_weight"] = np.asarray(index.max_weight, dtype=np.float64)
+
+    # 关键词及其分词结果（以词项编号保存）
+    add_cells("keywords", data["candidate_keywords"])
+    doc_ptr = [0]
+    doc_terms = []
+    for doc in data["tokenized_keywords"]:
+        doc_terms.extend(index.vocab[token] for token in doc)
+        doc_ptr.append(len(doc_terms))
+    arrays["keywords.doc_ptr"] = np.asarray(doc_ptr, dtype=np.int64)
+    arrays["keywords.doc_terms"] = np.asarray(doc_terms, dtype=np.int32)
+
+    # 标题 / 关键词 -> 节点 id 映射
+    for name in ("title_index", "keyword_index"):
+        mapping = data[name]
+        add_cells(name + ".keys", list(mapping.keys()), hashed=True)
+        add_cells(name + ".values", list(mapping.values()))
+
+    # 元数据按列保存，每个单元格为 JSON 文本（保留数值、缺失值等类型）
+    records = data["cached_data"]
+    columns = list(records[0].keys()) if records else []
+    for i, column in enumerate(columns):
+        add_cells(f"metadata.{i}", [record.get(column) for record in records], hashed=column == "id")
+
+    files = {}
+    for key, array in arrays.items():
+        filename = key + ".npy"
+        path = os.path.join(tmp, filename)
+        np.save(path, np.ascontiguousarray(array))
+        files[key] = {"file": filename, "sha256": _sha256(path)}
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "files": files,
+        "graph": {"type_names": graph.type_names},
+        "bm25": {"N": index.N, "avgdl": index.avgdl, "k1": index.k1, "b": index.b},
+        "metadata": {"columns": columns, "rows": len(records),
+                     "duplicate_rows": list(_duplicate_rows(records).values())},
+        "sources": file_fingerprint(sources),
+    }
+    with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    os.replace(tmp, target)
+    # 先写临时文件再替换，读取方不会看到写了一半的 LATEST
+    latest_tmp = os.path.join(root, LATEST_FILE + ".tmp")
+    with open(latest_tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(latest_tmp, os.path.join(root, LATEST_FILE))
+    if keep:
+        prune_snapshots(root, keep)
+    return target
+
+
+def prune_snapshots(root, keep=SNAPSHOT_KEEP):
+    """
+    只保留最新的 keep 个快照目录（按目录名，即编译时间排序），LATEST 指向的目录始终保留。
+    已加载旧快照的进程不受影响：被删除的文件在解除内存映射之前仍然可读。
+
+    返回：
+      删除的目录名列表
+    """
+    latest = resolve_snapshot(root)
+    names = sorted(
+        name for name in os.listdir(root)
+        if not name.endswith(".tmp") and os.path.isfile(os.path.join(root, name, "manifest.json"))
+    )
+    removed = []
+    for name in names[:max(len(names) - keep, 0)]:
+        path = os.path.join(root, name)
+        if latest is not None and os.path.samefile(path, latest):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+    return removed
+
+
+def resolve_snapshot(root):
+    """
+    返回 root/LATEST 指向的快照目录，不存在时返回 None。
+    """
+    try:
+        with open(os.path.join(root, LATEST_FILE), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    path = os.path.join(root, name)
+    return path if name and os.path.isdir(path) else None
+
+
+def open_snapshot(path, verify=True):
+    """
+    读取快照清单，校验格式版本和（可选）每个文件的 sha256，并以内存映射方式打开全部数组。
+
+    返回：
+      (manifest, {数组名: 只读 memmap 数组})
+    """
+    with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"快照格式版本 {manifest.get('format')} 与当前版本 {SNAPSHOT_FORMAT} 不一致")
+    arrays = {}
+    for key, entry in manifest["files"].items():
+        file_path = os.path.join(path, entry["file"])
+        if verify and _sha256(file_path) != entry["sha256"]:
+            raise ValueError(f"快照文件校验失败: {entry['file']}")
+        # 转为普通 ndarray 视图（仍由内存映射支撑），避免 np.memmap 子类逐元素访问的额外开销
+        arrays[key] = np.asarray(np.load(file_path, mmap_mode="r"))
+    return manifest, arrays
+
+
+def load_snapshot(root, verify=True, check_sources=True, shared=False):
+    """
+    从快照加载与 initialize_data 相同结构的数据字典（不含 NetworkX 图）。
+    快照不存在、版本不符、校验失败或源数据文件在编译后发生变化时返回 None，由调用方回退到原始加载方式。
+
+    shared: 为 False 时把数组解码为 Python 对象（查询最快，每个 worker 各有一份）；
+            为 True 时直接在内存映射的数组上提供只读视图（CellTable / CellIndex / ColumnarRecords），
+            同一主机上的多个 worker 共享一份物理内存，代价是每次访问时解码单元格
+    """
+    path = resolve_snapshot(root)
+    if path is None:
+        return None
+    start = time.perf_counter()
+    try:
+        manifest, arrays = open_snapshot(path, verify=verify)
+        if check_sources:
+            recorded = [tuple(entry) for entry in manifest["sources"]]
+            current = file_fingerprint([entry[0] for entry in recorded])
+            # 只比较仍然存在的源文件：线上可以只部署快照
+            if any(cur[1] is not None and cur != rec for cur, rec in zip(current, recorded)):
+                print(f"[Snapshot] {path} 编译后源数据文件已变化，改用原始数据加载")
+                return None
+        data = _build_shared_data(manifest, arrays) if shared else _build_data(manifest, arrays)
+        data["version"] = "snapshot:" + os.path.basename(path)
+    except Exception as e:
+        print(f"[Snapshot Error] {path}: {e}")
+        return None
+    mode = "共享内存映射" if shared else "解码为 Python 对象"
+    print(f"[Snapshot] 已加载 {path}（{mode}），耗时 {time.perf_counter() - start:.2f}s")
+    return data
+
+
+def _cells(arrays, prefix):
+    return decode_cells(arrays[prefix + ".offsets"], arrays[prefix + ".data"])
+
+
+def _build_data(manifest, arrays):
+    graph = CSRGraph(
+        arrays["graph.indptr"], arrays["graph.indices"], arrays["graph.node_type"],
+        manifest["graph"]["type_names"], _cells(arrays, "graph.node_ids"), _cells(arrays, "graph.names"),
+    )
+
+    # 倒排表等数值数组不复制成 Python 列表，直接使用内存映射数组的 memoryview：
+    # 下标访问返回 Python int / float，BM25Index 的查询循环只把用到的区间转成列表
+    stats = manifest["bm25"]
+    terms = _cells(arrays, "bm25.terms")
+    postings_ptr = arrays["bm25.postings_ptr"]
+    bm25_index = BM25Index(
+        {term: i for i, term in enumerate(terms)},
+        memoryview(postings_ptr), memoryview(arrays["bm25.postings_doc"]),
+        memoryview(arrays["bm25.postings_tf"]), memoryview(arrays["bm25.postings_weight"]),
+        memoryview(arrays["bm25.doc_len"]), memoryview(arrays["bm25.idf"]),
+        stats["N"], stats["avgdl"], k1=stats["k1"], b=stats["b"],
+        max_weight=memoryview(arrays["bm25.max_weight"]),
+    )
+    # 稀疏矩阵直接使用快照中的数组，不经过 Python 列表
+    bm25_sparse = _sparse_bm25(bm25_index.vocab, arrays, stats)
+    df_dict = {term: int(postings_ptr[i + 1] - postings_ptr[i]) for i, term in enumerate(terms)}
+
+    columns = manifest["metadata"]["columns"]
+    column_values = [_cells(arrays, f"metadata.{i}") for i in range(len(columns))]
+    cached_data = [dict(zip(columns, row)) for row in zip(*column_values)]
+
+    return {
+        "cached_data": cached_data,
+        "metadata": MetadataStore(cached_data),
+        "candidate_keywords": _cells(arrays, "keywords"),
+        "tokenized_keywords": TokenizedKeywords(arrays["keywords.doc_ptr"], arrays["keywords.doc_terms"], terms),
+        "df_dict": df_dict,
+        "N": stats["N"],
+        "avgdl": stats["avgdl"],
+        "bm25_index": bm25_index,
+        "bm25_sparse": bm25_sparse,
+        "graph": None,
+        "csr_graph": graph,
+        "title_index": dict(zip(_cells(arrays, "title_index.keys"), _cells(arrays, "title_index.values"))),
+        "keyword_index": dict(zip(_cells(arrays, "keyword_index.keys"), _cells(arrays, "keyword_index.values"))),
+    }
+
+
+def _sparse_bm25(vocab, arrays, stats):
+    # 词频矩阵直接引用快照中的数组，不经过 Python 列表
+    tf_matrix = sp.csr_matrix(
+        (arrays["bm25.postings_tf"], arrays["bm25.postings_doc"], arrays["bm25.postings_ptr"]),
+        shape=(len(arrays["bm25.postings_ptr"]) - 1, stats["N"]),
+    )
+    return SparseBM25(vocab, tf_matrix, arrays["bm25.doc_len"], arrays["bm25.idf"], stats["avgdl"])
+
+
+def _table(arrays, prefix):
+    return CellTable(arrays[prefix + ".offsets"], arrays[prefix + ".data"])
+
+
+def _index(arrays, prefix, values=None):
+    return CellIndex(_table(arrays, prefix), arrays[prefix + ".hash"], values)
+
+
+def _build_shared_data(manifest, arrays):
+    """
+    与 _build_data 返回相同的结构，但字符串、映射和元数据都是内存映射数组上的惰性只读视图，
+    只有很小的标量和类型名表为每个进程私有。
+    """
+    node_ids = _index(arrays, "graph.node_ids")
+    graph = CSRGraph(
+        arrays["graph.indptr"], arrays["graph.indices"], arrays["graph.node_type"],
+        manifest["graph"]["type_names"], node_ids.keys_table, _table(arrays, "graph.names"),
+        id_to_index=node_ids,
+    )
+
+    stats = manifest["bm25"]
+    vocab = _index(arrays, "bm25.terms")
+    postings_ptr = arrays["bm25.postings_ptr"]
+    # 查询循环逐元素访问倒排表：memoryview 的下标访问直接返回 Python int / float，
+    # bisect 也可以直接作用在 memoryview 上
+    bm25_index = BM25Index(
+        vocab, memoryview(postings_ptr), memoryview(arrays["bm25.postings_doc"]),
+        memoryview(arrays["bm25.postings_tf"]), memoryview(arrays["bm25.postings_weight"]),
+        memoryview(arrays["bm25.doc_len"]), memoryview(arrays["bm25.idf"]),
+        stats["N"], stats["avgdl"], k1=stats["k1"], b=stats["b"],
+        max_weight=memoryview(arrays["bm25.max_weight"]),
+    )
+    df_dict = CellIndex(vocab.keys_table, vocab.table, np.diff(postings_ptr))
+
+    columns = manifest["metadata"]["columns"]
+    records = ColumnarRecords(columns, [_table(arrays, f"metadata.{i}") for i in range(len(columns))])
+    if "id" in columns:
+        # id 重复的行很少，直接记在 manifest 中
+        duplicates = {}
+        for rows in manifest["metadata"]["duplicate_rows"]:
+            group = [records[row] for row in rows]
+            duplicates[group[0]["id"]] = group
+        metadata = MetadataStore(records, by_id=_index(arrays, f"metadata.{columns.index('id')}", records),
+                                 duplicates=duplicates)
+    else:
+        metadata = MetadataStore([])
+
+    return {
+        "cached_data": records,
+        "metadata": metadata,
+        "candidate_keywords": _table(arrays, "keywords"),
+        "tokenized_keywords": TokenizedKeywords(arrays["keywords.doc_ptr"], arrays["keywords.doc_terms"],
+                                                vocab.keys_table),
+        "df_dict": df_dict,
+        "N": stats["N"],
+        "avgdl": stats["avgdl"],
+        "bm25_index": bm25_index,
+        "bm25_sparse": _sparse_bm25(vocab, arrays, stats),
+        "graph": None,
+        "csr_graph": graph,
+        "title_index": _index(arrays, "title_index.keys", _table(arrays, "title_index.values")),
+        "keyword_index": _index(arrays, "keyword_index.keys", _table(arrays, "keyword_index.values")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="编译 / 校验检索数据快照")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_compile = sub.add_parser("compile", help="从原始数据文件编译新快照")
+    p_compile.add_argument("--out", default="snapshots", help="快照根目录")
+    p_compile.add_argument("--keep", type=int, default=SNAPSHOT_KEEP, help="保留最新的几个快照，0 表示不删除旧快照")
+    p_verify = sub.add_parser("verify", help="校验当前快照并测量加载耗时")
+    p_verify.add_argument("--root", default="snapshots", help="快照根目录")
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        from initializer import DATA_FILES, initialize_data
+
+        start = time.perf_counter()
+        data = initialize_data(keep_networkx=False, snapshot_dir=None)
+        if not data["candidate_keywords"] or len(data["csr_graph"]) == 0:
+            raise SystemExit("原始数据加载失败，未生成快照")
+        print(f"原始数据加载耗时: {time.perf_counter() - start:.2f}s")
+        os.makedirs(args.out, exist_ok=True)
+        path = compile_snapshot(data, args.out, sources=DATA_FILES, keep=args.keep)
+        print(f"快照已写入: {path}")
+    else:
+        path = resolve_snapshot(args.root)
+        if path is None:
+            raise SystemExit(f"{args.root} 下没有快照")
+        data = load_snapshot(args.root)
+        if data is None:
+            raise SystemExit("快照校验或加载失败")
+        print(f"节点数: {len(data['csr_graph'])}，关键词数: {data['N']}，论文数: {len(data['metadata'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from bm25 import tokenize
+from bm25_sparse import SparseBM25, query_bm25_batch
+from initializer import load_graph_files
+
+# rank_batch 一次矩阵运算允许的 论文 × 种子 距离矩阵非零项数（按上界估计），
+# 每个非零项连同中间结果约占几十字节，默认约对应几百 MB
+MAX_ENTRIES = int(os.environ.get("R3_SPARSE_MAX_ENTRIES", 10_000_000))
+
+
+class SparseDistanceScorer:
+    """
+    在论文 × 关键词关联矩阵 A 上用稀疏矩阵乘法计算距离排序，与 CSRGraph.rank_from_seeds 的结果相同。
+
+    图是论文-关键词二部图，关键词种子到论文的距离只能是奇数：
+      距离 1 的论文为 A·S 的非零项（S 为 关键词 × 种子 的指示矩阵），
+      距离不超过 3 的论文为 A·Aᵀ·A·S 的非零项，依此类推，每一层之后把结果二值化。
+    因为可达集合逐层单调增大，把各层的二值矩阵相加得到每个 (论文, 种子) 被到达的层数 c，
+    首次到达的距离即 最大奇数距离 + 2 - 2c，不需要逐层做差集。
+
+    一批查询的全部种子拼成 S 的列，一次完成扩展；再乘以 种子 × 查询 的汇总矩阵得到每个查询的总距离，
+    未到达的种子按 miss_penalty 计。种子数没有 64 个的限制。
+    """
+
+    def __init__(self, incidence, paper_ids, keyword_ids):
+        self.incidence = incidence.tocsr()                 # 论文 × 关键词，元素为 1
+        self.incidence_t = self.incidence.T.tocsr()        # 关键词 × 论文
+        self.paper_ids = paper_ids                         # 行号 -> 论文节点 id（按 CSRGraph 编号升序）
+        self.keyword_ids = keyword_ids                     # 列号 -> 关键词节点 id
+        self.keyword_col = {kid: col for col, kid in enumerate(keyword_ids)}
+        self._reach = {}                                   # 最大奇数距离 -> 每个关键词到达论文数的上界
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        由 CSRGraph 构建关联矩阵。图中出现论文-论文或关键词-关键词的边时抛出 ValueError。
+        """
+        is_title = graph.node_type == graph.title_type
+        rows = np.repeat(np.arange(len(graph)), np.diff(graph.indptr))
+        cols = graph.indices.astype(np.int64)
+        if np.any(is_title[rows] == is_title[cols]):
+            raise ValueError("关联矩阵只适用于论文-关键词二部图")
+
+        papers = np.flatnonzero(is_title)
+        keywords = np.flatnonzero(~is_title)
+        row_of = np.full(len(graph), -1, dtype=np.int64)
+        row_of[papers] = np.arange(len(papers))
+        col_of = np.full(len(graph), -1, dtype=np.int64)
+        col_of[keywords] = np.arange(len(keywords))
+        # CSR 中每条边存两次，只取 论文 -> 关键词 方向
+        edge = is_title[rows]
+        incidence = sp.csr_matrix(
+            (np.ones(int(edge.sum()), dtype=np.float32), (row_of[rows[edge]], col_of[cols[edge]])),
+            shape=(len(papers), len(keywords)),
+        )
+        incidence.sum_duplicates()
+        incidence.data[:] = 1
+        node_ids = graph.node_ids
+        return cls(incidence, [node_ids[i] for i in papers.tolist()], [node_ids[i] for i in keywords.tolist()])
+
+    def seed_matrix(self, seed_lists):
+        """
+        把每个查询的种子列表编码为 关键词 × 种子 的指示矩阵（所有查询的种子依次排列），
+        返回 (矩阵, 每个查询去重后的种子列表)。不是关键词节点的种子被忽略。
+        """
+        seeds_per_query = [[s for s in dict.fromkeys(seeds) if s in self.keyword_col] for seeds in seed_lists]
+        cols = [self.keyword_col[s] for seeds in seeds_per_query for s in seeds]
+        matrix = sp.csc_matrix(
+            (np.ones(len(cols), dtype=np.float32), (cols, np.arange(len(cols)))),
+            shape=(len(self.keyword_ids), len(cols)),
+        )
+        return matrix, seeds_per_query
+
+    def distances(self, seed_matrix, max_distance=3):
+        """
+        返回 论文 × 种子 的 CSC 矩阵，元素为距离（不超过 max_distance，未到达的项不存储）。
+        """
+        top = max_distance if max_distance % 2 else max_distance - 1
+        if top < 1:
+            return sp.csc_matrix((len(self.paper_ids), seed_matrix.shape[1]), dtype=np.int64)
+        levels = None
+        frontier = seed_matrix
+        for dist in range(1, top + 1, 2):
+            if dist > 1:
+                frontier = _binary(self.incidence_t @ reached)
+            reached = _binary(self.incidence @ frontier)
+            levels = reached if levels is None else levels + reached
+        levels = levels.tocsc()
+        levels.data = (top + 2 - 2 * levels.data).astype(np.int64)
+        return levels
+
+    def reach_bound(self, max_distance=3):
+        """
+        每个关键词在 max_distance 以内能到达的论文数的上界（按关键词列号）：
+        长度为 1、3、... 的路径数 Aᵀ·1、Aᵀ·A·Aᵀ·1、...，不超过论文总数。只做几次稀疏矩阵乘向量，结果按距离缓存。
+        """
+        top = max_distance if max_distance % 2 else max_distance - 1
+        if top not in self._reach:
+            n_papers = len(self.paper_ids)
+            reach = np.zeros(len(self.keyword_ids))
+            if top >= 1:
+                reach = np.minimum(self.incidence_t @ np.ones(n_papers), n_papers)
+                for _ in range(3, top + 1, 2):
+                    # 每一步都截断到论文总数，枢纽关键词的路径数不会无限增长
+                    reach = np.minimum(self.incidence_t @ np.minimum(self.incidence @ reach, n_papers), n_papers)
+            self._reach[top] = reach.astype(np.int64)
+        return self._reach[top]
+
+    def chunks(self, seed_lists, max_distance=3, max_entries=MAX_ENTRIES):
+        """
+        把查询按顺序分成若干段，每段种子的到达论文数上界之和不超过 max_entries（单个查询超过时独占一段），
+        返回 [(起始下标, 结束下标)]。上界只会高估，实际的 论文 × 种子 矩阵不会超过预算。
+        """
+        reach = self.reach_bound(max_distance)
+        bounds = []
+        start = 0
+        total = 0
+        for i, seeds in enumerate(seed_lists):
+            cols = [self.keyword_col[s] for s in dict.fromkeys(seeds) if s in self.keyword_col]
+            entries = int(reach[cols].sum()) if cols else 0
+            if i > start and total + entries > max_entries:
+                bounds.append((start, i))
+                start, total = i, 0
+            total += entries
+        if start < len(seed_lists):
+            bounds.append((start, len(seed_lists)))
+        return bounds
+
+    def rank_batch(self, seed_lists, max_distance=3, miss_penalty=7, with_keys=True, max_entries=MAX_ENTRIES):
+        """
+        批量版 CSRGraph.rank_from_seeds：对每个查询的种子列表返回 (ranked, paper_keys)，
+        格式与 rank_from_seeds 相同；with_keys=False 时 paper_keys 为 None，省去逐篇论文构造列表。
+        max_entries 按 论文 × 种子 矩阵的非零项数（上界）决定一次矩阵运算处理多少个查询，限制内存占用。
+        """
+        results = []
+        for start, end in self.chunks(seed_lists, max_distance, max_entries):
+            chunk = seed_lists[start:end]
+            seeds, seeds_per_query = self.seed_matrix(chunk)
+            dist = self.distances(seeds, max_distance)
+            # 种子 × 查询 的汇总矩阵：每个种子列属于哪个查询
+            owners = np.repeat(np.arange(len(chunk)), [len(s) for s in seeds_per_query])
+            group = sp.csr_matrix((np.ones(len(owners)), (np.arange(len(owners)), owners)),
+                                  shape=(len(owners), len(chunk)))
+            hit = dist.copy()
+            hit.data = np.ones(len(hit.data))
+            dist_sum = (dist.astype(np.float64) @ group).tocsc()
+            hit_count = (hit @ group).tocsc()
+
+            offset = 0
+            for q, query_seeds in enumerate(seeds_per_query):
+                lo, hi = hit_count.indptr[q], hit_count.indptr[q + 1]
+                rows = hit_count.indices[lo:hi]
+                order = np.argsort(rows, kind="stable")
+                rows, counts = rows[order], hit_count.data[lo:hi][order]
+                sums = np.zeros(len(rows))
+                s_lo, s_hi = dist_sum.indptr[q], dist_sum.indptr[q + 1]
+                sums[np.searchsorted(rows, dist_sum.indices[s_lo:s_hi])] = dist_sum.data[s_lo:s_hi]
+                totals = (sums + miss_penalty * (len(query_seeds) - counts)).astype(np.int64)
+                # 行号即论文编号的顺序，稳定排序后同分的论文按编号排列
+                rank = np.argsort(totals, kind="stable")
+                paper_ids = [self.paper_ids[i] for i in rows[rank].tolist()]
+                ranked = list(zip(paper_ids, totals[rank].tolist()))
+                paper_keys = None
+                if with_keys:
+                    block = dist[:, offset:offset + len(query_seeds)]
+                    cols = np.repeat(np.arange(len(query_seeds)), np.diff(block.indptr))
+                    keys = _seed_lists(np.searchsorted(rows, block.indices), cols, len(rows), query_seeds)
+                    paper_keys = dict(zip(paper_ids, [keys[i] for i in rank.tolist()]))
+                results.append((ranked, paper_keys))
+                offset += len(query_seeds)
+        return results
+
+    def rank_from_seeds(self, seed_ids, max_distance=3, miss_penalty=7):
+        """
+        单个查询，返回值与 CSRGraph.rank_from_seeds 相同。
+        """
+        return self.rank_batch([seed_ids], max_distance=max_distance, miss_penalty=miss_penalty)[0]
+
+
+def _seed_lists(positions, cols, n_rows, seeds):
+    """
+    由 (论文位置, 种子列) 对得到每篇论文的种子列表（按种子顺序）。
+    种子不超过 64 个时把每篇论文的种子编码为位掩码，同一个掩码只解码一次（与 CSRGraph 相同）。
+    """
+    if len(seeds) <= 64:
+        masks = np.zeros(n_rows, dtype=np.uint64)
+        np.bitwise_or.at(masks, positions, np.left_shift(np.uint64(1), cols.astype(np.uint64)))
+        decoded = {mask: [seeds[i] for i in range(len(seeds)) if mask >> i & 1]
+                   for mask in np.unique(masks).tolist()}
+        return [decoded[mask] for mask in masks.tolist()]
+    order = np.lexsort((cols, positions))
+    bounds = np.searchsorted(positions[order], np.arange(n_rows + 1))
+    cols = cols[order].tolist()
+    return [[seeds[c] for c in cols[bounds[i]:bounds[i + 1]]] for i in range(n_rows)]
+
+
+def _binary(matrix):
+    # 路径数只用于判断是否可达，二值化后避免数值随层数增长
+    matrix = matrix.tocsr()
+    matrix.eliminate_zeros()
+    matrix.data = np.ones(len(matrix.data), dtype=np.float32)
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线批量回放查询：BM25 关键词 + 关联矩阵距离排序，输出前 k 篇论文")
+    parser.add_argument("queries", help="查询日志文件，每行一个查询")
+    parser.add_argument("--dir", default=".", help="数据目录（图、new_kwds1.txt、keyword_index.json）")
+    parser.add_argument("--output", default="graph_batch.jsonl", help="输出 JSONL 文件")
+    parser.add_argument("--k", type=int, default=10, help="每个查询使用的 BM25 关键词数")
+    parser.add_argument("--top", type=int, default=20, help="每个查询输出的论文数")
+    parser.add_argument("--max-distance", type=int, default=3)
+    parser.add_argument("--miss-penalty", type=int, default=7)
+    parser.add_argument("--max-entries", type=int, default=MAX_ENTRIES,
+                        help="一次矩阵运算的 论文 × 种子 非零项数上限（按上界估计），决定每段的查询数")
+    parser.add_argument("--compare", action="store_true", help="同时用 CSRGraph.rank_from_seeds 逐个计算，核对结果并比较耗时")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.dir, "new_kwds1.txt"), "r", encoding="utf-8") as f:
+        candidate_keywords = [line.strip() for line in f if line.strip()]
+    with open(os.path.join(args.dir, "keyword_index.json"), "r", encoding="utf-8") as f:
+        keyword_index = json.load(f)
+    with open(args.queries, "r", encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    _, graph = load_graph_files(keep_networkx=False, data_dir=args.dir)
+    start = time.perf_counter()
+    scorer = SparseDistanceScorer.from_graph(graph)
+    bm25 = SparseBM25.build([tokenize(keyword) for keyword in candidate_keywords])
+    print(f"关联矩阵 {scorer.incidence.shape}，构建耗时: {time.perf_counter() - start:.2f}s")
+
+    keywords = query_bm25_batch(queries, candidate_keywords, bm25, k=args.k)
+    seed_lists = [[keyword_index[kw] for kw in kws if kw in keyword_index] for kws in keywords]
+    start = time.perf_counter()
+    results = scorer.rank_batch(seed_lists, max_distance=args.max_distance, miss_penalty=args.miss_penalty,
+                                max_entries=args.max_entries)
+    elapsed = time.perf_counter() - start
+    print(f"矩阵排序: {len(queries)} 个查询耗时 {elapsed:.2f}s（{elapsed / max(len(queries), 1) * 1000:.2f} ms/查询）")
+
+    if args.compare:
+        start = time.perf_counter()
+        mismatches = sum(
+            1 for seeds, result in zip(seed_lists, results)
+            if graph.rank_from_seeds(seeds, max_distance=args.max_distance, miss_penalty=args.miss_penalty) != result
+        )
+        elapsed = time.perf_counter() - start
+        print(f"BFS 排序: {elapsed / max(len(queries), 1) * 1000:.2f} ms/查询，结果不一致的查询数: {mismatches}")
+
+    with open(args.output, "w", encoding="utf-8") as out:
+        for query, kws, (ranked, _) in zip(queries, keywords, results):
+            out.write(json.dumps({"query": query, "keywords": kws, "total": len(ranked),
+                                  "results": ranked[:args.top]}, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
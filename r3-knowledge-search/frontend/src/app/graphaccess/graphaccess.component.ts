@@ -23,23 +23,64 @@ export class GraphaccessComponent implements OnInit, AfterViewInit, OnChanges {
   
   graphData: any = null;
   searchQuery: string = '';
+  // 后端按页返回命中节点及其邻居，宽泛的词也只取一页
+  page: number = 1;
+  pageSize: number = 25;
+  hasMore: boolean = false;
+  loading: boolean = false;
+  errorMessage: string = '';
+  private activeQuery: string = '';
   private chart!: echarts.ECharts;
 
   constructor(private http: HttpClient, private el: ElementRef) {}
 
+  // 新搜索：读取输入框，从第 1 页开始
   search(): void {
-    const trimmed = this.searchQuery.trim();
-    if (!trimmed) return;
-  
-    this.http.get(`http://localhost:8000/neo4j/search?query=${encodeURIComponent(trimmed)}`)
-      .subscribe(data => {
-        this.graphData = data;
-        this.updateChart();
+    this.loadPage(this.searchQuery.trim(), 1);
+  }
+
+  // 翻页（包括回到第 1 页）始终使用当前结果对应的查询，不读取输入框中已修改的内容
+  private loadPage(trimmed: string, page: number): void {
+    if (!trimmed || this.loading) return;
+
+    this.loading = true;
+    const params = `query=${encodeURIComponent(trimmed)}&page=${page}&page_size=${this.pageSize}`;
+    this.http.get(`http://localhost:8000/neo4j/search?${params}`)
+      .subscribe({
+        next: (data: any) => {
+          this.loading = false;
+          if (data.error) {
+            this.errorMessage = data.error;
+            return;
+          }
+          this.errorMessage = '';
+          this.activeQuery = trimmed;
+          this.page = data.page;
+          this.hasMore = data.has_more;
+          this.graphData = data;
+          this.updateChart();
+        },
+        error: () => {
+          this.loading = false;
+          this.errorMessage = 'Search failed, please retry later.';
+        }
       });
   }
 
+  nextPage(): void {
+    if (this.hasMore) this.loadPage(this.activeQuery, this.page + 1);
+  }
+
+  prevPage(): void {
+    if (this.page > 1) this.loadPage(this.activeQuery, this.page - 1);
+  }
+
   ngOnInit(): void {
-    this.http.get('http://localhost:8000/neo4j/default').subscribe(data => {
+    this.http.get('http://localhost:8000/neo4j/default').subscribe((data: any) => {
+      if (data.error) {
+        this.errorMessage = data.error;
+        return;
+      }
       this.graphData = data;
       this.updateChart();
     });
@@ -132,7 +173,8 @@ export class GraphaccessComponent implements OnInit, AfterViewInit, OnChanges {
       ]
     };
 
-    this.chart.setOption(option);
+    // 翻页时替换整个图，不与上一页合并
+    this.chart.setOption(option, true);
   }
 
   @HostListener('window:resize')
@@ -4,6 +4,15 @@ import { HttpClient } from '@angular/common/http';
 import { CommonModule } from '@angular/common';
 import { GraphComponent } from '../graph/graph.component';
 
+// 结果列表实际显示的列，后端只返回这些列（id 总会返回）
+const RESULT_FIELDS = [
+  'dc.title[en_US]',
+  'dc.identifier.uri[en_US]',
+  'dc.contributor.author[en_US]',
+  'dc.description.abstract[en_US]'
+].join(',');
+const PAGE_SIZE = 20;
+
 @Component({
   selector: 'app-search-results',
   imports: [CommonModule,GraphComponent],
@@ -13,6 +22,10 @@ import { GraphComponent } from '../graph/graph.component';
 export class SearchResultsComponent implements OnInit{
   query: string = '';
   results: any[] = [];
+  searchId: string = '';
+  total: number = 0;
+  nextCursor: string | null = null;
+  loadingMore: boolean = false;
   graphData: any = { nodes: [], links: [] };
   selectedGraphData: any = null;
 
@@ -30,11 +43,15 @@ export class SearchResultsComponent implements OnInit{
   }
 
   fetchResults(query: string) {
-    const apiUrl = 'http://127.0.0.1:8000/search?query=' + encodeURIComponent(query);
+    const apiUrl = 'http://127.0.0.1:8000/search?query=' + encodeURIComponent(query)
+      + `&limit=${PAGE_SIZE}&fields=${encodeURIComponent(RESULT_FIELDS)}`;
     
     this.http.get<any>(apiUrl).subscribe({
       next: (data) => {
+        this.searchId = data.search_id;
         this.results = data.list;
+        this.total = data.total;
+        this.nextCursor = data.next_cursor;
         this.generateGraphData(data.freq_graph);
       },
       error: (error) => {
@@ -43,6 +60,31 @@ export class SearchResultsComponent implements OnInit{
     });
   }
 
+  // 用上一页返回的 cursor 取下一页，追加到列表末尾
+  loadMore() {
+    if (!this.nextCursor || this.loadingMore) return;
+    const apiUrl = 'http://127.0.0.1:8000/search?cursor=' + encodeURIComponent(this.nextCursor)
+      + `&limit=${PAGE_SIZE}&fields=${encodeURIComponent(RESULT_FIELDS)}`;
+
+    this.loadingMore = true;
+    this.http.get<any>(apiUrl).subscribe({
+      next: (data) => {
+        this.loadingMore = false;
+        if (data.error) {
+          // 搜索会话已过期，重新搜索
+          this.fetchResults(this.query);
+          return;
+        }
+        this.results = this.results.concat(data.list);
+        this.nextCursor = data.next_cursor;
+      },
+      error: (error) => {
+        this.loadingMore = false;
+        console.error('Error fetching more results:', error);
+      }
+    });
+  }
+
   generateGraphData(freqGraph: any) {
     const truncate = (s: string) => {
       const maxLines = 3;
@@ -283,7 +325,7 @@ export class SearchResultsComponent implements OnInit{
       const paperId = result['id'];  // 或者你想用的唯一标识字段
 
       const encodedId = encodeURIComponent(paperId);
-      const apiUrl = `http://127.0.0.1:8000/path/${encodedId}`;
+      const apiUrl = `http://127.0.0.1:8000/path/${encodedId}?search_id=${encodeURIComponent(this.searchId)}`;
 
       this.http.get<any>(apiUrl).subscribe({
         next: (data) => {